@@ -0,0 +1,151 @@
+# adaptive_quality.py
+# Closed-loop quality controller for recording under CPU pressure
+# Dependencies: psutil
+#
+# The recorder reports every capture (how late it was against its schedule),
+# dropped frame slots and the encoder queue depth. Together with the recorder
+# process's own CPU use (as a share of all cores, so unrelated load elsewhere on
+# the machine does not count) these are the pressure signals. Once per interval
+# the controller looks at the window and moves one step along a quality ladder:
+#
+#     full fps -> lower fps ... -> lower scale ... -> faster encoder preset ...
+#
+# degrading while the pipeline is under pressure and recovering one step at a
+# time after it has had headroom for recover_after seconds. The ladder never goes
+# below the user floors (min fps, min scale, fastest preset). Every change is
+# appended to log with a wall-clock timestamp for the session metadata.
+
+import time
+from datetime import datetime
+
+import psutil
+
+from video_encoders import PRESETS
+
+
+def build_ladder(fps, min_fps, min_scale=1.0, preset=None, fastest_preset=None):
+    """Quality states from best to cheapest: [{'fps', 'scale', 'preset'}, ...]"""
+    min_fps = max(1, min(int(min_fps), fps))
+    fps_steps = []
+    for factor in (1.0, 0.75, 0.5, 0.33, 0.25):
+        step = max(min_fps, int(round(fps * factor)))
+        if step not in fps_steps:
+            fps_steps.append(step)
+    scale_steps = [s for s in (1.0, 0.75, 0.5, 0.35, 0.25) if s >= min_scale - 1e-9]
+
+    preset_steps = [preset]
+    if preset in PRESETS and fastest_preset in PRESETS:
+        start, stop = PRESETS.index(preset), PRESETS.index(fastest_preset)
+        preset_steps = [PRESETS[i] for i in range(start, stop - 1, -1)] or [preset]
+
+    ladder = [{'fps': f, 'scale': 1.0, 'preset': preset} for f in fps_steps]
+    low_fps = fps_steps[-1]
+    ladder += [{'fps': low_fps, 'scale': s, 'preset': preset} for s in scale_steps[1:]]
+    low_scale = scale_steps[-1]
+    ladder += [{'fps': low_fps, 'scale': low_scale, 'preset': p} for p in preset_steps[1:]]
+    return ladder
+
+
+class AdaptiveQualityController:
+    def __init__(self, ladder, interval=1.0, cpu_high=90.0, cpu_low=60.0,
+                 queue_high=0.5, lateness_high=0.5, recover_after=5.0, cooldown=2.0):
+        self.ladder = ladder
+        self.level = 0
+        self.interval = interval
+        self.cpu_high = cpu_high          # process CPU % (of all cores) that counts as pressure
+        self.cpu_low = cpu_low            # process CPU % (of all cores) below which we may recover
+        self.queue_high = queue_high      # encoder queue fill fraction that counts as pressure
+        self.lateness_high = lateness_high  # average lateness, in frame periods, that counts as pressure
+        self.recover_after = recover_after
+        self.cooldown = cooldown
+        self.log = []
+
+        self.started = time.monotonic()
+        self.window_start = self.started
+        self.last_change = self.started
+        self.healthy_since = None
+        self._reset_window()
+        self.process = psutil.Process()
+        self.cpu_count = psutil.cpu_count() or 1
+        self.process.cpu_percent(interval=None)  # prime the counters
+        psutil.cpu_percent(interval=None)
+
+    def _reset_window(self):
+        self.captures = 0
+        self.lateness_total = 0.0
+        self.dropped = 0
+        self.queue_peak = 0.0
+
+    @property
+    def state(self):
+        return self.ladder[self.level]
+
+    def record_capture(self, lateness_s, queue_fill):
+        """Report one capture: seconds behind schedule and encoder queue fill (0..1)"""
+        self.captures += 1
+        self.lateness_total += max(0.0, lateness_s)
+        if queue_fill > self.queue_peak:
+            self.queue_peak = queue_fill
+
+    def record_dropped(self, count):
+        self.dropped += count
+
+    def process_cpu(self):
+        """CPU % of the recorder process since the last call, as a share of all cores (0..100)"""
+        try:
+            return self.process.cpu_percent(interval=None) / self.cpu_count
+        except psutil.Error:
+            return 0.0
+
+    def update(self, now=None):
+        """Evaluate the window if interval has passed; returns the new state on a change, else None"""
+        now = now or time.monotonic()
+        if now - self.window_start < self.interval:
+            return None
+
+        frame_period = 1.0 / self.state['fps']
+        lateness = self.lateness_total / self.captures / frame_period if self.captures else 0.0
+        cpu = round(self.process_cpu(), 1)
+        reason = {
+            'cpu_percent': cpu,
+            'system_cpu_percent': psutil.cpu_percent(interval=None),  # logged for context only
+            'queue_peak': round(self.queue_peak, 2),
+            'lateness_periods': round(lateness, 2),
+            'dropped': self.dropped,
+        }
+        pressure = (self.dropped > 0 or self.queue_peak >= self.queue_high
+                    or lateness >= self.lateness_high or cpu >= self.cpu_high)
+        headroom = (not self.dropped and self.queue_peak < self.queue_high / 2
+                    and lateness < self.lateness_high / 2 and cpu < self.cpu_low)
+        self.window_start = now
+        self._reset_window()
+
+        if pressure:
+            self.healthy_since = None
+        elif headroom:
+            self.healthy_since = self.healthy_since or now
+        else:
+            self.healthy_since = None
+
+        if now - self.last_change < self.cooldown:
+            return None
+        if pressure and self.level < len(self.ladder) - 1:
+            return self._change(self.level + 1, 'degrade', reason, now)
+        if self.healthy_since and now - self.healthy_since >= self.recover_after and self.level > 0:
+            self.healthy_since = now
+            return self._change(self.level - 1, 'recover', reason, now)
+        return None
+
+    def _change(self, level, action, reason, now):
+        previous = self.state
+        self.level = level
+        self.last_change = now
+        self.log.append({
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'session_s': round(now - self.started, 3),
+            'action': action,
+            'from': dict(previous),
+            'to': dict(self.state),
+            'reason': reason,
+        })
+        return self.state
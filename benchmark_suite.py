@@ -0,0 +1,554 @@
+# benchmark_suite.py
+# End-to-end throughput benchmarks for RecordingEngine and ScreenshotEngine
+# Dependencies: same as the engines (runs headless with the synthetic capture backend)
+#
+# Usage:
+#     python benchmark_suite.py                                  # synthetic source, default sizes
+#     python benchmark_suite.py --backend mss                    # real screen, e.g. under Xvfb
+#     python benchmark_suite.py --only capture --compare-backends mss,xshm,xdamage
+#     python benchmark_suite.py --backend xwindow --window 'Firefox$' --window-composite
+#     python benchmark_suite.py --resolutions 1280x720,3840x2160 --duration 10
+#     python benchmark_suite.py --only recording --output results.json
+#     python benchmark_suite.py --only tracing                    # span tracer overhead
+#     python benchmark_suite.py --only cursor                     # cursor overlay cost per frame
+#     python benchmark_suite.py --only palette --pattern static   # indexed PNG vs true-colour PNG
+#     python benchmark_suite.py --only affinity --tuned-nice 10 --tuned-cpus 0 --tuned-cv-threads 1
+#     python benchmark_suite.py --save-baseline baseline.json
+#     python benchmark_suite.py --baseline baseline.json --threshold 0.15
+#
+# Results are emitted as JSON: {"meta": {...}, "results": {"<case>": {metric: value}}}.
+# With --baseline, every metric listed in METRICS is compared against the stored
+# value and the exit code is 1 if any got worse by more than the threshold.
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+
+
+# metric -> (direction, minimum absolute change that counts as a regression)
+METRICS = {
+    'achieved_fps': ('higher', 0.5),
+    'frames_dropped': ('lower', 2),
+    'cpu_s_per_video_min': ('lower', 0.5),
+    'grab_avg_ms': ('lower', 0.2),
+    'convert_avg_ms': ('lower', 0.2),
+    'write_avg_ms': ('lower', 0.2),
+    'bytes_per_video_s': ('lower', 1024),
+    'grabs_per_s': ('higher', 1.0),
+    'captures_per_s': ('higher', 0.5),
+    'grab_ms_p50': ('lower', 0.2),
+    'encode_ms_p50': ('lower', 0.5),
+    'bytes_avg': ('lower', 1024),
+    'span_ns': ('lower', 200),
+    'trace_overhead_pct': ('lower', 1.0),
+    'job_slowdown_pct': ('lower', 2.0),
+    'cursor_us': ('lower', 20),
+    'bytes_saved_pct': ('higher', 2.0),
+    'encode_saved_pct': ('higher', 5.0),
+}
+
+DEFAULT_RESOLUTIONS = '1280x720,1920x1080'
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def parse_resolutions(text):
+    """Parse '1280x720,1920x1080' into [(1280, 720), (1920, 1080)]"""
+    sizes = []
+    for item in text.split(','):
+        width, height = item.lower().strip().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def window_options(spec, composite=False):
+    """xwindow backend options from --window: a window id (decimal or 0x hex), pid:N or a title regex"""
+    if not spec:
+        raise ValueError("The xwindow backend needs --window (window id, pid:N or title regex)")
+    options = {'composite': bool(composite)}
+    if spec.startswith('pid:'):
+        options['pid'] = int(spec[4:])
+    elif spec.isdigit() or spec.lower().startswith('0x'):
+        options['window'] = int(spec, 0)
+    else:
+        options['title'] = spec
+    return options
+
+
+def backend_settings(args, width, height):
+    """Capture backend settings for a benchmark case"""
+    if args.backend == 'synthetic':
+        options = {'width': width, 'height': height, 'pattern': args.pattern}
+    elif args.backend == 'replay':
+        options = {'path': args.replay_path}
+    elif args.backend == 'xwindow':
+        options = window_options(args.window, args.window_composite)
+    else:
+        options = {}
+    return {'capture_backend': args.backend, 'capture_backend_options': options}
+
+
+def bench_capture(args, backend_name, width, height):
+    """Raw grab throughput of one capture backend, without conversion or encoding"""
+    from capture_backends import create_capture_backend
+
+    fake_args = argparse.Namespace(**dict(vars(args), backend=backend_name))
+    settings = backend_settings(fake_args, width, height)
+    with create_capture_backend(settings['capture_backend'], settings['capture_backend_options']) as backend:
+        screen = backend.monitors[0]
+        if width > screen['width'] or height > screen['height']:
+            return None
+        region = {'left': screen['left'], 'top': screen['top'], 'width': width, 'height': height}
+        frame = backend.grab(region)  # warm-up: allocates buffers / shared segments
+
+        samples = []
+        start = time.perf_counter()
+        for _ in range(args.grabs):
+            t0 = time.perf_counter()
+            backend.grab(region)
+            samples.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - start
+        actual = backend.name
+
+    return {
+        'backend': actual,
+        'frame_size': f"{frame.shape[1]}x{frame.shape[0]}",  # differs from the case size for xwindow
+        'grabs': len(samples),
+        'grabs_per_s': round(len(samples) / elapsed, 1),
+        'grab_ms_p50': round(percentile(samples, 0.5), 3),
+        'grab_ms_p95': round(percentile(samples, 0.95), 3),
+    }
+
+
+def bench_recording(args, width, height, folder, extra_settings=None):
+    """Record for --duration seconds and report throughput, stage latency and CPU cost"""
+    from recording_engine import RecordingEngine
+
+    engine = RecordingEngine()
+    engine.update_settings({
+        'folder_path': folder,
+        'record_fps': args.fps,
+        'record_format': args.record_format,
+        'record_audio_enabled': False,
+        'record_area_mode': 'custom',
+        'custom_x': 0,
+        'custom_y': 0,
+        'custom_w': width,
+        'custom_h': height,
+    })
+    engine.update_settings(backend_settings(args, width, height))
+    engine.update_settings(extra_settings or {})
+
+    cpu_start = time.process_time()
+    engine.start_recording()
+    time.sleep(args.duration)
+    engine.stop_recording()
+    if engine.record_thread:
+        engine.record_thread.join()
+    cpu_s = time.process_time() - cpu_start
+
+    stats = engine.get_stats()
+    video_s = stats['frames_written'] / stats['fps_target'] if stats['fps_target'] else 0.0
+    return {
+        'fps_target': stats['fps_target'],
+        'achieved_fps': round(stats['achieved_fps'], 2),
+        'frames_captured': stats['frames_captured'],
+        'frames_written': stats['frames_written'],
+        'frames_duplicated': stats['frames_duplicated'],
+        'frames_dropped': stats['frames_dropped'],
+        'frames_unchanged': stats['frames_unchanged'],
+        'queue_max': stats['queue_max'],
+        'adaptations': len(stats['adaptations']),
+        'grab_avg_ms': round(stats['grab_avg_ms'], 3),
+        'convert_avg_ms': round(stats['convert_avg_ms'], 3),
+        'write_avg_ms': round(stats['write_avg_ms'], 3),
+        'grab_max_ms': round(stats['grab_max_s'] * 1000, 3),
+        'convert_max_ms': round(stats['convert_max_s'] * 1000, 3),
+        'write_max_ms': round(stats['write_max_s'] * 1000, 3),
+        'cpu_s': round(cpu_s, 3),
+        'cpu_s_per_video_min': round(cpu_s / (video_s / 60), 3) if video_s else 0.0,
+        'bytes_written': stats['output_bytes'],
+        'bytes_per_video_s': round(stats['output_bytes'] / video_s) if video_s else 0,
+    }
+
+
+def bench_screenshot(args, width, height, folder, capture_format, extra_settings=None):
+    """Take --captures screenshots in one format and report rate and per-stage latency"""
+    from screenshot_engine import ScreenshotEngine
+
+    engine = ScreenshotEngine()
+    engine.settings.update({
+        'folder_path': folder,
+        'capture_format': capture_format,
+        'capture_region': 'custom',
+        'custom_region': {'x': 0, 'y': 0, 'width': width, 'height': height},
+    })
+    engine.settings.update(backend_settings(args, width, height))
+    engine.settings.update(extra_settings or {})
+
+    samples = []
+    start = time.perf_counter()
+    try:
+        for _ in range(args.captures):
+            if not engine.manual_capture(clipboard=False):
+                raise RuntimeError(f"Capture failed for format {capture_format}")
+            samples.append(engine.last_capture_stats)
+    finally:
+        engine.close_capture_backends()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'captures': len(samples),
+        'captures_per_s': round(len(samples) / elapsed, 2),
+        'grab_ms_p50': round(percentile([s['grab_ms'] for s in samples], 0.5), 3),
+        'convert_ms_p50': round(percentile([s['convert_ms'] for s in samples], 0.5), 3),
+        'encode_ms_p50': round(percentile([s['encode_ms'] for s in samples], 0.5), 3),
+        'encode_ms_p95': round(percentile([s['encode_ms'] for s in samples], 0.95), 3),
+        'bytes_avg': round(statistics.mean(s['bytes'] for s in samples)),
+    }
+
+
+def bench_tracing(args, width, height):
+    """Cost of the span tracer: per-span ns, and grab+convert loop time with tracing off vs on"""
+    import cv2
+    from capture_backends import create_capture_backend
+    from tracing import Tracer
+
+    tracer = Tracer(capacity=max(1000, args.grabs * 8))
+
+    def pipeline(backend, region):
+        start = time.perf_counter()
+        for index in range(args.grabs):
+            t0 = time.perf_counter()
+            frame = backend.grab(region)
+            t1 = time.perf_counter()
+            cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            t2 = time.perf_counter()
+            if tracer.enabled:
+                tracer.complete('frame', t0, t2, {'frame': index})
+                tracer.complete('grab', t0, t1)
+                tracer.complete('convert', t1, t2)
+        return (time.perf_counter() - start) / args.grabs
+
+    settings = backend_settings(args, width, height)
+    with create_capture_backend(settings['capture_backend'], settings['capture_backend_options']) as backend:
+        screen = backend.monitors[0]
+        region = {'left': screen['left'], 'top': screen['top'],
+                  'width': min(width, screen['width']), 'height': min(height, screen['height'])}
+        pipeline(backend, region)  # warm-up
+        # Alternate off/on runs so drift affects both equally; keep the best of each
+        off, on = [], []
+        for _ in range(3):
+            tracer.stop()
+            off.append(pipeline(backend, region))
+            tracer.start()
+            on.append(pipeline(backend, region))
+        tracer.stop()
+
+    # Raw cost of one enabled complete() call
+    calls = 100000
+    tracer.start()
+    start = time.perf_counter()
+    for _ in range(calls):
+        tracer.complete('span', 0.0, 0.0)
+    span_s = (time.perf_counter() - start) / calls
+    tracer.stop()
+    start = time.perf_counter()
+    for _ in range(calls):
+        tracer.complete('span', 0.0, 0.0)
+    disabled_s = (time.perf_counter() - start) / calls
+
+    frame_off, frame_on = min(off), min(on)
+    return {
+        'span_ns': round(span_s * 1e9, 1),
+        'span_disabled_ns': round(disabled_s * 1e9, 1),
+        'frame_us_off': round(frame_off * 1e6, 1),
+        'frame_us_on': round(frame_on * 1e6, 1),
+        'trace_overhead_pct': round(max(0.0, (frame_on - frame_off) / frame_off * 100), 2),
+    }
+
+
+def bench_cursor(args, width, height):
+    """Cursor overlay: per-frame sample + blend cost (should not grow with resolution)"""
+    from cursor_overlay import benchmark
+
+    frames = max(100, args.grabs * 5)
+    return benchmark([(width, height)], frames)[f"{width}x{height}"]
+
+
+def _cpu_job(duration, results):
+    """CPU-bound stand-in for a co-scheduled test workload: count loop iterations"""
+    deadline = time.perf_counter() + duration
+    ops = 0
+    while time.perf_counter() < deadline:
+        for _ in range(10000):
+            ops += 1
+    results.put(ops)
+
+
+def run_cpu_job(duration, processes):
+    """Run the CPU job in N processes for duration seconds; returns a callable giving total ops/s"""
+    import multiprocessing
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_cpu_job, args=(duration, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+
+    def collect():
+        total = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        return total / duration
+    return collect
+
+
+def bench_affinity(args, width, height, folder):
+    """Throughput of a CPU-bound job alone, next to a default recording and next to a tuned one"""
+    processes = args.job_processes or os.cpu_count() or 1
+    tuned = {
+        'record_nice': args.tuned_nice,
+        'record_capture_cpus': args.tuned_cpus,
+        'record_encode_cpus': args.tuned_cpus,
+        'record_audio_cpus': args.tuned_cpus,
+        'record_cv_threads': args.tuned_cv_threads,
+        'record_encoder_threads': args.tuned_cv_threads,
+    }
+
+    alone = run_cpu_job(args.duration, processes)()
+    result = {'job_processes': processes, 'job_ops_per_s_alone': round(alone)}
+    for label, extra in (('default', None), ('tuned', tuned)):
+        collect = run_cpu_job(args.duration, processes)
+        recording = bench_recording(args, width, height, folder, extra)
+        ops = collect()
+        result[f'job_ops_per_s_{label}'] = round(ops)
+        result[f'job_slowdown_{label}_pct'] = round(max(0.0, (alone - ops) / alone * 100), 2)
+        result[f'achieved_fps_{label}'] = recording['achieved_fps']
+        result[f'frames_dropped_{label}'] = recording['frames_dropped']
+    result['job_slowdown_pct'] = result['job_slowdown_tuned_pct']
+    return result
+
+
+def run_capture_cases(args, folder):
+    results = {}
+    backends = (args.compare_backends or args.backend).split(',')
+    for width, height in parse_resolutions(args.resolutions):
+        for backend_name in backends:
+            case = f"capture/{backend_name}/{width}x{height}"
+            log(f"Running {case} ...")
+            result = bench_capture(args, backend_name, width, height)
+            if result is None:
+                log(f"  skipped: {width}x{height} is larger than the screen")
+                continue
+            if result['backend'] != backend_name:
+                log(f"  note: '{backend_name}' fell back to '{result['backend']}'")
+            results[case] = result
+    return results
+
+
+def run_recording_cases(args, folder):
+    results = {}
+    for width, height in parse_resolutions(args.resolutions):
+        case = f"recording/{width}x{height}"
+        log(f"Running {case} ...")
+        results[case] = bench_recording(args, width, height, folder)
+    return results
+
+
+def run_screenshot_cases(args, folder):
+    from image_formats import format_available
+
+    results = {}
+    formats = []
+    for capture_format in args.formats.split(','):
+        if format_available(capture_format):
+            formats.append(capture_format)
+        else:
+            log(f"Skipping screenshot format {capture_format}: not supported by this installation")
+    for width, height in parse_resolutions(args.resolutions):
+        for capture_format in formats:
+            case = f"screenshot/{width}x{height}/{capture_format}"
+            log(f"Running {case} ...")
+            results[case] = bench_screenshot(args, width, height, folder, capture_format)
+    return results
+
+
+def run_tracing_cases(args, folder):
+    results = {}
+    for width, height in parse_resolutions(args.resolutions):
+        case = f"tracing/{width}x{height}"
+        log(f"Running {case} ...")
+        results[case] = bench_tracing(args, width, height)
+    return results
+
+
+def run_affinity_cases(args, folder):
+    results = {}
+    for width, height in parse_resolutions(args.resolutions):
+        case = f"affinity/{width}x{height}"
+        log(f"Running {case} ...")
+        results[case] = bench_affinity(args, width, height, folder)
+    return results
+
+
+def run_cursor_cases(args, folder):
+    results = {}
+    for width, height in parse_resolutions(args.resolutions):
+        case = f"cursor/{width}x{height}"
+        log(f"Running {case} ...")
+        results[case] = bench_cursor(args, width, height)
+    return results
+
+
+def run_palette_cases(args, folder):
+    """PNG screenshots with png_palette off, exact and lossy; the palette cases report
+    their size and encode time savings over the true-colour 'off' case"""
+    results = {}
+    for width, height in parse_resolutions(args.resolutions):
+        base = None
+        for mode in ('off', 'exact', 'lossy'):
+            case = f"palette/{width}x{height}/{mode}"
+            log(f"Running {case} ...")
+            result = bench_screenshot(args, width, height, folder, 'png', {'png_palette': mode})
+            if base is None:
+                base = result
+            else:
+                result['bytes_saved_pct'] = round((1 - result['bytes_avg'] / base['bytes_avg']) * 100, 1)
+                result['encode_saved_pct'] = round((1 - result['encode_ms_p50'] / base['encode_ms_p50']) * 100, 1)
+            results[case] = result
+    return results
+
+
+# Benchmark groups selectable with --only
+GROUPS = {
+    'capture': run_capture_cases,
+    'recording': run_recording_cases,
+    'screenshot': run_screenshot_cases,
+    'tracing': run_tracing_cases,
+    'affinity': run_affinity_cases,
+    'cursor': run_cursor_cases,
+    'palette': run_palette_cases,
+}
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return a list of regression descriptions (empty if none)"""
+    regressions = []
+    for case, metrics in results.items():
+        base_metrics = baseline.get('results', {}).get(case)
+        if not base_metrics:
+            continue
+        for metric, value in metrics.items():
+            if metric not in METRICS or metric not in base_metrics:
+                continue
+            direction, min_abs = METRICS[metric]
+            base = base_metrics[metric]
+            worse_by = (base - value) if direction == 'higher' else (value - base)
+            if worse_by > max(abs(base) * threshold, min_abs):
+                regressions.append(f"{case} {metric}: {base} -> {value}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="N-SnapRecorder throughput benchmarks")
+    parser.add_argument('--backend', default='synthetic',
+                        choices=['synthetic', 'mss', 'xshm', 'xdamage', 'xwindow', 'replay'],
+                        help="Capture backend (default: synthetic, needs no display)")
+    parser.add_argument('--window', help="Window for the xwindow backend: id (decimal or 0x hex), pid:N or title regex")
+    parser.add_argument('--window-composite', action='store_true',
+                        help="xwindow: read the window's composite pixmap (works while it is covered)")
+    parser.add_argument('--compare-backends', help="Backends for the capture group, e.g. mss,xshm")
+    parser.add_argument('--grabs', type=int, default=100, help="Grabs per capture case")
+    parser.add_argument('--pattern', default='scroll', help="Synthetic pattern: static, scroll, noise")
+    parser.add_argument('--replay-path', help="Video file for the replay backend")
+    parser.add_argument('--resolutions', default=DEFAULT_RESOLUTIONS)
+    parser.add_argument('--only', default=','.join(GROUPS), help="Comma separated benchmark groups")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per recording case")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--record-format', default='avi', choices=['avi', 'mp4'])
+    parser.add_argument('--captures', type=int, default=20, help="Screenshots per format")
+    parser.add_argument('--formats', default='png,jpg,bmp,webp,qoi,auto',
+                        help="Screenshot formats (see image_formats.py); ones this install cannot write are skipped")
+    parser.add_argument('--job-processes', type=int, help="CPU-bound job processes for the affinity group (default: all cores)")
+    parser.add_argument('--tuned-nice', type=int, default=10, help="record_nice for the tuned affinity run")
+    parser.add_argument('--tuned-cpus', default='0', help="CPU list for recorder threads in the tuned affinity run")
+    parser.add_argument('--tuned-cv-threads', type=int, default=1, help="OpenCV/encoder threads in the tuned affinity run")
+    parser.add_argument('--folder', help="Output folder (default: temporary, deleted afterwards)")
+    parser.add_argument('--output', help="Write results JSON here instead of stdout")
+    parser.add_argument('--baseline', help="Baseline results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Relative change treated as a regression (default: 0.15)")
+    parser.add_argument('--save-baseline', help="Also write the results as a new baseline file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    groups = [g.strip() for g in args.only.split(',') if g.strip()]
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        log(f"Unknown benchmark group(s): {', '.join(unknown)}")
+        return 2
+    if 'xwindow' in (args.compare_backends or args.backend).split(',') + [args.backend] and not args.window:
+        log("The xwindow backend needs --window (window id, pid:N or title regex)")
+        return 2
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'backend': args.backend,
+            'pattern': args.pattern if args.backend == 'synthetic' else None,
+            'window': args.window if args.backend == 'xwindow' else None,
+            'duration_s': args.duration,
+            'fps': args.fps,
+        },
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix='nsnap-bench-') as tmp:
+        folder = args.folder or tmp
+        os.makedirs(folder, exist_ok=True)
+        for group in groups:
+            report['results'].update(GROUPS[group](args, folder))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report['results'], baseline, args.threshold)
+        if regressions:
+            log("Performance regressions:")
+            for line in regressions:
+                log(f"  {line}")
+            return 1
+        log("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+# capture_backends.py
+# Capture backends shared by ScreenshotEngine and RecordingEngine
+# Dependencies: mss, numpy, opencv-python (replay backend only)
+#
+# Every backend returns frames as a uint8 numpy array of shape (height, width, 4)
+# in BGRA order - the same layout mss produces - so callers never need to know
+# which source they are reading from.
+#
+# Backends:
+#   mss        - real screen capture (default)
+#   synthetic  - deterministic generated frames for benchmarks/CI without a display
+#   replay     - frames read back from an existing video file
+#   xshm       - X11 MIT-SHM capture (x11_capture.py), falls back to mss if unavailable
+#   xdamage    - X11 capture that only re-grabs damaged rectangles, falls back to xshm
+#   xwindow    - X11 capture of one window (by id, title or PID) that follows it as it moves
+
+import threading
+
+import mss
+import numpy as np
+
+
+class CaptureBackend:
+    """Base class for capture backends. Instances are not thread-safe - create one per thread."""
+
+    name = 'base'
+
+    # False when the last grab returned the same pixels as the one before it.
+    # Only change-aware backends (xdamage) ever set this; callers may then skip work.
+    last_grab_changed = True
+
+    # Screen position (left, top) of the last grab when it is not the requested region's
+    # (xwindow follows its window); None means the region was grabbed as asked.
+    last_grab_origin = None
+
+    @property
+    def monitors(self):
+        """Monitor list in mss layout: index 0 is the bounding box of all monitors"""
+        raise NotImplementedError
+
+    def grab(self, region):
+        """Grab region {'left', 'top', 'width', 'height'} as a (h, w, 4) BGRA uint8 array"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MssBackend(CaptureBackend):
+    name = 'mss'
+
+    def __init__(self):
+        self.sct = mss.mss()
+
+    @property
+    def monitors(self):
+        return self.sct.monitors
+
+    def grab(self, region):
+        shot = self.sct.grab(region)
+        # Zero-copy view of the mss buffer
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        try:
+            self.sct.close()
+        except Exception:
+            pass
+
+
+def _monitor_layout(sizes):
+    """Build an mss-style monitor list for monitors placed side by side"""
+    monitors = []
+    left = 0
+    for width, height in sizes:
+        monitors.append({'left': left, 'top': 0, 'width': int(width), 'height': int(height)})
+        left += int(width)
+    total = {'left': 0, 'top': 0, 'width': left, 'height': max(m['height'] for m in monitors)}
+    return [total] + monitors
+
+
+# Generated textures are expensive at 4K, so share them between backend instances
+_texture_cache = {}
+_texture_lock = threading.Lock()
+
+
+def _cached_texture(key, builder):
+    with _texture_lock:
+        texture = _texture_cache.get(key)
+        if texture is None:
+            texture = builder()
+            texture.setflags(write=False)
+            _texture_cache[key] = texture
+        return texture
+
+
+class SyntheticBackend(CaptureBackend):
+    """Deterministic frame generator. The frame index advances once per grab, so a
+    given (pattern, size, seed) always yields the same sequence regardless of timing.
+
+    Patterns:
+        static - a fixed desktop-like image (best case for change detection/encoders)
+        scroll - lines of text-like blocks scrolling vertically (typical terminal/browser)
+        noise  - full-motion random noise (worst case for encoders)
+    """
+
+    name = 'synthetic'
+    PATTERNS = ('static', 'scroll', 'noise')
+
+    def __init__(self, width=1920, height=1080, pattern='scroll', seed=0,
+                 monitors=None, scroll_speed=4):
+        if pattern not in self.PATTERNS:
+            raise ValueError(f"Unknown synthetic pattern: {pattern}")
+        self.pattern = pattern
+        self.seed = int(seed)
+        self.scroll_speed = int(scroll_speed)
+        self.frame_index = 0
+        self._monitors = _monitor_layout(monitors or [(width, height)])
+        self.width = self._monitors[0]['width']
+        self.height = self._monitors[0]['height']
+
+    @property
+    def monitors(self):
+        return self._monitors
+
+    def _build_static(self):
+        h, w = self.height, self.width
+        rng = np.random.default_rng(self.seed)
+        frame = np.empty((h, w, 4), dtype=np.uint8)
+        # Vertical gradient background
+        ramp = np.linspace(40, 90, h, dtype=np.float32).astype(np.uint8)
+        frame[:, :, 0] = ramp[:, None]
+        frame[:, :, 1] = ramp[:, None] // 2 + 30
+        frame[:, :, 2] = 60
+        frame[:, :, 3] = 255
+        # Flat-coloured "windows"
+        for _ in range(12):
+            x0, y0 = int(rng.integers(0, w - 1)), int(rng.integers(0, h - 1))
+            x1 = min(w, x0 + int(rng.integers(w // 10, w // 3 + 2)))
+            y1 = min(h, y0 + int(rng.integers(h // 10, h // 3 + 2)))
+            frame[y0:y1, x0:x1, :3] = rng.integers(0, 256, 3, dtype=np.uint8)
+        return frame
+
+    def _build_text(self):
+        # Twice the screen height so a scrolled window is always a contiguous row slice
+        h, w = self.height * 2, self.width
+        rng = np.random.default_rng(self.seed)
+        frame = np.full((h, w, 4), 250, dtype=np.uint8)
+        line_height, glyph_w = 18, 9
+        for top in range(4, h - line_height, line_height):
+            line_len = int(rng.integers(0, w // glyph_w))
+            glyphs = rng.random(line_len) < 0.8
+            for i in np.nonzero(glyphs)[0]:
+                x = int(i) * glyph_w
+                frame[top + 3:top + 13, x + 1:x + glyph_w - 2, :3] = 30
+        frame[:, :, 3] = 255
+        return frame
+
+    def _build_noise(self):
+        # A pool of noise frames stacked vertically; each grab picks a different offset
+        rng = np.random.default_rng(self.seed)
+        frame = rng.integers(0, 256, (self.height * 4, self.width, 4), dtype=np.uint8)
+        frame[:, :, 3] = 255
+        return frame
+
+    def _full_frame(self):
+        key = (self.pattern, self.width, self.height, self.seed)
+        if self.pattern == 'static':
+            return _cached_texture(key, self._build_static)
+        if self.pattern == 'scroll':
+            texture = _cached_texture(key, self._build_text)
+            offset = (self.frame_index * self.scroll_speed) % self.height
+        else:
+            texture = _cached_texture(key, self._build_noise)
+            # Odd multiplier so consecutive frames never share an offset
+            offset = (self.frame_index * 7919) % (self.height * 3)
+        return texture[offset:offset + self.height]
+
+    def grab(self, region):
+        frame = self._full_frame()
+        self.frame_index += 1
+        left = int(region['left']) - self._monitors[0]['left']
+        top = int(region['top']) - self._monitors[0]['top']
+        width, height = int(region['width']), int(region['height'])
+        if left < 0 or top < 0 or left + width > self.width or top + height > self.height:
+            raise ValueError(f"Region {region} is outside the synthetic screen {self.width}x{self.height}")
+        return np.ascontiguousarray(frame[top:top + height, left:left + width])
+
+
+class ReplayBackend(CaptureBackend):
+    """Replays frames from a video file as if they were screen grabs"""
+
+    name = 'replay'
+
+    def __init__(self, path, loop=True):
+        import cv2
+        self.cv2 = cv2
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open replay video: {path}")
+        width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._monitors = _monitor_layout([(width, height)])
+        self.bgra = None
+
+    @property
+    def monitors(self):
+        return self._monitors
+
+    def _next_frame(self):
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(self.cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        if not ok:
+            raise EOFError(f"End of replay video: {self.path}")
+        return frame
+
+    def grab(self, region):
+        frame = self._next_frame()
+        # Reuse one BGRA buffer for the conversion
+        if self.bgra is None or self.bgra.shape[:2] != frame.shape[:2]:
+            self.bgra = np.empty((frame.shape[0], frame.shape[1], 4), dtype=np.uint8)
+        self.cv2.cvtColor(frame, self.cv2.COLOR_BGR2BGRA, dst=self.bgra)
+        left, top = int(region['left']), int(region['top'])
+        width, height = int(region['width']), int(region['height'])
+        return np.ascontiguousarray(self.bgra[top:top + height, left:left + width])
+
+    def close(self):
+        try:
+            self.capture.release()
+        except Exception:
+            pass
+
+
+def _xshm_backend(**options):
+    # Imported lazily - only meaningful on X11
+    from x11_capture import XShmBackend
+    return XShmBackend(**options)
+
+
+def _xdamage_backend(**options):
+    from x11_capture import XDamageBackend
+    return XDamageBackend(**options)
+
+
+def _xwindow_backend(**options):
+    from x11_capture import XWindowBackend
+    return XWindowBackend(**options)
+
+
+BACKENDS = {
+    'mss': MssBackend,
+    'synthetic': SyntheticBackend,
+    'replay': ReplayBackend,
+    'xshm': _xshm_backend,
+    'xdamage': _xdamage_backend,
+    'xwindow': _xwindow_backend,   # no fallback: any other backend would record the wrong pixels
+}
+
+# Platform-specific backends and what to use when they cannot start:
+# name -> (fallback name, whether the fallback takes the same options)
+FALLBACKS = {
+    'xshm': ('mss', False),
+    'xdamage': ('xshm', True),
+}
+
+# Backends already reported as unavailable (print the reason once, not per grab)
+_reported_fallbacks = set()
+
+
+def create_capture_backend(name='mss', options=None):
+    """Create a capture backend by name with keyword options from settings"""
+    name = name or 'mss'
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"Unknown capture backend: {name}")
+    try:
+        return backend_class(**(options or {}))
+    except Exception as e:
+        if name not in FALLBACKS:
+            raise
+        fallback, keep_options = FALLBACKS[name]
+        if name not in _reported_fallbacks:
+            _reported_fallbacks.add(name)
+            print(f"Capture backend '{name}' unavailable ({e}), using '{fallback}'")
+        return create_capture_backend(fallback, options if keep_options else None)
@@ -0,0 +1,327 @@
+# capture_catalog.py
+# SQLite catalog of every screenshot and recording with indexed metadata queries
+# Dependencies: none (standard library only)
+#
+# Engines call CATALOG.record(db_path, {...}) after each output; the call only appends to
+# an in-memory queue (entries are dropped, and counted, if it is ever full) so
+# the capture path never waits on SQLite. A background thread hashes the
+# content and inserts the queued rows in one transaction per batch.
+#
+# Query from the app (control API 'catalog' command) or straight from the file:
+#     python capture_catalog.py FOLDER/capture_catalog.db --from "2026-10-19 14:00" --to "14:30" --monitor 2
+
+import os
+import sys
+import json
+import time
+import queue
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+from metrics import REGISTRY
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+ROWS_WRITTEN = REGISTRY.counter('nsnap_catalog_rows_written', 'Rows inserted into the capture catalog')
+ROWS_DROPPED = REGISTRY.counter('nsnap_catalog_rows_dropped', 'Catalog entries dropped because the queue was full')
+BATCH_SECONDS = REGISTRY.histogram('nsnap_catalog_batch_seconds', 'Duration of one catalog insert transaction')
+
+DEFAULT_FILENAME = 'capture_catalog.db'
+COLUMNS = ('path', 'kind', 'created', 'created_iso', 'monitor', 'region_x', 'region_y', 'width', 'height',
+           'format', 'bytes', 'hash', 'duration_s', 'fps', 'extra')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,              -- screenshot, region, recording, autovideo
+    created REAL NOT NULL,           -- unix time of the grab (start of a recording), ms precision
+    created_iso TEXT NOT NULL,
+    monitor INTEGER,                 -- capture backend monitor index, 0 = all monitors
+    region_x INTEGER,
+    region_y INTEGER,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    bytes INTEGER,
+    hash TEXT,                       -- blake2b-128 of the file content
+    duration_s REAL,
+    fps REAL,
+    extra TEXT                       -- JSON for anything else
+);
+CREATE INDEX IF NOT EXISTS captures_created ON captures (created);
+CREATE INDEX IF NOT EXISTS captures_monitor_created ON captures (monitor, created);
+CREATE INDEX IF NOT EXISTS captures_kind_created ON captures (kind, created);
+"""
+
+
+def catalog_path_for(folder, path_setting=''):
+    """Catalog file for a save folder: the catalog_path setting, else capture_catalog.db in the folder"""
+    if path_setting:
+        return path_setting
+    return os.path.join(folder, DEFAULT_FILENAME) if folder else None
+
+
+def monitor_for_region(monitors, region):
+    """Index of the monitor containing the region's centre in an mss-style monitor list (0 if none does)"""
+    cx = region['left'] + region['width'] / 2
+    cy = region['top'] + region['height'] / 2
+    for index, monitor in enumerate(monitors[1:], 1):
+        if (monitor['left'] <= cx < monitor['left'] + monitor['width']
+                and monitor['top'] <= cy < monitor['top'] + monitor['height']):
+            return index
+    return 0
+
+
+def parse_time(value, reference=None):
+    """Unix time from a number, 'YYYY-MM-DD HH:MM[:SS]' or 'HH:MM[:SS]' (on reference's date, default today)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        pass
+    day = datetime.fromtimestamp(reference) if reference else datetime.now()
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            clock = datetime.strptime(text, fmt).time()
+            return datetime.combine(day.date(), clock).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time: {value}")
+
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')     # readers never block the inserting thread
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def query(db_path, start=None, end=None, kind=None, monitor=None, capture_format=None, path_like=None,
+          limit=1000):
+    """Catalog rows matching the filters, oldest first, as dicts"""
+    if not db_path or not os.path.exists(db_path):
+        return []
+    start = parse_time(start)
+    end = parse_time(end, start)
+    clauses, params = [], []
+    for clause, value in (('created >= ?', start), ('created <= ?', end), ('kind = ?', kind),
+                          ('monitor = ?', monitor), ('format = ?', capture_format), ('path LIKE ?', path_like)):
+        if value is not None and value != '':
+            clauses.append(clause)
+            params.append(value)
+    sql = 'SELECT * FROM captures'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY created LIMIT ?'
+    params.append(int(limit))
+    conn = connect(db_path)
+    try:
+        rows = []
+        for row in conn.execute(sql, params):
+            row = dict(row)
+            row['extra'] = json.loads(row['extra']) if row['extra'] else None
+            rows.append(row)
+        return rows
+    finally:
+        conn.close()
+
+
+class CaptureCatalog:
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=0.5):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval     # longest a row waits for its batch
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        self.connections = {}                    # db path -> connection (catalog thread only)
+        self.idle = threading.Condition()
+        self.pending = 0
+        self.stats = {
+            'rows_written': 0,
+            'rows_removed': 0,
+            'rows_dropped': 0,
+            'batches': 0,
+            'errors': 0,
+            'last_error': None,
+        }
+
+    # -- producers (never block) -------------------------------------------
+
+    def _put(self, item):
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='CaptureCatalog', daemon=True)
+                self.thread.start()
+        with self.idle:
+            self.pending += 1
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.idle:
+                self.pending -= 1
+                self.idle.notify_all()
+            self.stats['rows_dropped'] += 1
+            ROWS_DROPPED.inc()
+
+    def record(self, db_path, entry, data=None):
+        """Queue one output for db_path. entry holds COLUMNS values; the hash is computed on the
+        catalog thread from data (the file bytes) if given, else by reading the file"""
+        if db_path:
+            self._put(('insert', db_path, entry, data))
+
+    def remove(self, db_path, path):
+        """Queue deletion of path's row (file deleted or failed to write)"""
+        if db_path:
+            self._put(('delete', db_path, path, None))
+
+    def flush(self, timeout=None):
+        """Wait until every queued entry is in the database; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.idle:
+            while self.pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+    # -- catalog thread -----------------------------------------------------
+
+    def _row(self, entry, data):
+        entry = dict(entry)
+        if not entry.get('hash'):
+            try:
+                entry['hash'] = hash_bytes(data) if data is not None else hash_file(entry['path'])
+            except OSError:
+                entry['hash'] = None
+        created = entry.get('created') or time.time()
+        entry['created'] = created
+        entry['created_iso'] = datetime.fromtimestamp(created).isoformat(timespec='milliseconds')
+        extra = {k: v for k, v in entry.items() if k not in COLUMNS}
+        base_extra = entry.get('extra') or {}
+        extra = dict(base_extra, **extra) if extra or base_extra else None
+        entry['extra'] = json.dumps(extra, default=str) if extra else None
+        return tuple(entry.get(column) for column in COLUMNS)
+
+    def _connection(self, db_path):
+        conn = self.connections.get(db_path)
+        if conn is None:
+            folder = os.path.dirname(db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = self.connections[db_path] = connect(db_path)
+        return conn
+
+    def _write_batch(self, batch):
+        t0 = time.perf_counter()
+        by_db = {}
+        for kind, db_path, payload, data in batch:
+            by_db.setdefault(db_path, []).append((kind, payload, data))
+        for db_path, items in by_db.items():
+            try:
+                conn = self._connection(db_path)
+                with conn:  # one transaction per database per batch
+                    for kind, payload, data in items:
+                        if kind == 'insert':
+                            conn.execute(f"INSERT OR REPLACE INTO captures ({', '.join(COLUMNS)}) "
+                                         f"VALUES ({', '.join('?' * len(COLUMNS))})", self._row(payload, data))
+                            self.stats['rows_written'] += 1
+                            ROWS_WRITTEN.inc()
+                        else:
+                            conn.execute('DELETE FROM captures WHERE path = ?', (payload,))
+                            self.stats['rows_removed'] += 1
+            except (sqlite3.Error, OSError) as e:
+                self.stats['errors'] += 1
+                self.stats['last_error'] = f"{db_path}: {e}"
+                print(f"Error writing capture catalog {db_path}: {e}")
+                self.connections.pop(db_path, None)
+        self.stats['batches'] += 1
+        BATCH_SECONDS.observe(time.perf_counter() - t0)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Error in capture catalog: {e}")
+            with self.idle:
+                self.pending -= len(batch)
+                self.idle.notify_all()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queued'] = self.queue.qsize()
+        return stats
+
+
+# Process-wide catalog shared by the engines
+CATALOG = CaptureCatalog()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query an N-SnapRecorder capture catalog")
+    parser.add_argument('db', help=f"Catalog file or save folder (uses {DEFAULT_FILENAME} inside it)")
+    parser.add_argument('--from', dest='start', help="Start time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time")
+    parser.add_argument('--to', dest='end', help="End time (HH:MM is taken on the --from date)")
+    parser.add_argument('--kind', choices=['screenshot', 'region', 'recording', 'autovideo'])
+    parser.add_argument('--monitor', type=int)
+    parser.add_argument('--format', dest='capture_format')
+    parser.add_argument('--path', dest='path_like', help="SQL LIKE pattern on the file path")
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--json', action='store_true', help="Print full rows as JSON")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(args.db, DEFAULT_FILENAME) if os.path.isdir(args.db) else args.db
+    try:
+        rows = query(db_path, args.start, args.end, args.kind, args.monitor, args.capture_format,
+                     args.path_like, args.limit)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            print(f"{row['created_iso']}  {row['kind']:<10} mon={row['monitor']} "
+                  f"{row['width']}x{row['height']} {row['bytes'] or 0:>10}  {row['path']}")
+        print(f"{len(rows)} capture(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# control_client.py
+# Client library and CLI for the local control API (see control_server.py)
+# Dependencies: none (standard library only)
+#
+# Usage:
+#     python control_client.py ping
+#     python control_client.py capture
+#     python control_client.py region X Y WIDTH HEIGHT
+#     python control_client.py views [NAME=X,Y,W,H | NAME=monitor:N ...]
+#     python control_client.py record start|stop|pause|resume
+#     python control_client.py stats
+#     python control_client.py metrics
+#     python control_client.py resources [--seconds N] [--history]
+#     python control_client.py retention
+#     python control_client.py catalog [--from TIME] [--to TIME] [--kind KIND] [--monitor N]
+#     python control_client.py thumbnails [--from TIME] [--to TIME] [--data]
+#     python control_client.py timelapse [--from TIME] [--to TIME] [--output PATH] [--wait]
+#     python control_client.py export_frame [--time TIME | --frame N] [--index PATH] [--output PATH]
+#     python control_client.py trace_dump
+#     python control_client.py bench [COUNT]
+
+import sys
+import json
+import socket
+import time
+import argparse
+
+from control_server import default_socket_address, encode_message, decode_message, read_token
+
+
+class ControlError(Exception):
+    """Raised when the running instance reports a failed command"""
+
+
+class ControlClient:
+    def __init__(self, address=None, timeout=10.0, token=None, token_path=None):
+        self.address = address or default_socket_address()
+        self.timeout = timeout
+        self.token = token              # TCP servers only; read from token_path when not given
+        self.token_path = token_path
+        self.connection_token = None
+        self.sock = None
+        self.reader = None
+        self.next_id = 1
+
+    def connect(self):
+        """Open a persistent connection to the control server"""
+        if self.sock:
+            return
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.address if isinstance(self.address, str) else tuple(self.address))
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+        if not isinstance(self.address, str):
+            self.connection_token = self.token or read_token(self.token_path)
+
+    def close(self):
+        """Close the connection"""
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def request(self, cmd, **args):
+        """Send one command and return the full response dict"""
+        self.connect()
+        request_id = self.next_id
+        self.next_id += 1
+        message = {'id': request_id, 'cmd': cmd, 'args': args}
+        if self.connection_token:
+            message['token'] = self.connection_token
+        self.sock.sendall(encode_message(message))
+        line = self.reader.readline()
+        if not line:
+            self.close()
+            raise ConnectionError("Control server closed the connection")
+        return decode_message(line)
+
+    def call(self, cmd, **args):
+        """Send one command and return its result, raising ControlError on failure"""
+        response = self.request(cmd, **args)
+        if not response.get('ok'):
+            raise ControlError(response.get('error', 'Unknown error'))
+        return response.get('result')
+
+    def ping(self):
+        return self.call('ping')
+
+    def capture(self, clipboard=False):
+        return self.call('capture', clipboard=clipboard)
+
+    def capture_region(self, x, y, width, height, clipboard=False):
+        return self.call('capture_region', x=x, y=y, width=width, height=height, clipboard=clipboard)
+
+    def capture_views(self, views=None, clipboard=False):
+        return self.call('capture_views', views=views, clipboard=clipboard)
+
+    def record_start(self):
+        return self.call('record_start')
+
+    def record_stop(self):
+        return self.call('record_stop')
+
+    def record_pause(self):
+        return self.call('record_pause')
+
+    def record_resume(self):
+        return self.call('record_resume')
+
+    def stats(self):
+        return self.call('stats')
+
+    def metrics(self):
+        return self.call('metrics')
+
+    def resources(self, seconds=None, history=False):
+        return self.call('resources', seconds=seconds, history=history)
+
+    def retention(self):
+        return self.call('retention')
+
+    def catalog(self, start=None, end=None, kind=None, monitor=None, capture_format=None, limit=1000):
+        return self.call('catalog', start=start, end=end, kind=kind, monitor=monitor, format=capture_format,
+                         limit=limit)
+
+    def thumbnails(self, start=None, end=None, limit=1000, data=False):
+        return self.call('thumbnails', start=start, end=end, limit=limit, data=data)
+
+    def timelapse(self, start=None, end=None, output=None, wait=False):
+        return self.call('timelapse', start=start, end=end, output=output, wait=wait)
+
+    def export_frame(self, time=None, frame=None, index=None, output=None):
+        return self.call('export_frame', time=time, frame=frame, index=index, output=output)
+
+    def trace_dump(self):
+        return self.call('trace_dump')
+
+
+def run_bench(client, count, cmd):
+    """Send COUNT requests over one connection and report throughput and latency"""
+    latencies = []
+    pixels = []
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        response = client.request(cmd)
+        latencies.append((time.perf_counter() - sent) * 1000)
+        if response.get('pixels_ms') is not None:
+            pixels.append(response['pixels_ms'])
+        if not response.get('ok'):
+            raise ControlError(response.get('error', 'Unknown error'))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        'cmd': cmd,
+        'requests': count,
+        'requests_per_s': round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        'max_ms': round(latencies[-1], 3),
+    }
+    if pixels:
+        pixels.sort()
+        result['pixels_p50_ms'] = round(pixels[len(pixels) // 2], 3)
+    return result
+
+
+def add_command_parsers(sub):
+    """Add the capture/record subcommands to an argparse subparsers object"""
+    capture = sub.add_parser('capture', help="Take a screenshot with the current settings")
+    capture.add_argument('--clipboard', action='store_true', help="Also copy to the clipboard")
+
+    region = sub.add_parser('region', help="Capture a specific region")
+    region.add_argument('x', type=int)
+    region.add_argument('y', type=int)
+    region.add_argument('width', type=int)
+    region.add_argument('height', type=int)
+    region.add_argument('--clipboard', action='store_true', help="Also copy to the clipboard")
+
+    views = sub.add_parser('views', help="Save several regions from one grab (default: capture_views setting)")
+    views.add_argument('views', nargs='*', help="NAME=X,Y,WIDTH,HEIGHT or NAME=monitor:N")
+    views.add_argument('--clipboard', action='store_true', help="Also copy the first view to the clipboard")
+
+    record = sub.add_parser('record', help="Control screen recording")
+    record.add_argument('action', choices=['start', 'stop', 'pause', 'resume'])
+
+    sub.add_parser('stats', help="Show request counts and latencies")
+    sub.add_parser('metrics', help="Show the metrics registry snapshot")
+    resources = sub.add_parser('resources', help="Show CPU, memory, thread and disk usage")
+    resources.add_argument('--seconds', type=float, help="Summarise only the last N seconds")
+    resources.add_argument('--history', action='store_true', help="Include every stored sample")
+    sub.add_parser('retention', help="Show indexed capture files, quotas and deletions")
+    catalog = sub.add_parser('catalog', help="Query the capture catalog")
+    catalog.add_argument('--from', dest='start', help="Start time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time")
+    catalog.add_argument('--to', dest='end', help="End time (HH:MM is taken on the --from date)")
+    catalog.add_argument('--kind', choices=['screenshot', 'region', 'recording', 'autovideo'])
+    catalog.add_argument('--monitor', type=int)
+    catalog.add_argument('--format', dest='capture_format')
+    catalog.add_argument('--limit', type=int, default=1000)
+    thumbnails = sub.add_parser('thumbnails', help="List cached thumbnails for a time range")
+    thumbnails.add_argument('--from', dest='start', help="Start time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time")
+    thumbnails.add_argument('--to', dest='end', help="End time (HH:MM is taken on the --from date)")
+    thumbnails.add_argument('--limit', type=int, default=1000)
+    thumbnails.add_argument('--data', action='store_true', help="Include the JPEG bytes (base64)")
+    timelapse = sub.add_parser('timelapse', help="Build a timelapse from the saved screenshots")
+    timelapse.add_argument('--from', dest='start', help="Start time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time")
+    timelapse.add_argument('--to', dest='end', help="End time (HH:MM is taken on the --from date)")
+    timelapse.add_argument('--output', help="Output video path (default: timelapse_<time>.mp4 in the save folder)")
+    timelapse.add_argument('--wait', action='store_true', help="Wait for the video and print its stats")
+    export = sub.add_parser('export_frame', help="Export a frame of a direct-to-video auto-capture session")
+    export.add_argument('--time', help="Capture time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time (default: last)")
+    export.add_argument('--frame', type=int, help="Frame number within the session instead of a time")
+    export.add_argument('--index', help="Session index file (default: the last session)")
+    export.add_argument('--output', help="Image path")
+    sub.add_parser('trace_dump', help="Write the span trace ring to the save folder")
+
+
+def request_from_args(args):
+    """Translate parsed subcommand arguments into a (cmd, args) request"""
+    if args.command == 'capture':
+        return 'capture', {'clipboard': args.clipboard}
+    if args.command == 'region':
+        return 'capture_region', {'x': args.x, 'y': args.y, 'width': args.width,
+                                  'height': args.height, 'clipboard': args.clipboard}
+    if args.command == 'views':
+        return 'capture_views', {'views': args.views or None, 'clipboard': args.clipboard}
+    if args.command == 'record':
+        return f"record_{args.action}", {}
+    if args.command == 'resources':
+        return 'resources', {'seconds': args.seconds, 'history': args.history}
+    if args.command == 'export_frame':
+        return 'export_frame', {'time': args.time, 'frame': args.frame, 'index': args.index, 'output': args.output}
+    if args.command == 'timelapse':
+        return 'timelapse', {'start': args.start, 'end': args.end, 'output': args.output, 'wait': args.wait}
+    if args.command == 'thumbnails':
+        return 'thumbnails', {'start': args.start, 'end': args.end, 'limit': args.limit, 'data': args.data}
+    if args.command == 'catalog':
+        return 'catalog', {'start': args.start, 'end': args.end, 'kind': args.kind, 'monitor': args.monitor,
+                           'format': args.capture_format, 'limit': args.limit}
+    return args.command, {}
+
+
+def print_result(result):
+    print(result if isinstance(result, str) else json.dumps(result, indent=2))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Control a running N-SnapRecorder instance")
+    parser.add_argument('--socket', help="Control socket path (default: per-user temp socket)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('ping', help="Check that the instance is responding")
+    add_command_parsers(sub)
+
+    bench = sub.add_parser('bench', help="Measure request throughput and latency")
+    bench.add_argument('count', type=int, nargs='?', default=1000)
+    bench.add_argument('--cmd', default='ping', help="Command to benchmark (default: ping)")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        # A waited-for timelapse can take minutes
+        timeout = None if getattr(args, 'wait', False) else 10.0
+        with ControlClient(args.socket, timeout) as client:
+            if args.command == 'bench':
+                result = run_bench(client, args.count, args.cmd)
+            else:
+                cmd, cmd_args = request_from_args(args)
+                result = client.call(cmd, **cmd_args)
+    except (OSError, ControlError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print_result(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
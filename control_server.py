@@ -0,0 +1,420 @@
+# control_server.py
+# Local control API for triggering captures without hotkeys
+# Dependencies: none (standard library only)
+#
+# Protocol: one JSON object per line in each direction.
+#   request:  {"id": 1, "cmd": "capture", "args": {...}}
+#   response: {"id": 1, "ok": true, "result": ..., "latency_ms": 1.2, "pixels_ms": 0.8}
+# A connection may send any number of requests; responses come back in order.
+#
+# Access control: the Unix socket file is created user-only (0600). Where AF_UNIX is
+# missing (Windows) the server listens on 127.0.0.1, which any local user can reach,
+# so each start writes a random token to a user-only file in the per-user temp
+# directory (default_token_path) and every request must carry it as "token".
+# ControlClient reads that file itself.
+
+import os
+import hmac
+import json
+import secrets
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+from metrics import REGISTRY
+from disk_writer import DISK_WRITER
+from retention import RETENTION
+from capture_catalog import CATALOG, query as catalog_query
+
+
+def default_socket_address():
+    """Default control address - a Unix socket path, or (host, port) where AF_UNIX is missing"""
+    if hasattr(socket, 'AF_UNIX'):
+        uid = os.getuid() if hasattr(os, 'getuid') else 0
+        return os.path.join(tempfile.gettempdir(), f"n-snaprecorder-{uid}.sock")
+    return ('127.0.0.1', 47653)
+
+
+def default_token_path():
+    """Per-user file holding the token of a TCP control server"""
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f"n-snaprecorder-{uid}.token")
+
+
+def write_token(path):
+    """Create a new random token in a fresh user-only file and return it"""
+    token = secrets.token_hex(16)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    # O_EXCL: never write through a file or link someone else planted at the path
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+
+def read_token(path=None):
+    """Token written by the running TCP control server, or None"""
+    try:
+        with open(path or default_token_path(), 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def encode_message(message):
+    """Encode a message as a compact JSON line"""
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def decode_message(line):
+    """Decode a JSON line into a message dict"""
+    return json.loads(line.decode('utf-8'))
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        """Serve requests on one connection until the client disconnects"""
+        server = self.server.control
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            received = time.perf_counter()
+            try:
+                request = decode_message(line)
+                if not isinstance(request, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as e:
+                response = {'id': None, 'ok': False, 'error': f"Bad request: {e}"}
+            else:
+                if server.authorized(request):
+                    response = server.dispatch(request, received)
+                else:
+                    response = {'id': request.get('id'), 'ok': False, 'error': "Unauthorized: missing or wrong token"}
+            try:
+                self.wfile.write(encode_message(response))
+                self.wfile.flush()
+            except OSError:
+                break
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class _ThreadingUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ControlServer:
+    """Serves capture/record commands over a local socket, calling the engines directly
+    from the connection threads so the Tk event loop is never in the request path."""
+
+    def __init__(self, screenshot_engine=None, recording_controller=None, address=None, token_path=None):
+        self.screenshot_engine = screenshot_engine
+        self.recording_controller = recording_controller
+        self.address = address or default_socket_address()
+        self.token_path = token_path or default_token_path()
+        self.token = None  # required on TCP only; the Unix socket is protected by its file mode
+        self.server = None
+        self.server_thread = None
+        self.started_at = None
+
+        # Extra commands registered by other components: name -> callable(args)
+        self.extra_commands = {}
+
+        # Grab time of the capture run by the current request (connections run on their own threads)
+        self.request_state = threading.local()
+
+        # Per-command stats: name -> {'count', 'errors', 'total_ms', 'max_ms', 'last_ms', 'pixels_ms'}
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+        self.commands = {
+            'ping': self._cmd_ping,
+            'capture': self._cmd_capture,
+            'capture_region': self._cmd_capture_region,
+            'capture_views': self._cmd_capture_views,
+            'record_start': self._cmd_record_start,
+            'record_stop': self._cmd_record_stop,
+            'record_pause': self._cmd_record_pause,
+            'record_resume': self._cmd_record_resume,
+            'stats': self._cmd_stats,
+            'metrics': self._cmd_metrics,
+            'trace_dump': self._cmd_trace_dump,
+            'resources': self._cmd_resources,
+            'retention': self._cmd_retention,
+            'catalog': self._cmd_catalog,
+            'thumbnails': self._cmd_thumbnails,
+            'timelapse': self._cmd_timelapse,
+            'export_frame': self._cmd_export_frame,
+        }
+
+    def register_command(self, name, handler):
+        """Register an additional command handler taking the request args dict"""
+        self.extra_commands[name] = handler
+
+    def start(self):
+        """Bind the socket and serve in a background thread"""
+        if self.server:
+            return True
+        try:
+            if isinstance(self.address, str):
+                self._remove_stale_socket()
+                self.server = _ThreadingUnixServer(self.address, _ControlRequestHandler)
+                os.chmod(self.address, 0o600)
+            else:
+                # Written before listening, so a client that can connect finds the new token
+                self.token = write_token(self.token_path)
+                self.server = _ThreadingTCPServer(tuple(self.address), _ControlRequestHandler)
+        except Exception as e:
+            print(f"Error starting control server: {e}")
+            self.server = None
+            return False
+
+        self.server.control = self
+        self.started_at = time.time()
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        return True
+
+    def stop(self):
+        """Stop serving and remove the socket file"""
+        if not self.server:
+            return
+        try:
+            self.server.shutdown()
+            self.server.server_close()
+        except Exception as e:
+            print(f"Error stopping control server: {e}")
+        self.server = None
+        paths = [self.address] if isinstance(self.address, str) else []
+        if self.token:
+            paths.append(self.token_path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.token = None
+
+    def authorized(self, request):
+        """True if a socket request may run (always on the Unix socket; with the token on TCP)"""
+        if self.token is None:
+            return True
+        return hmac.compare_digest(str(request.get('token') or ''), self.token)
+
+    def _remove_stale_socket(self):
+        """Remove a socket file left behind by a process that is no longer listening"""
+        if not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.address)
+        except OSError:
+            os.remove(self.address)
+        else:
+            raise OSError(f"Control socket already in use: {self.address}")
+        finally:
+            probe.close()
+
+    def dispatch(self, request, received=None):
+        """Run one request and build its response"""
+        received = received or time.perf_counter()
+        request_id = request.get('id')
+        cmd = request.get('cmd')
+        args = request.get('args') or {}
+
+        handler = self.commands.get(cmd) or self.extra_commands.get(cmd)
+        if handler is None:
+            return {'id': request_id, 'ok': False, 'error': f"Unknown command: {cmd}"}
+
+        response = {'id': request_id}
+        self.request_state.grab_time = None
+        try:
+            response['result'] = handler(args)
+            response['ok'] = True
+        except Exception as e:
+            response['ok'] = False
+            response['error'] = str(e)
+
+        finished = time.perf_counter()
+        response['latency_ms'] = round((finished - received) * 1000, 3)
+
+        # Request -> pixels: time until the engine finished grabbing this request's frame
+        pixels_ms = None
+        grab_time = self.request_state.grab_time
+        if grab_time is not None:
+            pixels_ms = round((grab_time - received) * 1000, 3)
+            response['pixels_ms'] = pixels_ms
+
+        self._record_stats(cmd, response['ok'], response['latency_ms'], pixels_ms)
+        return response
+
+    def _record_stats(self, cmd, ok, latency_ms, pixels_ms):
+        with self.stats_lock:
+            entry = self.stats.setdefault(cmd, {
+                'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'last_ms': 0.0, 'pixels_ms': None,
+            })
+            entry['count'] += 1
+            if not ok:
+                entry['errors'] += 1
+            entry['total_ms'] += latency_ms
+            entry['max_ms'] = max(entry['max_ms'], latency_ms)
+            entry['last_ms'] = latency_ms
+            if pixels_ms is not None:
+                entry['pixels_ms'] = pixels_ms
+
+    def _require_screenshot_engine(self):
+        if not self.screenshot_engine:
+            raise RuntimeError("Screenshot engine not available")
+        return self.screenshot_engine
+
+    def _require_recording_controller(self):
+        if not self.recording_controller:
+            raise RuntimeError("Recording engine not available")
+        return self.recording_controller
+
+    def _cmd_ping(self, args):
+        return 'pong'
+
+    def _cmd_capture(self, args):
+        engine = self._require_screenshot_engine()
+        timing = {}
+        filename = engine.manual_capture(clipboard=bool(args.get('clipboard', False)), timing=timing)
+        self.request_state.grab_time = timing.get('grab_time')
+        if not filename:
+            raise RuntimeError("Capture failed")
+        self._wait_written(args, [filename])
+        return filename
+
+    def _cmd_capture_region(self, args):
+        engine = self._require_screenshot_engine()
+        try:
+            x, y = int(args['x']), int(args['y'])
+            width, height = int(args['width']), int(args['height'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("capture_region needs integer x, y, width, height")
+        timing = {}
+        filename = engine.capture_region(x, y, width, height,
+                                         clipboard=bool(args.get('clipboard', False)), timing=timing)
+        self.request_state.grab_time = timing.get('grab_time')
+        if not filename:
+            raise RuntimeError("Region capture failed")
+        self._wait_written(args, [filename])
+        return filename
+
+    def _cmd_capture_views(self, args):
+        # views: list of view dicts or "name=x,y,w,h" strings; default is the capture_views setting
+        engine = self._require_screenshot_engine()
+        timing = {}
+        paths = engine.capture_views(args.get('views'), clipboard=bool(args.get('clipboard', False)),
+                                     timing=timing)
+        self.request_state.grab_time = timing.get('grab_time')
+        if not paths:
+            raise RuntimeError("View capture failed")
+        self._wait_written(args, paths)
+        return paths
+
+    def _wait_written(self, args, paths):
+        # Screenshots are written behind; unless the caller opts out with "wait": false,
+        # only answer once this request's files are on disk so the returned paths can be opened
+        if not args.get('wait', True):
+            return
+        if not DISK_WRITER.wait_written(paths, timeout=10):
+            raise RuntimeError(f"Timed out writing {', '.join(paths)}")
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"Failed to write {', '.join(missing)}")
+
+    def _cmd_record_start(self, args):
+        # Check here what start_recording() would report with a Tk dialog - this is not the Tk thread
+        controller = self._require_recording_controller()
+        if controller.is_recording:
+            raise RuntimeError("Already recording")
+        folder = controller.get_setting('folder_path')
+        if not folder:
+            raise RuntimeError("No save folder selected")
+        if DISK_WRITER.space_low(folder):
+            raise RuntimeError("Not enough free disk space in the save folder")
+        if not controller.start_recording():
+            raise RuntimeError("Recording not started")
+        return True
+
+    def _cmd_record_stop(self, args):
+        return self._require_recording_controller().stop_recording()
+
+    def _cmd_record_pause(self, args):
+        return self._require_recording_controller().pause_recording()
+
+    def _cmd_record_resume(self, args):
+        return self._require_recording_controller().resume_recording()
+
+    def _cmd_stats(self, args):
+        with self.stats_lock:
+            commands = {}
+            for name, entry in self.stats.items():
+                commands[name] = dict(entry)
+                commands[name]['avg_ms'] = round(entry['total_ms'] / entry['count'], 3) if entry['count'] else 0.0
+        result = {
+            'uptime_s': round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+            'commands': commands,
+        }
+        if self.screenshot_engine:
+            result['auto_capturing'] = bool(self.screenshot_engine.is_capturing)
+        if self.recording_controller:
+            result['recording'] = bool(self.recording_controller.is_recording)
+            result['paused'] = bool(getattr(self.recording_controller, 'is_paused', False))
+        return result
+
+    def _cmd_metrics(self, args):
+        return REGISTRY.snapshot()
+
+    def _cmd_resources(self, args):
+        seconds = args.get('seconds')
+        return self._require_screenshot_engine().get_resource_stats(
+            float(seconds) if seconds else None, bool(args.get('history')))
+
+    def _cmd_retention(self, args):
+        return RETENTION.get_stats()
+
+    def _cmd_catalog(self, args):
+        engine = self._require_screenshot_engine()
+        # Rows still queued for insertion should show up in the answer
+        CATALOG.flush(timeout=2)
+        monitor = args.get('monitor')
+        return catalog_query(engine.catalog_db_path(), args.get('start'), args.get('end'), args.get('kind'),
+                             int(monitor) if monitor is not None else None, args.get('format'),
+                             args.get('path'), int(args.get('limit') or 1000))
+
+    def _cmd_thumbnails(self, args):
+        return self._require_screenshot_engine().get_thumbnails(
+            args.get('start'), args.get('end'), int(args.get('limit') or 1000), bool(args.get('data')))
+
+    def _cmd_timelapse(self, args):
+        result = self._require_screenshot_engine().start_timelapse(
+            args.get('start'), args.get('end'), args.get('output'), bool(args.get('wait')))
+        if not result:
+            raise RuntimeError("Timelapse not started (no save folder or already running)")
+        return result
+
+    def _cmd_export_frame(self, args):
+        frame = args.get('frame')
+        path = self._require_screenshot_engine().export_video_frame(
+            args.get('time'), int(frame) if frame is not None else None, args.get('index'), args.get('output'))
+        if not path:
+            raise RuntimeError("Frame export failed")
+        return path
+
+    def _cmd_trace_dump(self, args):
+        path = self._require_screenshot_engine().dump_trace()
+        if not path:
+            raise RuntimeError("Tracing is not enabled")
+        return path
@@ -0,0 +1,109 @@
+# cpu_scheduling.py
+# Per-thread CPU affinity and priority helpers for the recorder worker threads
+# Dependencies: none (standard library only; Windows uses kernel32 via ctypes)
+#
+# Linux schedules threads individually, so affinity (sched_setaffinity) and nice
+# (setpriority on the native thread id) apply to the calling thread only and end
+# with it - nothing needs restoring after a recording. On Windows the equivalent
+# SetThreadAffinityMask / SetThreadPriority calls are used. Other platforms (macOS)
+# have no per-thread affinity; the calls are skipped with a single notice.
+
+import os
+import sys
+import threading
+
+_reported = set()
+
+
+def _notice_once(key, message):
+    if key not in _reported:
+        _reported.add(key)
+        print(message)
+
+
+def parse_cpu_list(text):
+    """Parse '0-3,6' (or a list of ints) into a sorted list of CPU indexes; empty means no restriction"""
+    if not text:
+        return []
+    if isinstance(text, (list, tuple, set)):
+        return sorted({int(c) for c in text})
+    cpus = set()
+    for part in str(text).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def _windows_kernel32():
+    import ctypes
+    return ctypes.windll.kernel32
+
+
+def set_thread_affinity(cpus):
+    """Restrict the calling thread to cpus; returns True if applied"""
+    cpus = parse_cpu_list(cpus)
+    if not cpus:
+        return False
+    available = os.cpu_count() or 1
+    cpus = [c for c in cpus if c < available]
+    if not cpus:
+        _notice_once('affinity-range', f"CPU affinity ignored: no CPUs below {available} in the mask")
+        return False
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)  # 0 = calling thread on Linux
+            return True
+        if sys.platform == 'win32':
+            kernel32 = _windows_kernel32()
+            mask = sum(1 << c for c in cpus)
+            return bool(kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask))
+    except OSError as e:
+        print(f"Error setting CPU affinity: {e}")
+        return False
+    _notice_once('affinity', "Per-thread CPU affinity is not supported on this platform")
+    return False
+
+
+def set_thread_nice(nice):
+    """Lower (positive nice) the scheduling priority of the calling thread; returns True if applied"""
+    nice = int(nice or 0)
+    if not nice:
+        return False
+    try:
+        if sys.platform.startswith('linux'):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+            return True
+        if sys.platform == 'win32':
+            # Map nice onto thread priorities: BELOW_NORMAL (-1) or LOWEST (-2); negative -> ABOVE_NORMAL (1)
+            priority = -2 if nice >= 10 else -1 if nice > 0 else 1
+            kernel32 = _windows_kernel32()
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), priority))
+    except (OSError, AttributeError) as e:
+        print(f"Error setting thread priority: {e}")
+        return False
+    _notice_once('nice', "Per-thread priority is not supported on this platform")
+    return False
+
+
+def apply_thread_scheduling(cpus=None, nice=0):
+    """Apply affinity and nice to the calling thread (call at the top of a worker thread)"""
+    set_thread_affinity(cpus)
+    set_thread_nice(nice)
+
+
+def apply_process_scheduling(pid, cpus=None, nice=0):
+    """Apply affinity and nice to a child process (e.g. the ffmpeg encoder)"""
+    cpus = [c for c in parse_cpu_list(cpus) if c < (os.cpu_count() or 1)]
+    try:
+        if cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(pid, cpus)
+        if nice and hasattr(os, 'setpriority'):
+            os.setpriority(os.PRIO_PROCESS, pid, int(nice))
+    except OSError as e:
+        print(f"Error setting encoder process scheduling: {e}")
@@ -0,0 +1,260 @@
+# cursor_overlay.py
+# Mouse cursor compositing for recordings (screen grabs do not include the cursor)
+# Dependencies: numpy; libXfixes via x11_lib for the real cursor (Linux/X11)
+#
+# The cursor image is cached and only fetched again (XFixesGetCursorImage) when
+# XFixes reports a shape change; per frame the only X request is XQueryPointer.
+# Blending is an integer premultiplied-alpha blend over the cursor's bounding
+# box, so its cost depends on the cursor size, not on the frame resolution.
+#
+# Sources:
+#   auto      - XFixes on X11; recording continues without a cursor elsewhere
+#   synthetic - a drawn arrow moving over the frame (benchmarks, tests)
+#
+#     python cursor_overlay.py --resolutions 1920x1080,3840x2160    # per-frame overhead
+
+import sys
+import json
+import time
+import ctypes
+import argparse
+
+import numpy as np
+
+
+class CursorImage:
+    """Premultiplied cursor pixels prepared for blend_cursor"""
+
+    def __init__(self, bgra, xhot=0, yhot=0, serial=0):
+        bgra = np.ascontiguousarray(bgra, dtype=np.uint8)
+        self.height, self.width = bgra.shape[:2]
+        self.xhot = xhot
+        self.yhot = yhot
+        self.serial = serial
+        # uint16 so dst * (255 - alpha) cannot overflow
+        self.color = bgra[:, :, :3].astype(np.uint16)
+        self.inverse_alpha = (255 - bgra[:, :, 3:4]).astype(np.uint16)
+
+
+def blend_cursor(frame, cursor, x, y):
+    """Blend cursor onto a BGR(A) uint8 frame in place with its top-left at (x, y).
+    Only the covered box is touched; returns it as (x0, y0, x1, y1), or None if off the frame"""
+    frame_h, frame_w = frame.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(frame_w, x + cursor.width), min(frame_h, y + cursor.height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    cx, cy = x0 - x, y0 - y
+    box = (slice(cy, cy + y1 - y0), slice(cx, cx + x1 - x0))
+    dst = frame[y0:y1, x0:x1, :3]
+    dst[...] = cursor.color[box] + (dst * cursor.inverse_alpha[box] + 127) // 255
+    return x0, y0, x1, y1
+
+
+def arrow_cursor(size=20):
+    """A black-outlined white arrow as a premultiplied CursorImage (hotspot at the tip)"""
+    height, width = size, size * 2 // 3
+    rows = np.arange(height)[:, None]
+    cols = np.arange(width)[None, :]
+    inside = ((cols <= rows * 0.6) & (rows < height * 0.8)) | ((cols <= 2) & (rows < height))
+    # Outline: inside pixels with a 4-neighbour outside
+    padded = np.pad(inside, 1)
+    interior = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+    edge = inside & ~interior
+    bgra = np.zeros((height, width, 4), dtype=np.uint8)
+    bgra[inside] = (255, 255, 255, 255)
+    bgra[edge] = (0, 0, 0, 255)
+    return CursorImage(bgra)
+
+
+class SyntheticCursorSource:
+    """Arrow cursor moving along a fixed path over a width x height screen"""
+
+    name = 'synthetic'
+
+    def __init__(self, width=1920, height=1080, step=7):
+        self.width = width
+        self.height = height
+        self.step = step
+        self.image = arrow_cursor()
+        self.position = 0
+
+    def poll(self):
+        """(CursorImage, x, y) of the cursor's top-left in screen coordinates"""
+        self.position += self.step
+        x = (self.position * 3) % max(1, self.width)
+        y = (self.position * 2) % max(1, self.height)
+        return self.image, x - self.image.xhot, y - self.image.yhot
+
+    def close(self):
+        pass
+
+
+class XFixesCursorSource:
+    """Real cursor on X11. The image is refetched only after a DisplayCursorNotify event"""
+
+    name = 'xfixes'
+
+    def __init__(self, display=None):
+        import x11_lib
+        self.x11_lib = x11_lib
+        self.x11 = x11_lib.load()
+        self.x11.require('cursor')
+        self.display = x11_lib.open_display(display)
+        try:
+            event_base, error_base = ctypes.c_int(), ctypes.c_int()
+            if not self.x11.XFixesQueryExtension(self.display, ctypes.byref(event_base), ctypes.byref(error_base)):
+                raise x11_lib.X11Error("XFIXES extension not available")
+            self.cursor_event = event_base.value + x11_lib.XFixesDisplayCursorNotify
+            self.root = self.x11.XRootWindow(self.display, self.x11.XDefaultScreen(self.display))
+            self.x11.XFixesSelectCursorInput(self.display, self.root, x11_lib.XFixesDisplayCursorNotifyMask)
+            self.x11.XFlush(self.display)
+        except Exception:
+            self.close()
+            raise
+        self.event = x11_lib.XEvent()
+        self.image = None
+        self.stats = {'shape_fetches': 0, 'polls': 0}
+
+    def _shape_changed(self):
+        x11 = self.x11
+        changed = False
+        while x11.XEventsQueued(self.display, self.x11_lib.QueuedAfterReading) > 0:
+            x11.XNextEvent(self.display, ctypes.byref(self.event))
+            if self.event.type == self.cursor_event:
+                changed = True
+        return changed
+
+    def _fetch(self):
+        """Fetch the current cursor image; returns its hotspot position"""
+        x11 = self.x11
+        cursor = x11.XFixesGetCursorImage(self.display)
+        if not cursor:
+            raise self.x11_lib.X11Error("XFixesGetCursorImage failed")
+        try:
+            info = cursor.contents
+            count = info.width * info.height
+            # One unsigned long per pixel holding 32-bit ARGB (little endian: B, G, R, A)
+            longs = np.ctypeslib.as_array(info.pixels, shape=(count,))
+            bgra = longs.astype(np.uint32).view(np.uint8).reshape(info.height, info.width, 4)
+            self.image = CursorImage(bgra, info.xhot, info.yhot, info.cursor_serial)
+            self.stats['shape_fetches'] += 1
+            return info.x, info.y
+        finally:
+            x11.XFree(cursor)
+
+    def poll(self):
+        """(CursorImage, x, y) of the cursor's top-left in root coordinates"""
+        self.stats['polls'] += 1
+        if self.image is None or self._shape_changed():
+            x, y = self._fetch()
+        else:
+            root, child = ctypes.c_ulong(), ctypes.c_ulong()
+            root_x, root_y, win_x, win_y, mask = (ctypes.c_int(), ctypes.c_int(), ctypes.c_int(),
+                                                  ctypes.c_int(), ctypes.c_uint())
+            self.x11.XQueryPointer(self.display, self.root, ctypes.byref(root), ctypes.byref(child),
+                                   ctypes.byref(root_x), ctypes.byref(root_y), ctypes.byref(win_x),
+                                   ctypes.byref(win_y), ctypes.byref(mask))
+            x, y = root_x.value, root_y.value
+        return self.image, x - self.image.xhot, y - self.image.yhot
+
+    def close(self):
+        if self.display:
+            self.x11_lib.close_display(self.display)
+            self.display = None
+
+
+# Sources already reported as unavailable (print the reason once, not per recording)
+_reported = set()
+
+
+def create_cursor_source(kind='auto', display=None):
+    """Cursor source by name, or None (after printing why once) when it cannot start"""
+    if kind == 'synthetic':
+        return SyntheticCursorSource()
+    try:
+        return XFixesCursorSource(display)
+    except Exception as e:
+        if kind not in _reported:
+            _reported.add(kind)
+            print(f"Cursor overlay unavailable ({e}), recording without cursor")
+        return None
+
+
+class CursorOverlay:
+    """Samples the cursor once per frame and draws it. A sample is hashable, so callers can
+    tell whether an unchanged screen still needs a new frame because the cursor moved"""
+
+    def __init__(self, source):
+        self.source = source
+        self.stats = {'frames': 0, 'drawn': 0, 'blend_s': 0.0, 'poll_s': 0.0}
+
+    def sample(self, origin):
+        """(image, x, y) relative to the grabbed area's top-left origin (left, top)"""
+        t0 = time.perf_counter()
+        image, x, y = self.source.poll()
+        self.stats['poll_s'] += time.perf_counter() - t0
+        return image, x - origin[0], y - origin[1]
+
+    @staticmethod
+    def key(sample):
+        image, x, y = sample
+        return id(image), x, y
+
+    def draw(self, frame, sample, scale=1.0):
+        """Blend a sample onto frame in place (frame may be downscaled by scale)"""
+        t0 = time.perf_counter()
+        image, x, y = sample
+        drawn = blend_cursor(frame, image, int(x * scale), int(y * scale))
+        self.stats['frames'] += 1
+        self.stats['drawn'] += drawn is not None
+        self.stats['blend_s'] += time.perf_counter() - t0
+        return frame
+
+    def close(self):
+        self.source.close()
+
+
+def benchmark(resolutions, frames=500, source='synthetic'):
+    """Per-frame cost of sampling + blending the cursor, per resolution"""
+    results = {}
+    for width, height in resolutions:
+        cursor_source = SyntheticCursorSource(width, height) if source == 'synthetic' \
+            else create_cursor_source(source)
+        if cursor_source is None:
+            break
+        overlay = CursorOverlay(cursor_source)
+        frame = np.full((height, width, 3), 128, dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(frames):
+            overlay.draw(frame, overlay.sample((0, 0)))
+        elapsed = (time.perf_counter() - start) / frames
+        # A full-frame copy for scale: what the overlay would cost if it touched every pixel
+        start = time.perf_counter()
+        for _ in range(20):
+            frame.copy()
+        copy_s = (time.perf_counter() - start) / 20
+        results[f"{width}x{height}"] = {
+            'cursor_us': round(elapsed * 1e6, 1),
+            'poll_us': round(overlay.stats['poll_s'] / frames * 1e6, 1),
+            'blend_us': round(overlay.stats['blend_s'] / frames * 1e6, 1),
+            'frame_copy_us': round(copy_s * 1e6, 1),
+        }
+        overlay.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the per-frame cost of the cursor overlay")
+    parser.add_argument('--resolutions', default='1280x720,1920x1080,3840x2160')
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--source', choices=['synthetic', 'auto'], default='synthetic',
+                        help="auto = real XFixes cursor (needs a display)")
+    args = parser.parse_args(argv)
+    sizes = [tuple(int(v) for v in item.lower().split('x')) for item in args.resolutions.split(',')]
+    print(json.dumps(benchmark(sizes, args.frames, args.source), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,335 @@
+# disk_writer.py
+# Shared write-behind disk writer with fsync policy, throughput metrics and a free-space watchdog
+# Dependencies: none (standard library only)
+#
+# Capture threads hand finished bytes to DISK_WRITER and return immediately; one
+# writer thread performs the actual I/O in large block-aligned chunks on unbuffered
+# files. Two kinds of writes are supported:
+#
+#     DISK_WRITER.write_file(path, data, callback)   # whole file (screenshots)
+#     f = DISK_WRITER.open(path); f.write(...); f.close()   # streamed, file-like (WAV audio)
+#
+# fsync policy ('disk_fsync'): 'never', 'close' (before a file is closed) or
+# 'interval' (also every fsync_interval seconds while a file is open).
+#
+# The watchdog side - space_low(folder) - compares the folder's free space minus
+# bytes still queued against reserve_bytes, so engines can stop or pause before
+# the disk is actually full. Video frames are written by the encoders themselves
+# (OpenCV / ffmpeg); the recorder uses space_low() to close them cleanly in time.
+
+import os
+import time
+import shutil
+import threading
+from collections import deque
+
+from metrics import REGISTRY
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+BYTES_WRITTEN = REGISTRY.counter('nsnap_disk_bytes_written', 'Bytes written by the write-behind disk writer')
+WRITE_SECONDS = REGISTRY.histogram('nsnap_disk_write_seconds', 'Duration of one write-behind write call')
+FSYNC_SECONDS = REGISTRY.histogram('nsnap_disk_fsync_seconds', 'Duration of fsync calls')
+WRITE_ERRORS = REGISTRY.counter('nsnap_disk_write_errors', 'Failed write-behind operations')
+PENDING_BYTES = REGISTRY.gauge('nsnap_disk_pending_bytes', 'Bytes queued for the disk writer')
+
+ALIGNMENT = 4096
+FSYNC_POLICIES = ('never', 'close', 'interval')
+
+
+class WriteBehindFile:
+    """File-like handle whose writes are buffered and performed by the DiskWriter thread.
+    Supports the write/tell/seek/flush/close subset used by wave and similar writers."""
+
+    def __init__(self, writer, path):
+        self.writer = writer
+        self.path = path
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+        self.error = None
+        self.file = None         # opened lazily by the writer thread
+        self.last_sync = time.monotonic()
+        self.done = threading.Event()
+
+    def _check(self):
+        if self.error:
+            raise OSError(f"Write to {self.path} failed: {self.error}")
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+    def write(self, data):
+        self._check()
+        self.buffer += data
+        self.position += len(data)
+        if len(self.buffer) >= self.writer.buffer_size:
+            # Hand over whole aligned blocks; the remainder waits for more data
+            size = len(self.buffer) // ALIGNMENT * ALIGNMENT
+            self.writer._submit(('write', self, bytes(self.buffer[:size])))
+            del self.buffer[:size]
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        self._check()
+        if whence != 0:
+            raise ValueError("Only absolute seeks are supported")
+        self.flush()
+        self.writer._submit(('seek', self, offset))
+        self.position = offset
+        return offset
+
+    def flush(self):
+        if self.buffer:
+            self.writer._submit(('write', self, bytes(self.buffer)))
+            self.buffer.clear()
+
+    def close(self, wait=True):
+        """Queue the remaining data and close; with wait, block until it is on disk"""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.writer._submit(('close', self, None))
+        if wait:
+            self.done.wait()
+            if self.error:
+                raise OSError(f"Write to {self.path} failed: {self.error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DiskWriter:
+    def __init__(self):
+        self.buffer_size = 1024 * 1024         # bytes buffered per file before a write
+        self.max_pending_bytes = 256 * 1024 * 1024
+        self.fsync = 'close'
+        self.fsync_interval = 5.0
+        self.reserve_bytes = 500 * 1024 * 1024
+        self.check_interval = 2.0              # seconds a free-space reading stays valid
+
+        self.operations = deque()
+        self.condition = threading.Condition()
+        self.pending_bytes = 0
+        self.pending_files = {}                # path -> queued whole-file writes
+        self.busy = False
+        self.thread = None
+        self.free_space = {}                   # folder -> (monotonic time, free bytes)
+
+        self.stats = {
+            'bytes_written': 0,
+            'writes': 0,
+            'files_written': 0,
+            'fsyncs': 0,
+            'errors': 0,
+            'write_s': 0.0,
+            'max_pending_bytes': 0,
+            'last_error': None,
+        }
+
+    def configure(self, fsync=None, fsync_interval=None, reserve_mb=None, buffer_kb=None, max_pending_mb=None):
+        """Apply settings; None leaves a value unchanged"""
+        if fsync is not None:
+            if fsync not in FSYNC_POLICIES:
+                raise ValueError(f"Unknown fsync policy: {fsync}")
+            self.fsync = fsync
+        if fsync_interval is not None:
+            self.fsync_interval = max(0.1, float(fsync_interval))
+        if reserve_mb is not None:
+            self.reserve_bytes = max(0, int(float(reserve_mb) * 1024 * 1024))
+        if buffer_kb is not None:
+            self.buffer_size = max(ALIGNMENT, int(buffer_kb) * 1024 // ALIGNMENT * ALIGNMENT)
+        if max_pending_mb is not None:
+            self.max_pending_bytes = max(self.buffer_size, int(max_pending_mb) * 1024 * 1024)
+
+    # -- submitting ---------------------------------------------------------
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='DiskWriter', daemon=True)
+            self.thread.start()
+
+    def _submit(self, operation):
+        size = len(operation[2]) if operation[0] in ('write', 'file') else 0
+        with self.condition:
+            self._ensure_thread()
+            # Backpressure: block producers while too much data is queued
+            while size and self.pending_bytes and self.pending_bytes + size > self.max_pending_bytes:
+                self.condition.wait()
+            self.operations.append(operation)
+            if operation[0] == 'file':
+                self.pending_files[operation[1]] = self.pending_files.get(operation[1], 0) + 1
+            self.pending_bytes += size
+            self.stats['max_pending_bytes'] = max(self.stats['max_pending_bytes'], self.pending_bytes)
+            PENDING_BYTES.set(self.pending_bytes)
+            self.condition.notify_all()
+
+    def open(self, path):
+        """Open path for streamed write-behind writing"""
+        return WriteBehindFile(self, path)
+
+    def write_file(self, path, data, callback=None):
+        """Queue a whole file; callback(path, error) runs on the writer thread when done"""
+        self._submit(('file', path, data, callback))
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued operation has completed; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while self.operations or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def wait_written(self, paths, timeout=None):
+        """Block until the queued write_file() calls for paths have completed (written or failed);
+        returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while any(path in self.pending_files for path in paths):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    # -- writer thread ------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.operations:
+                    self.condition.wait()
+                operation = self.operations.popleft()
+                self.busy = True
+            try:
+                self._execute(operation)
+            finally:
+                size = len(operation[2]) if operation[0] in ('write', 'file') else 0
+                with self.condition:
+                    self.pending_bytes -= size
+                    if operation[0] == 'file':
+                        remaining = self.pending_files.pop(operation[1]) - 1
+                        if remaining:
+                            self.pending_files[operation[1]] = remaining
+                    self.busy = False
+                    PENDING_BYTES.set(self.pending_bytes)
+                    self.condition.notify_all()
+
+    def _write_all(self, file, data):
+        view = memoryview(data)
+        t0 = time.perf_counter()
+        while view:
+            written = file.write(view)
+            view = view[written:]
+        elapsed = time.perf_counter() - t0
+        self.stats['bytes_written'] += len(data)
+        self.stats['writes'] += 1
+        self.stats['write_s'] += elapsed
+        BYTES_WRITTEN.inc(len(data))
+        WRITE_SECONDS.observe(elapsed)
+
+    def _sync(self, file):
+        t0 = time.perf_counter()
+        os.fsync(file.fileno())
+        self.stats['fsyncs'] += 1
+        FSYNC_SECONDS.observe(time.perf_counter() - t0)
+
+    def _failed(self, path, error):
+        self.stats['errors'] += 1
+        self.stats['last_error'] = f"{path}: {error}"
+        WRITE_ERRORS.inc()
+        print(f"Error writing {path}: {error}")
+
+    def _execute(self, operation):
+        kind = operation[0]
+        if kind == 'file':
+            _, path, data, callback = operation
+            error = None
+            try:
+                with open(path, 'wb', buffering=0) as file:
+                    self._write_all(file, data)
+                    if self.fsync != 'never':
+                        self._sync(file)
+                self.stats['files_written'] += 1
+            except OSError as e:
+                error = e
+                self._failed(path, e)
+            if callback:
+                try:
+                    callback(path, error)
+                except Exception as e:
+                    print(f"Error in write callback: {e}")
+            return
+
+        _, handle, argument = operation
+        if handle.error:
+            if kind == 'close':
+                handle.done.set()
+            return
+        try:
+            if handle.file is None:
+                handle.file = open(handle.path, 'wb', buffering=0)
+            if kind == 'write':
+                self._write_all(handle.file, argument)
+                if self.fsync == 'interval' and time.monotonic() - handle.last_sync >= self.fsync_interval:
+                    self._sync(handle.file)
+                    handle.last_sync = time.monotonic()
+            elif kind == 'seek':
+                handle.file.seek(argument)
+            elif kind == 'close':
+                if self.fsync != 'never':
+                    self._sync(handle.file)
+                handle.file.close()
+                self.stats['files_written'] += 1
+        except OSError as e:
+            handle.error = e
+            self._failed(handle.path, e)
+            try:
+                if handle.file:
+                    handle.file.close()
+            except OSError:
+                pass
+        if kind == 'close':
+            handle.done.set()
+
+    # -- watchdog -----------------------------------------------------------
+
+    def free_bytes(self, folder):
+        """Free bytes on folder's volume (cached for check_interval seconds); None if unknown"""
+        if not folder:
+            return None
+        now = time.monotonic()
+        cached = self.free_space.get(folder)
+        if cached and now - cached[0] < self.check_interval:
+            return cached[1]
+        try:
+            free = shutil.disk_usage(folder).free
+        except OSError:
+            free = None
+        self.free_space[folder] = (now, free)
+        return free
+
+    def space_low(self, folder):
+        """True when folder's free space, minus bytes still queued, is below the reserve"""
+        free = self.free_bytes(folder)
+        if free is None:
+            return False
+        return free - self.pending_bytes < self.reserve_bytes
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['pending_bytes'] = self.pending_bytes
+        stats['write_mb_per_s'] = (stats['bytes_written'] / stats['write_s'] / 1e6) if stats['write_s'] else 0.0
+        return stats
+
+
+# Process-wide writer shared by the engines
+DISK_WRITER = DiskWriter()
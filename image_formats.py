@@ -0,0 +1,361 @@
+# image_formats.py
+# Still-image encoders for screenshots: PNG (tunable level), JPG, BMP, WebP and QOI
+# Dependencies: pillow, numpy; optional qoi (pip install qoi) for fast QOI encoding
+#
+# capture_format picks the format; the knobs come from the engine settings:
+#     png   - png_compress_level 0-9, png_optimize (slow extra pass, the old default),
+#             png_palette: off, exact (indexed PNG when the frame has <= 256 colours) or
+#             lossy (otherwise also try a 256 colour quantization, kept if its PSNR is
+#             at least png_palette_min_psnr dB)
+#     jpg   - capture_quality
+#     webp  - webp_lossless, webp_quality (lossy quality / lossless effort), webp_method 0-6 (0 = fastest)
+#     qoi   - lossless, no knobs; uses the qoi package (C) and falls back to Pillow's much slower writer
+#     bmp   - uncompressed
+#     auto  - per capture: a downsampled copy of the frame is measured (distinct colours,
+#             flat neighbour pixels per tile, edge density) in a few ms; UI/text-like
+#             frames are saved lossless (auto_lossless_format, PNG at auto_png_level
+#             without the optimize pass), photo/video-like frames lossy
+#             (auto_lossy_format at quality auto_fidelity; auto_fidelity 100 = always lossless)
+#
+# Benchmark encode time and size per format on screenshots (or a synthetic corpus):
+#     python image_formats.py [FOLDER] [--count 20] [--formats "png:level=1 webp:lossless,method=0 qoi"]
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import statistics
+
+import numpy as np
+from PIL import Image, features
+
+try:
+    import qoi
+except ImportError:
+    qoi = None
+
+FORMATS = ('png', 'jpg', 'jpeg', 'bmp', 'webp', 'qoi', 'auto')
+
+# Settings that affect encoding, with their defaults
+DEFAULT_OPTIONS = {
+    'capture_quality': 95,
+    'png_compress_level': 9,
+    'png_optimize': True,
+    'png_palette': 'off',
+    'png_palette_min_psnr': 40.0,
+    'webp_lossless': False,
+    'webp_quality': 90,
+    'webp_method': 4,
+    'auto_fidelity': 90,
+    'auto_lossless_format': 'png',
+    'auto_lossy_format': 'jpg',
+    'auto_png_level': 6,
+}
+
+# auto: a frame is saved lossy when it has more than AUTO_MAX_PALETTE colours and at least
+# AUTO_PHOTO_SHARE of its tiles are photo-like (under PHOTO_TILE_FLAT equal neighbours);
+# frames with text-like edge density need AUTO_TEXT_PHOTO_SHARE
+AUTO_MAX_PALETTE = 256
+AUTO_PHOTO_SHARE = 0.5
+AUTO_TEXT_PHOTO_SHARE = 0.8
+AUTO_EDGE_SHARE = 0.08
+PHOTO_TILE_FLAT = 0.25
+# Luma step (sum of R, G, B) between neighbours counted as an edge
+EDGE_STEP = 96
+
+_warned = set()
+
+
+def encode_options(settings):
+    """Encoder options taken from an engine settings dict"""
+    return {key: settings.get(key, default) for key, default in DEFAULT_OPTIONS.items()}
+
+
+def format_available(capture_format):
+    """False when this installation cannot write capture_format (no WebP support in Pillow,
+    or neither the qoi package nor a Pillow with a QOI writer)"""
+    capture_format = capture_format.lower()
+    if capture_format == 'webp':
+        return features.check('webp')
+    if capture_format == 'qoi':
+        Image.init()
+        return qoi is not None or 'QOI' in Image.SAVE
+    return capture_format in FORMATS
+
+
+def _encode_qoi(image, buffer):
+    if qoi is not None:
+        buffer.write(qoi.encode(np.asarray(image.convert('RGB') if image.mode not in ('RGB', 'RGBA') else image)))
+        return
+    if 'qoi' not in _warned:
+        _warned.add('qoi')
+        print("qoi package not installed - using Pillow's slow QOI writer (pip install qoi)")
+    if not format_available('qoi'):
+        raise ValueError("QOI needs the qoi package (pip install qoi) or Pillow 11.3 or newer")
+    image.save(buffer, format='QOI')
+
+
+def analyze_image(image, sample_pixels=64 * 1024, tile=8):
+    """Content statistics of a nearest-neighbour downsample of image (exact colours are kept):
+    distinct colours, share of horizontally equal neighbours (flat), of strong luma steps (edges)
+    and of tiles without flat areas (photo: video, pictures, gradients)"""
+    t0 = time.perf_counter()
+    factor = max(1, math.ceil((image.width * image.height / sample_pixels) ** 0.5))
+    sample = image.resize((max(2, image.width // factor), max(1, image.height // factor)), Image.NEAREST) \
+        if factor > 1 else image
+    pixels = np.asarray(sample)
+    if pixels.ndim == 2:
+        pixels = np.repeat(pixels[:, :, None], 3, axis=2)
+    pixels = pixels[:, :, :3]
+    packed = (pixels[:, :, 0].astype(np.uint32) << 16) | (pixels[:, :, 1].astype(np.uint32) << 8) | pixels[:, :, 2]
+    flat = packed[:, 1:] == packed[:, :-1]
+    edges = np.abs(np.diff(pixels.sum(axis=2, dtype=np.int16), axis=1)) >= EDGE_STEP
+
+    rows, cols = flat.shape[0] // tile * tile, flat.shape[1] // tile * tile
+    if rows and cols:
+        tile_flat = flat[:rows, :cols].reshape(rows // tile, tile, cols // tile, tile).mean(axis=(1, 3))
+        photo = float(np.count_nonzero(tile_flat < PHOTO_TILE_FLAT)) / tile_flat.size
+    else:
+        photo = 0.0 if flat.mean() >= PHOTO_TILE_FLAT else 1.0
+    ordered = np.sort(packed, axis=None)  # sort + count steps: several times faster than np.unique here
+    return {
+        'colours': int(np.count_nonzero(ordered[1:] != ordered[:-1])) + 1,
+        'flat': round(float(flat.mean()), 3),
+        'edges': round(float(edges.mean()), 3),
+        'photo': round(photo, 3),
+        'sample': f"{sample.width}x{sample.height}",
+        'analyze_ms': round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+
+def choose_format(image, options=None):
+    """(format, encoder options, decision) for capture_format 'auto'; decision is a dict for the capture metadata"""
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    decision = analyze_image(image)
+    fidelity = int(options['auto_fidelity'])
+    # Text edges blur under lossy codecs: a frame with many of them must be almost all photo
+    photo_needed = AUTO_TEXT_PHOTO_SHARE if decision['edges'] >= AUTO_EDGE_SHARE else AUTO_PHOTO_SHARE
+    ui_like = decision['colours'] <= AUTO_MAX_PALETTE or decision['photo'] < photo_needed
+    decision['content'] = 'ui' if ui_like else 'photo'
+    if ui_like or fidelity >= 100:
+        capture_format = str(options['auto_lossless_format']).lower()
+        options.update(png_optimize=False, png_compress_level=int(options['auto_png_level']),
+                       webp_lossless=True, webp_method=0)
+        decision['quality'] = 'lossless'
+    else:
+        capture_format = str(options['auto_lossy_format']).lower()
+        options.update(capture_quality=fidelity, webp_quality=fidelity, webp_lossless=False)
+        decision['quality'] = fidelity
+    if capture_format == 'jpeg':
+        capture_format = 'jpg'
+    decision['format'] = capture_format
+    return capture_format, options, decision
+
+
+def encode_capture(image, capture_format, options=None):
+    """(bytes, format used, auto decision or None): encode_image that also resolves capture_format 'auto'"""
+    decision = None
+    if capture_format.lower() == 'auto':
+        capture_format, options, decision = choose_format(image, options)
+    return encode_image(image, capture_format, options), capture_format, decision
+
+
+def _colour_keys(image):
+    """One uint32 per pixel holding R | G << 8 | B << 16, flat"""
+    return np.frombuffer(image.tobytes('raw', 'RGBX'), dtype='<u4') & 0xFFFFFF
+
+
+def _distinct(keys, limit):
+    """Sorted distinct values of keys, or None if there are more than limit"""
+    ordered = np.sort(keys)
+    distinct = ordered[np.concatenate(([True], ordered[1:] != ordered[:-1]))]
+    return distinct if distinct.size <= limit else None
+
+
+def palette_image(image, colours=256):
+    """Exact indexed ('P') copy of an RGB image that has at most colours colours, else None.
+    A 64k pixel sample rejects most true-colour frames before the full frame is counted"""
+    if image.mode != 'RGB':
+        return None
+    factor = max(1, math.ceil((image.width * image.height / (64 * 1024)) ** 0.5))
+    if factor > 1:
+        sample = image.resize((max(1, image.width // factor), max(1, image.height // factor)), Image.NEAREST)
+        if _distinct(_colour_keys(sample), colours) is None:
+            return None
+    keys = _colour_keys(image)
+    palette = _distinct(keys, colours)
+    if palette is None:
+        return None
+    # 16 MB lookup table from colour to palette index (zero pages cost nothing until written)
+    lookup = np.zeros(1 << 24, dtype=np.uint8)
+    lookup[palette] = np.arange(palette.size, dtype=np.uint8)
+    indexed = Image.frombytes('P', image.size, lookup.take(keys).tobytes())
+    rgb = np.stack([palette & 0xFF, (palette >> 8) & 0xFF, (palette >> 16) & 0xFF], axis=1)
+    indexed.putpalette(rgb.astype(np.uint8).tobytes())
+    return indexed
+
+
+def psnr(original, approximation, row_step=4):
+    """PSNR in dB between two RGB images, measured on every row_step-th row"""
+    a = np.asarray(original)[::row_step, :, :3].astype(np.int16)
+    b = np.asarray(approximation)[::row_step, :, :3].astype(np.int16)
+    mse = float(np.mean(np.square(a - b, dtype=np.int32)))
+    return float('inf') if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def quantize_image(image, min_psnr, colours=256):
+    """256 colour (no dithering) copy of image if it keeps at least min_psnr dB, else None"""
+    quantized = image.convert('RGB').quantize(colours, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    return quantized if psnr(image, quantized.convert('RGB')) >= float(min_psnr) else None
+
+
+def png_source(image, options):
+    """Image to write as PNG: indexed when png_palette allows it, else image itself"""
+    mode = str(options.get('png_palette') or 'off').lower()
+    if mode not in ('exact', 'lossy'):
+        return image
+    indexed = palette_image(image)
+    if indexed is None and mode == 'lossy':
+        indexed = quantize_image(image, options.get('png_palette_min_psnr', 40.0))
+    return indexed if indexed is not None else image
+
+
+def encode_image(image, capture_format, options=None):
+    """Encode a PIL image and return the file bytes (a memoryview of the buffer)"""
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    capture_format = capture_format.lower()
+    if capture_format == 'auto':
+        return encode_capture(image, capture_format, options)[0]
+    buffer = io.BytesIO()
+    if capture_format in ('jpg', 'jpeg'):
+        image.convert('RGB').save(buffer, format='JPEG', quality=int(options['capture_quality']), optimize=True)
+    elif capture_format == 'bmp':
+        image.save(buffer, format='BMP')
+    elif capture_format == 'webp':
+        image.save(buffer, format='WEBP', lossless=bool(options['webp_lossless']),
+                   quality=int(options['webp_quality']), method=int(options['webp_method']))
+    elif capture_format == 'qoi':
+        _encode_qoi(image, buffer)
+    else:  # Default to PNG
+        png_source(image, options).save(buffer, format='PNG', optimize=bool(options['png_optimize']),
+                   compress_level=int(options['png_compress_level']))
+    return buffer.getbuffer()
+
+
+def read_image(path):
+    """RGB ndarray of an image file; QOI goes through the qoi package when installed"""
+    if path.lower().endswith('.qoi') and qoi is not None:
+        with open(path, 'rb') as f:
+            return qoi.decode(f.read())
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+def parse_format_spec(spec):
+    """'webp:lossless,method=0' -> ('webp', {'webp_lossless': True, 'webp_method': 0}) for benchmarks"""
+    name, _, rest = spec.partition(':')
+    name = name.strip().lower()
+    options = {}
+    for item in filter(None, rest.split(',')):
+        key, _, value = item.partition('=')
+        key = key.strip()
+        if key in ('lossless', 'optimize'):
+            options[f"{name}_{key}"] = value.lower() not in ('0', 'false', 'no') if value else True
+        elif key == 'level':
+            options['png_compress_level'] = int(value)
+            options.setdefault('png_optimize', False)
+        elif key in ('quality', 'method'):
+            options['capture_quality' if name in ('jpg', 'jpeg') else f"{name}_{key}"] = int(value)
+        elif key == 'fidelity':
+            options['auto_fidelity'] = int(value)
+        elif key == 'palette':
+            options['png_palette'] = value or 'exact'
+        elif key == 'psnr':
+            options['png_palette_min_psnr'] = float(value)
+        else:
+            raise ValueError(f"Unknown option {key!r} in {spec!r}")
+    if name not in FORMATS:
+        raise ValueError(f"Unknown format: {name}")
+    return name, options
+
+
+DEFAULT_BENCHMARK = ('png:optimize', 'png:level=6', 'png:level=1', 'png:palette=exact', 'png:palette=lossy', 'jpg:quality=95', 'bmp',
+                     'webp:quality=90,method=4', 'webp:quality=80,method=0', 'webp:lossless,method=0',
+                     'webp:lossless,method=4', 'qoi', 'auto')
+
+
+def load_corpus(folder=None, count=20, size=(1920, 1080)):
+    """[(name, RGB image)]: up to count screenshots from folder, else synthetic desktop/text/noise frames"""
+    if folder:
+        from output_layout import iter_outputs
+        from retention import KINDS
+        paths = sorted(iter_outputs(folder, KINDS['screenshots']))
+        step = max(1, len(paths) // count)
+        corpus = []
+        for path in paths[::step][:count]:
+            try:
+                with Image.open(path) as image:
+                    corpus.append((os.path.basename(path), image.convert('RGB')))
+            except OSError as e:
+                print(f"Skipping {path}: {e}", file=sys.stderr)
+        return corpus
+    from capture_backends import SyntheticBackend
+    corpus = []
+    width, height = size
+    for pattern in ('static', 'scroll', 'noise'):
+        backend = SyntheticBackend(width, height, pattern)
+        frame = backend.grab({'left': 0, 'top': 0, 'width': width, 'height': height})
+        image = Image.frombuffer('RGB', (width, height), np.ascontiguousarray(frame), 'raw', 'BGRX', 0, 1)
+        corpus.append((f"synthetic-{pattern}", image.copy()))
+    return corpus
+
+
+def benchmark(corpus, specs=DEFAULT_BENCHMARK, repeat=1):
+    """{spec: {'encode_ms_p50', 'encode_ms_mean', 'bytes_avg', 'ratio'}} over the corpus"""
+    results = {}
+    raw_bytes = statistics.mean(image.width * image.height * 3 for _, image in corpus)
+    for spec in specs:
+        capture_format, options = parse_format_spec(spec)
+        times, sizes = [], []
+        for _, image in corpus:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                data = encode_image(image, capture_format, options)
+                times.append((time.perf_counter() - t0) * 1000)
+            sizes.append(len(data))
+        results[spec] = {
+            'encode_ms_p50': round(statistics.median(times), 2),
+            'encode_ms_mean': round(statistics.mean(times), 2),
+            'bytes_avg': int(statistics.mean(sizes)),
+            'ratio': round(raw_bytes / statistics.mean(sizes), 1),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare screenshot encoders: time and size per format")
+    parser.add_argument('folder', nargs='?', help="Folder of existing screenshots (default: synthetic corpus)")
+    parser.add_argument('--count', type=int, default=20, help="Screenshots sampled from the folder")
+    parser.add_argument('--formats', default=' '.join(DEFAULT_BENCHMARK),
+                        help="Space separated specs, e.g. 'png:level=1 webp:lossless,method=0 qoi'")
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.folder, args.count)
+    if not corpus:
+        print("No screenshots found", file=sys.stderr)
+        return 1
+    results = benchmark(corpus, args.formats.split(), args.repeat)
+    print(f"{len(corpus)} image(s), qoi package: {'yes' if qoi else 'no'}", file=sys.stderr)
+    for spec, result in results.items():
+        print(f"  {spec:<28} {result['encode_ms_p50']:>8.1f} ms  {result['bytes_avg']:>10} B  "
+              f"x{result['ratio']}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,7 @@ from tkinter import filedialog, messagebox, ttk
 import threading
 from screenshot_engine import ScreenshotEngine
 from recording_controller import RecordingController
+from control_server import ControlServer
 import keyboard  # for sending the configured auto hotkeys via buttons
 
 
@@ -49,7 +50,7 @@ class ToolTip:
 
 
 class ScreenshotGUI:
-    def __init__(self):
+    def __init__(self, control_api=False):
         self.root = tk.Tk()
         self.screenshot_engine = ScreenshotEngine()
         self.recording_controller = RecordingController()
@@ -77,6 +78,37 @@ class ScreenshotGUI:
             exit_callback=self.quit_app,
         )
 
+        # Background CPU/RAM/disk sampler feeding the memory label
+        self.screenshot_engine.start_resource_monitor()
+
+        # In-process metrics registry and exporters (off by default)
+        if self.screenshot_engine.get_setting("metrics_enabled"):
+            self.screenshot_engine.start_metrics()
+        if self.screenshot_engine.get_setting("trace_enabled"):
+            self.screenshot_engine.start_tracing()
+
+        # Local control API (always on in single-instance mode, otherwise per settings)
+        self.control_server = None
+        if control_api or self.screenshot_engine.get_setting("control_api_enabled"):
+            self.start_control_server()
+
+    def start_control_server(self):
+        """Start the local socket API that drives the engines directly"""
+        if self.control_server:
+            return True
+        address = self.screenshot_engine.get_setting("control_socket_path") or None
+        server = ControlServer(self.screenshot_engine, self.recording_controller, address)
+        server.register_command("show", self._control_show_window)
+        if not server.start():
+            return False
+        self.control_server = server
+        return True
+
+    def _control_show_window(self, args):
+        """Control API 'show' command - raise the window on the Tk thread"""
+        self.root.after(0, self.show_window)
+        return True
+
     def setup_variables(self):
         """Setup tkinter variables and sync with engine settings"""
         # Screenshot vars
@@ -825,6 +857,9 @@ class ScreenshotGUI:
 
     def quit_app(self, icon=None, item=None):
         """Quit the application"""
+        if self.control_server:
+            self.control_server.stop()
+            self.control_server = None
         self.screenshot_engine.cleanup()
         self.recording_controller.cleanup()
         
@@ -842,8 +877,12 @@ class ScreenshotGUI:
         self.status_var.set(message)
 
     def update_memory(self, message):
-        """Update memory label"""
-        self.memory_var.set(message)
+        """Update memory label (called from the resource sampler thread)"""
+        self.root.after(0, self._set_memory_text, message)
+
+    def _set_memory_text(self, message):
+        """Show the resource summary on the Tk thread unless hidden"""
+        self.memory_var.set(message if self.show_memory_var.get() else "")
 
     def update_rec_status(self, message):
         """Update recording status label"""
@@ -860,15 +899,6 @@ class ScreenshotGUI:
             self.rec_pause_btn.config(state="disabled", text="⏸️ Pause")
             self.rec_stop_btn.config(state="disabled")
 
-    def update_memory_usage(self):
-        """Update memory usage display if enabled"""
-        if self.show_memory_var.get():
-            memory_info = self.screenshot_engine.get_memory_usage()
-            self.memory_var.set(memory_info)
-        else:
-            self.memory_var.set("")
-        self.root.after(5000, self.update_memory_usage)
-
     def run(self):
         """Start the GUI main loop"""
         self.root.mainloop()
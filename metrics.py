@@ -0,0 +1,339 @@
+# metrics.py
+# Lightweight in-process metrics: counters, gauges and HDR-style latency histograms
+# Dependencies: none (standard library only)
+#
+# Instruments are created once at import time by the modules that use them:
+#
+#     from metrics import REGISTRY
+#     GRAB_SECONDS = REGISTRY.histogram('nsnap_grab_seconds', 'Screen grab latency')
+#     ...
+#     GRAB_SECONDS.observe(t1 - t0)
+#
+# Recording is off until REGISTRY.enabled is set; a disabled observe()/inc() is a
+# single attribute check. Exporters write a JSON snapshot file periodically and/or
+# serve OpenMetrics text on localhost for scraping.
+
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    inner = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return '{' + inner + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labels=None):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {'value': self.value}
+
+    def openmetrics(self):
+        return [f"{self.name}_total{_label_text(self.labels)} {self.value}"]
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help_text, labels=None):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.value = 0.0
+
+    def set(self, value):
+        if not self.registry.enabled:
+            return
+        self.value = value
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def snapshot(self):
+        return {'value': self.value}
+
+    def openmetrics(self):
+        return [f"{self.name}{_label_text(self.labels)} {self.value}"]
+
+
+class Histogram:
+    """Log-linear (HDR-style) histogram of durations in seconds.
+
+    Values are recorded in microseconds into buckets that are exact below 16 us
+    and have 16 linear sub-buckets per power of two above it, so any percentile
+    is within ~6% of the true value while observe() stays O(1) with a fixed
+    array allocated up front.
+    """
+
+    kind = 'histogram'
+    SUB_BITS = 4
+    SUB_COUNT = 1 << SUB_BITS
+    MAX_SHIFT = 32  # covers well beyond an hour
+    EXPORT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, registry, name, help_text, labels=None):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.counts = [0] * (self.SUB_COUNT * (self.MAX_SHIFT + 1))
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def _index(self, micros):
+        if micros < self.SUB_COUNT:
+            return micros
+        shift = min(micros.bit_length() - self.SUB_BITS - 1, self.MAX_SHIFT - 1)
+        sub = min(micros >> shift, 2 * self.SUB_COUNT - 1) - self.SUB_COUNT
+        return self.SUB_COUNT + shift * self.SUB_COUNT + sub
+
+    def _bucket_bounds(self, index):
+        """(lower, upper) bound of a bucket in microseconds"""
+        if index < self.SUB_COUNT:
+            return index, index + 1
+        shift, sub = divmod(index - self.SUB_COUNT, self.SUB_COUNT)
+        lower = (self.SUB_COUNT + sub) << shift
+        return lower, lower + (1 << shift)
+
+    def observe(self, seconds):
+        if not self.registry.enabled:
+            return
+        index = self._index(max(0, int(seconds * 1e6)))
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, fraction):
+        """Approximate percentile in seconds (bucket midpoint)"""
+        with self.lock:
+            total = self.count
+            if not total:
+                return 0.0
+            target = max(1, int(total * fraction + 0.5))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    lower, upper = self._bucket_bounds(index)
+                    return min((lower + upper) / 2e6, self.max)
+        return self.max
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * len(self.counts)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'p50': round(self.percentile(0.5), 6),
+            'p90': round(self.percentile(0.9), 6),
+            'p99': round(self.percentile(0.99), 6),
+            'p999': round(self.percentile(0.999), 6),
+        }
+
+    def openmetrics(self):
+        with self.lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        lines = []
+        cumulative = 0
+        index = 0
+        for bound in self.EXPORT_BOUNDS:
+            limit = bound * 1e6
+            while index < len(counts) and self._bucket_bounds(index)[1] <= limit:
+                cumulative += counts[index]
+                index += 1
+            labels = dict(self.labels, le=str(bound))
+            lines.append(f"{self.name}_bucket{_label_text(labels)} {cumulative}")
+        lines.append(f"{self.name}_bucket{_label_text(dict(self.labels, le='+Inf'))} {count}")
+        lines.append(f"{self.name}_count{_label_text(self.labels)} {count}")
+        lines.append(f"{self.name}_sum{_label_text(self.labels)} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self.metrics = {}  # (name, label tuple) -> metric
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labels):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = cls(self, name, help_text, labels)
+                self.metrics[key] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text='', labels=None):
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text='', labels=None):
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text='', labels=None):
+        return self._get_or_create(Histogram, name, help_text, labels)
+
+    def snapshot(self):
+        """All metrics as a JSON-serialisable dict"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        result = {'timestamp': time.time(), 'enabled': self.enabled, 'metrics': {}}
+        for metric in metrics:
+            key = metric.name + _label_text(metric.labels)
+            entry = metric.snapshot()
+            entry['type'] = metric.kind
+            result['metrics'][key] = entry
+        return result
+
+    def openmetrics(self):
+        """All metrics in OpenMetrics text exposition format"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: (m.name, _label_text(m.labels)))
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                if metric.help:
+                    lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.extend(metric.openmetrics())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by the engines
+REGISTRY = MetricsRegistry()
+
+
+class JsonSnapshotExporter:
+    """Periodically writes REGISTRY.snapshot() to a JSON file (atomically replaced)"""
+
+    def __init__(self, path, interval=10.0, registry=None):
+        self.path = path
+        self.interval = max(0.5, float(interval))
+        self.registry = registry or REGISTRY
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def write_snapshot(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error writing metrics snapshot: {e}")
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write_snapshot()
+
+    def start(self):
+        if self.thread:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.thread:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=2)
+        self.thread = None
+        self.write_snapshot()
+
+
+class _OpenMetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path.split('?')[0] == '/metrics':
+            body = registry.openmetrics().encode('utf-8')
+            content_type = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body = json.dumps(registry.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OpenMetricsServer:
+    """Serves /metrics (OpenMetrics text) and /metrics.json on localhost"""
+
+    def __init__(self, port=9464, host='127.0.0.1', registry=None):
+        self.host = host
+        self.port = int(port)
+        self.registry = registry or REGISTRY
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        if self.server:
+            return True
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), _OpenMetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics endpoint on {self.host}:{self.port}: {e}")
+            return False
+        self.server.daemon_threads = True
+        self.server.registry = self.registry
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if not self.server:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
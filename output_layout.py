@@ -0,0 +1,104 @@
+# output_layout.py
+# Collision-free capture file names and optional date/hour sharded subfolders
+# Dependencies: none (standard library only)
+#
+# Names carry the time to the millisecond, a process-wide counter and a short
+# process tag (the pid in base 36), so two captures in the same millisecond (or
+# a clock step backwards) get different files, also when several instances
+# (--multi-instance) save to the same folder:
+#
+#     screenshot_20261019_142501_237_0042_2n9c.png
+#
+# With sharding ('output_shard' setting) files go to FOLDER/2026-10-19/ ('day')
+# or FOLDER/2026-10-19/14/ ('hour') instead of one flat folder. Shard folders
+# are created on first use and remembered, so later captures skip the mkdir.
+
+import os
+import re
+import itertools
+import threading
+from datetime import datetime
+
+SHARD_MODES = ('none', 'day', 'hour')
+# YYYYmmdd_HHMMSS with the optional _mmm of collision-free names
+NAME_TIME = re.compile(r'_(\d{8}_\d{6})(?:_(\d{3}))?')
+
+
+def process_tag(pid=None):
+    """Short base-36 form of a process id"""
+    pid = os.getpid() if pid is None else pid
+    digits = ''
+    while True:
+        pid, digit = divmod(pid, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        if not pid:
+            return digits
+
+
+class OutputLayout:
+    def __init__(self):
+        self.counter = itertools.count(1)
+        self.tag = process_tag()
+        self.created = set()           # shard folders known to exist
+        self.lock = threading.Lock()
+
+    def stem(self, prefix, when=None):
+        """Unique file name without extension, e.g. screenshot_20261019_142501_237_0042_2n9c"""
+        when = when or datetime.now()
+        sequence = next(self.counter) % 10000  # itertools.count is atomic under the GIL
+        return f"{prefix}_{when:%Y%m%d_%H%M%S}_{when.microsecond // 1000:03d}_{sequence:04d}_{self.tag}"
+
+    def directory(self, folder, shard='none', when=None):
+        """Folder for a capture taken at when, creating the shard folder on first use"""
+        if shard not in ('day', 'hour'):
+            return folder
+        when = when or datetime.now()
+        parts = [folder, f"{when:%Y-%m-%d}"]
+        if shard == 'hour':
+            parts.append(f"{when:%H}")
+        directory = os.path.join(*parts)
+        if directory not in self.created:
+            with self.lock:
+                os.makedirs(directory, exist_ok=True)
+                self.created.add(directory)
+        return directory
+
+    def reserve(self, folder, prefix, shard='none', when=None):
+        """(directory, stem) for an output made of several files sharing one name (recordings)"""
+        when = when or datetime.now()
+        return self.directory(folder, shard, when), self.stem(prefix, when)
+
+    def path(self, folder, prefix, extension, shard='none', when=None):
+        """Full path for a single-file capture"""
+        directory, stem = self.reserve(folder, prefix, shard, when)
+        return os.path.join(directory, f"{stem}.{extension}")
+
+
+def parse_output_time(path):
+    """Capture time (unix seconds) encoded in an output file name, else the file's mtime"""
+    match = NAME_TIME.search(os.path.basename(path))
+    if match:
+        try:
+            when = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+            return when.timestamp() + int(match.group(2) or 0) / 1000
+        except ValueError:
+            pass
+    return os.path.getmtime(path)
+
+
+def iter_outputs(folder, prefixes):
+    """Paths of files under folder (recursively, skipping dot-folders such as .thumbnails)
+    whose names start with one of prefixes"""
+    pending = [folder]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.'):
+                        pending.append(entry.path)
+                elif entry.name.startswith(prefixes):
+                    yield entry.path
+
+
+# Process-wide layout shared by the engines (one counter for all outputs)
+OUTPUT_LAYOUT = OutputLayout()
@@ -71,6 +71,11 @@ class RecordingController:
         """Check if recording"""
         return self.engine.is_recording
 
+    @property
+    def is_paused(self):
+        """Check if recording is paused"""
+        return self.engine.is_paused
+
     def pause_recording(self):
         """Pause recording"""
         return self.engine.pause_recording()
@@ -3,6 +3,7 @@
 # Dependencies: mss, opencv-python, sounddevice, numpy
 
 import os
+import json
 import time
 import threading
 from datetime import datetime
@@ -10,7 +11,6 @@ import gc
 from tkinter import messagebox
 
 # Recording dependencies
-import mss
 import cv2
 import numpy as np
 import sounddevice as sd
@@ -18,6 +18,50 @@ import queue
 import wave
 import subprocess
 
+from capture_backends import create_capture_backend
+from metrics import REGISTRY
+from tracing import TRACER
+from video_encoders import SegmentedVideoWriter
+from adaptive_quality import AdaptiveQualityController, build_ladder
+from cpu_scheduling import apply_thread_scheduling
+from disk_writer import DISK_WRITER
+from retention import RETENTION
+from capture_catalog import CATALOG, catalog_path_for, monitor_for_region
+from output_layout import OUTPUT_LAYOUT
+from region_views import grab_views, resolve_views, union_region
+from cursor_overlay import CursorOverlay, create_cursor_source
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+GRAB_SECONDS = REGISTRY.histogram('nsnap_grab_seconds', 'Screen grab latency', {'engine': 'recording'})
+CONVERT_SECONDS = REGISTRY.histogram('nsnap_convert_seconds', 'Pixel format conversion latency', {'engine': 'recording'})
+ENCODE_SECONDS = REGISTRY.histogram('nsnap_encode_seconds', 'Video frame encode+write latency', {'engine': 'recording'})
+FRAMES_CAPTURED = REGISTRY.counter('nsnap_record_frames_captured', 'Frames grabbed while recording')
+FRAMES_WRITTEN = REGISTRY.counter('nsnap_record_frames_written', 'Frames written to the video (including duplicates)')
+FRAMES_DROPPED = REGISTRY.counter('nsnap_record_frames_dropped', 'Frames skipped because recording fell behind')
+QUEUE_DEPTH = REGISTRY.gauge('nsnap_record_queue_depth', 'Frames waiting for the encoder thread')
+QUALITY_LEVEL = REGISTRY.gauge('nsnap_record_quality_level', 'Adaptive quality ladder step (0 = full quality)')
+ADAPTATIONS = REGISTRY.counter('nsnap_record_adaptations', 'Adaptive quality changes')
+RECORDING_ACTIVE = REGISTRY.gauge('nsnap_recording_active', '1 while a recording is running')
+AUDIO_CALLBACKS = REGISTRY.counter('nsnap_audio_callbacks', 'Audio input callbacks')
+AUDIO_STATUS_ERRORS = REGISTRY.counter('nsnap_audio_status_errors', 'Audio callbacks reporting overflow/underflow')
+CURSOR_SECONDS = REGISTRY.histogram('nsnap_cursor_seconds', 'Cursor overlay blend time per frame')
+AUDIO_QUEUE_DEPTH = REGISTRY.gauge('nsnap_audio_queue_depth', 'Audio blocks waiting to be written')
+
+
+def select_monitors(monitors, spec=''):
+    """[(index, monitor)] from an mss-style monitor list for a record_monitors setting
+    ('' = every monitor, else comma separated 1-based indices; unknown ones are ignored)"""
+    physical = list(enumerate(monitors[1:], 1))
+    if not str(spec or '').strip():
+        return physical
+    wanted = set()
+    for part in str(spec).split(','):
+        try:
+            wanted.add(int(part))
+        except ValueError:
+            continue
+    return [(index, monitor) for index, monitor in physical if index in wanted]
+
 
 class RecordingEngine:
     def __init__(self):
@@ -40,14 +84,46 @@ class RecordingEngine:
             'custom_h': 600,
             'record_audio_enabled': True,
             'audio_samplerate': 44100,
-            'audio_channels': 1
-        ,
-    'audio_device': None
-}
+            'audio_channels': 1,
+            'audio_device': None,
+            'capture_backend': 'mss',  # mss, xshm, xdamage, synthetic, replay (see capture_backends.py)
+            'capture_backend_options': {},
+            'record_encoder': 'opencv',    # opencv or ffmpeg (libx264 via pipe, see video_encoders.py)
+            'record_preset': 'veryfast',   # x264 preset for the ffmpeg encoder
+            'record_crf': 23,
+            'record_queue_size': 8,        # frames buffered between capture and encoder threads
+            'adaptive_quality_enabled': False,  # lower fps/scale/preset under CPU pressure (adaptive_quality.py)
+            'adaptive_min_fps': 10,
+            'adaptive_min_scale': 0.5,
+            'adaptive_fastest_preset': 'ultrafast',
+            'adaptive_cpu_high': 90,       # recorder process CPU % (of all cores) treated as pressure
+            'adaptive_cpu_low': 60,        # recorder process CPU % below which quality may recover
+            'record_nice': 0,              # >0 lowers the priority of recorder threads (cpu_scheduling.py)
+            'record_capture_cpus': '',     # CPU list for the capture thread, e.g. "0-1"; empty = any
+            'record_encode_cpus': '',      # CPU list for the encoder thread and ffmpeg process
+            'record_audio_cpus': '',       # CPU list for the audio writer thread
+            'record_encoder_threads': 0,   # ffmpeg -threads; 0 = encoder default
+            'record_cv_threads': 0,        # cv2.setNumThreads during recording; 0 = OpenCV default
+            'disk_overflow_folder': '',    # continue here when folder_path runs low on space; empty = stop
+            'retention_recordings_max_mb': 0,      # delete oldest recordings above this total, 0 = off
+            'retention_recordings_max_days': 0,    # delete recordings older than this, 0 = off
+            'retention_recordings_max_count': 0,   # keep at most this many recordings (with their parts and sidecars), 0 = off
+            'catalog_enabled': True,       # SQLite catalog of every output (capture_catalog.py)
+            'catalog_path': '',            # empty = capture_catalog.db in the save folder
+            'output_shard': 'none',        # none, day (FOLDER/YYYY-MM-DD/), hour (FOLDER/YYYY-MM-DD/HH/)
+            'record_monitor_mode': 'combined',  # combined (one video of the area) or per_monitor (one video per monitor)
+            'record_monitors': '',         # per_monitor: backend monitor numbers, e.g. "1,3"; empty = all
+            'record_views': [],            # named regions recorded as separate videos from one grab (region_views.py)
+            'record_cursor': False,        # draw the mouse cursor into recordings (cursor_overlay.py)
+            'record_cursor_source': 'auto',  # auto (XFixes on X11) or synthetic
+        }
 
         # Callback for UI updates
         self.status_callback = None
 
+        # Per-session counters and stage timings (see get_stats)
+        self.stats = self._new_session_stats()
+
     def set_status_callback(self, callback):
         """Set callback function for status updates"""
         self.status_callback = callback
@@ -69,6 +145,47 @@ class RecordingEngine:
         """Update multiple settings at once"""
         self.settings.update(new_settings)
 
+    def _new_session_stats(self):
+        """Fresh counters for one recording session"""
+        return {
+            'fps_target': 0,
+            'width': 0,
+            'height': 0,
+            'frames_captured': 0,    # unique frames grabbed
+            'frames_written': 0,     # frames written incl. catch-up duplicates
+            'frames_duplicated': 0,  # extra copies written to catch up
+            'frames_dropped': 0,     # frame slots skipped when too far behind
+            'frames_unchanged': 0,   # grabs the backend reported as identical to the previous one
+            'grab_s': 0.0,
+            'convert_s': 0.0,
+            'write_s': 0.0,
+            'grab_max_s': 0.0,
+            'convert_max_s': 0.0,
+            'write_max_s': 0.0,
+            'active_s': 0.0,         # recording time excluding pauses
+            'queue_max': 0,          # deepest encoder queue seen
+            'adaptations': [],       # adaptive quality changes (see adaptive_quality.py)
+            'segments': [],          # video files written (several if frame size/preset changed)
+            'disk_events': [],       # low disk space rolls/stops
+            'stopped_reason': None,
+            'output_path': None,
+            'output_bytes': 0,
+        }
+
+    def get_stats(self):
+        """Snapshot of the current/last session counters with derived rates"""
+        stats = dict(self.stats)
+        captured = stats['frames_captured']
+        stats['achieved_fps'] = captured / stats['active_s'] if stats['active_s'] > 0 else 0.0
+        for stage in ('grab', 'convert', 'write'):
+            stats[f'{stage}_avg_ms'] = stats[f'{stage}_s'] * 1000 / captured if captured else 0.0
+        return stats
+
+    def create_capture_backend(self):
+        """Create the configured capture backend for the recording thread"""
+        return create_capture_backend(self.settings.get('capture_backend', 'mss'),
+                                      self.settings.get('capture_backend_options'))
+
     def start_recording(self):
         """Start screen recording"""
         if self.is_recording:
@@ -77,6 +194,10 @@ class RecordingEngine:
         if not self.settings['folder_path']:
             messagebox.showerror('Error', 'Please select a save folder!')
             return False
+        if DISK_WRITER.space_low(self.settings['folder_path']):
+            self.update_status("Error: Not enough free disk space in the save folder")
+            return False
+        self.configure_retention()
 
         self.is_recording = True
         self.update_status("Starting...")
@@ -84,6 +205,17 @@ class RecordingEngine:
         self.record_thread.start()
         return True
 
+    def configure_retention(self):
+        """Apply the retention_recordings_* quotas and start the retention thread if any is set"""
+        try:
+            RETENTION.configure('recordings', self.settings.get('retention_recordings_max_mb'),
+                                self.settings.get('retention_recordings_max_days'),
+                                self.settings.get('retention_recordings_max_count'))
+        except ValueError as e:
+            print(f"Error in retention settings: {e}")
+        RETENTION.set_folder(self.settings.get('folder_path'))
+        RETENTION.start()
+
     def stop_recording(self):
         """Stop screen recording"""
         if not self.is_recording:
@@ -135,11 +267,17 @@ class RecordingEngine:
         """Audio callback for recording"""
         if not self.is_recording:
             return
+        AUDIO_CALLBACKS.inc()
+        if status:
+            AUDIO_STATUS_ERRORS.inc()
         self.audio_queue.put(indata.copy())
+        AUDIO_QUEUE_DEPTH.set(self.audio_queue.qsize())
 
     def _write_audio_to_wav(self, wav_path, samplerate, channels):
         """Write audio data to WAV file"""
-        wf = wave.open(wav_path, 'wb')
+        apply_thread_scheduling(self.settings.get('record_audio_cpus'), self.settings.get('record_nice', 0))
+        wav_file = DISK_WRITER.open(wav_path)
+        wf = wave.open(wav_file, 'wb')
         wf.setnchannels(channels)
         wf.setsampwidth(2)  # 16-bit
         wf.setframerate(samplerate)
@@ -150,47 +288,139 @@ class RecordingEngine:
                 except queue.Empty:
                     continue
                 # convert float32 to int16
-                int_data = (data * 32767).astype(np.int16)
-                wf.writeframes(int_data.tobytes())
+                with TRACER.span('audio_write', cat='audio'):
+                    int_data = (data * 32767).astype(np.int16)
+                    wf.writeframesraw(int_data.tobytes())  # header is patched once on close, keeping writes sequential
         finally:
             wf.close()
+            try:
+                wav_file.close()  # waits until the audio is on disk for the ffmpeg merge
+            except OSError as e:
+                print('Audio write error:', e)
 
-    def _record_worker(self):
-        """Main recording worker thread - Real-time recording"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        basename = f"record_{timestamp}"
-        folder = self.settings['folder_path']
-        video_path_raw = os.path.join(folder, basename + ".avi")
-        audio_path = os.path.join(folder, basename + ".wav")
-        final_path = os.path.join(folder, f"{basename}.{self.settings['record_format']}")
+    def _create_cursor_overlay(self):
+        """Cursor overlay for one capture thread, or None when off/unavailable"""
+        if not self.settings.get('record_cursor'):
+            return None
+        source = create_cursor_source(self.settings.get('record_cursor_source', 'auto'))
+        return CursorOverlay(source) if source else None
 
-        # determine capture region
-        with mss.mss() as sct:
-            monitor = sct.monitors[0]
-            if self.settings['record_area_mode'] == 'fullscreen':
-                x = monitor['left']
-                y = monitor['top']
-                w = monitor['width']
-                h = monitor['height']
-            else:
-                x = self.settings['custom_x']
-                y = self.settings['custom_y']
-                w = self.settings['custom_w']
-                h = self.settings['custom_h']
+    def _draw_cursor(self, cursor, frame, grabbed, sample, scale=1.0):
+        """Draw a cursor sample into frame, copying first if frame is still the backend's buffer"""
+        if frame is grabbed or not frame.flags.writeable:
+            frame = frame.copy()
+        t0 = time.perf_counter()
+        cursor.draw(frame, sample, scale)
+        CURSOR_SECONDS.observe(time.perf_counter() - t0)
+        return frame
 
-        # FPS settings - capped for performance
-        fps = max(10, min(60, int(self.settings['record_fps'])))  # Limit FPS range
-        target_frame_time = 1.0 / fps
-        
-        if self.settings['record_format'] == 'mp4':
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            video_path_raw = os.path.join(folder, basename + '.mp4')
-        else:
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            
-        out = cv2.VideoWriter(video_path_raw, fourcc, fps, (w, h))
+    @staticmethod
+    def _scaled_size(frame, scale):
+        """Even (width, height) of frame at scale, as the encoders need"""
+        return (max(2, int(frame.shape[1] * scale) // 2 * 2), max(2, int(frame.shape[0] * scale) // 2 * 2))
 
-        # start audio stream if enabled
+    def _encode_worker(self, frame_queue, writer, stats):
+        """Encoder thread - writes queued (frame, count, preset) items until it gets None"""
+        apply_thread_scheduling(self.settings.get('record_encode_cpus'), self.settings.get('record_nice', 0))
+        failed = False
+        while True:
+            item = frame_queue.get()
+            if item is None:
+                break
+            if failed:
+                continue  # keep draining so the capture thread never blocks
+            frame, count, preset = item
+            t0 = time.perf_counter()
+            try:
+                writer.write(frame, preset, count)
+            except Exception as e:
+                print('Video encode error:', e)
+                self.update_status(f"Error: {e}")
+                failed = True
+                continue
+            t1 = time.perf_counter()
+
+            stats['frames_written'] += count
+            stats['frames_duplicated'] += count - 1
+            stats['write_s'] += t1 - t0
+            stats['write_max_s'] = max(stats['write_max_s'], t1 - t0)
+            ENCODE_SECONDS.observe(t1 - t0)
+            FRAMES_WRITTEN.inc(count)
+            TRACER.complete('write', t0, t1, {'writes': count}, 'recording')
+
+    def _log_adaptation(self, controller, stats):
+        """Report the controller's latest quality change"""
+        entry = controller.log[-1]
+        quality = entry['to']
+        ADAPTATIONS.inc()
+        QUALITY_LEVEL.set(controller.level)
+        TRACER.instant('adapt', entry, 'recording')
+        description = f"{quality['fps']} fps, {int(quality['scale'] * 100)}% scale"
+        if quality['preset']:
+            description += f", {quality['preset']}"
+        state = 'full quality' if controller.level == 0 else description
+        print(f"Adaptive quality {entry['action']}: {description}")
+        self.update_status(f"Recording ({state})")
+
+    def _handle_low_disk(self, writers, stats):
+        """Roll to the overflow folder, or stop cleanly, when the recording volume is nearly full"""
+        writer = writers[0]
+        event = {'time': datetime.now().isoformat(timespec='milliseconds'), 'folder': writer.folder,
+                 'free_bytes': DISK_WRITER.free_bytes(writer.folder)}
+        overflow = self.settings.get('disk_overflow_folder')
+        if (overflow and os.path.isdir(overflow) and os.path.abspath(overflow) != os.path.abspath(writer.folder)
+                and not DISK_WRITER.space_low(overflow)):
+            for stream_writer in writers:
+                stream_writer.roll(overflow)
+            event.update(action='roll', to=overflow)
+            stats['disk_events'].append(event)
+            print(f"Low disk space, continuing recording in {overflow}")
+            self.update_status("Recording (continued in overflow folder)")
+            return
+        event['action'] = 'stop'
+        stats['disk_events'].append(event)
+        stats['stopped_reason'] = 'low_disk_space'
+        print("Low disk space, stopping recording")
+        self.is_recording = False
+
+    def _catalog_outputs(self, final_path, writer, stats, root, position):
+        """Queue catalog rows for the finished video file(s); hashing happens on the catalog thread"""
+        if not self.settings.get('catalog_enabled', True):
+            return
+        db_path = catalog_path_for(root, self.settings.get('catalog_path'))
+        x, y, monitor_index = position
+        fps = stats['fps_target']
+        # Parts that could not be joined are catalogued individually
+        outputs = stats['segments'] if len(stats['segments']) > 1 else [final_path]
+        for path in outputs:
+            segment = next((s for s in writer.segments if s['path'] == path), None)
+            frames = segment['frames'] if segment and len(outputs) > 1 else stats['frames_written']
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            CATALOG.record(db_path, {
+                'path': os.path.abspath(path), 'kind': 'recording', 'created': stats['started_at'],
+                'monitor': monitor_index, 'region_x': x, 'region_y': y,
+                'width': segment['width'] if segment else stats['width'],
+                'height': segment['height'] if segment else stats['height'],
+                'format': os.path.splitext(path)[1].lstrip('.'), 'bytes': size,
+                'duration_s': round(frames / fps, 3) if fps else None, 'fps': fps,
+                'extra': {'audio': bool(self.settings.get('record_audio_enabled')),
+                          'stopped_reason': stats['stopped_reason'],
+                          'adaptations': len(stats['adaptations'])},
+            })
+
+    def _write_session_metadata(self, path, stats):
+        """Write the session stats, including adaptation log and segments, as JSON"""
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2, default=str)
+        except Exception as e:
+            print(f"Error writing session metadata: {e}")
+
+    def _start_audio(self, audio_path):
+        """Start the audio input stream and its WAV writer thread; returns the thread (None if no audio)"""
         audio_thread = None
         if self.settings['record_audio_enabled']:
             samplerate = int(self.settings['audio_samplerate'])
@@ -213,16 +443,157 @@ class RecordingEngine:
             except Exception as e:
                 print('Audio input error:', e)
                 self.settings['record_audio_enabled'] = False
+        return audio_thread
+
+    def _stop_audio(self, audio_thread):
+        """Stop the audio stream and wait for the WAV file to be finished"""
+        if self.settings['record_audio_enabled'] and self.audio_stream:
+            try:
+                self.audio_stream.stop()
+                self.audio_stream.close()
+            except:
+                pass
+        
+        # Wait for audio thread to finish
+        if audio_thread and audio_thread.is_alive():
+            audio_thread.join(timeout=3)
+
+    def _mux_output(self, video_path_raw, audio_path, final_path):
+        """Merge the audio into (or convert) the raw video with ffmpeg if available.
+        Returns (output path, merged); the WAV file is left for the caller to remove"""
+        merged = False
+        if self.settings['record_audio_enabled'] and os.path.exists(audio_path):
+            try:
+                # check ffmpeg
+                subprocess.run(['ffmpeg', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                cmd = [
+                    'ffmpeg', '-y', '-i', video_path_raw, '-i', audio_path,
+                    '-c:v', 'copy', '-c:a', 'aac', final_path
+                ]
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                merged = os.path.exists(final_path)
+            except Exception as e:
+                print('ffmpeg merge failed or ffmpeg not installed:', e)
+
+        if not merged:
+            # if no merge, and user chose mp4, move raw avi to final_path if no audio
+            if not self.settings['record_audio_enabled']:
+                # convert/rename .avi to desired extension if user requested mp4 and ffmpeg exists
+                # (mp4 is already written directly - converting onto itself would delete it)
+                if self.settings['record_format'] != 'avi' and video_path_raw != final_path:
+                    try:
+                        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                        cmd = ['ffmpeg', '-y', '-i', video_path_raw, final_path]
+                        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                        if os.path.exists(final_path):
+                            os.remove(video_path_raw)
+                    except Exception:
+                        # leave avi as-is
+                        final_path = video_path_raw
+                else:
+                    final_path = video_path_raw
+            else:
+                # audio present but merge failed -> keep separate files
+                final_path = video_path_raw
+
+        # final cleanup: if audio merged, remove the intermediate video
+        if merged:
+            try:
+                if os.path.exists(video_path_raw):
+                    os.remove(video_path_raw)
+            except:
+                pass
+        return final_path, merged
+
+    def _record_worker(self):
+        """Main recording worker thread - Real-time recording"""
+        if self.settings.get('record_views'):
+            return self._record_streams_worker(views=True)
+        if self.settings.get('record_monitor_mode') == 'per_monitor':
+            return self._record_streams_worker()
+
+        # All files of one recording share a unique basename in the (possibly sharded) folder
+        root = self.settings['folder_path']
+        folder, basename = OUTPUT_LAYOUT.reserve(root, 'record', self.settings.get('output_shard', 'none'))
+        video_path_raw = os.path.join(folder, basename + ".avi")
+        audio_path = os.path.join(folder, basename + ".wav")
+        final_path = os.path.join(folder, f"{basename}.{self.settings['record_format']}")
+
+        # determine capture region
+        with self.create_capture_backend() as sct:
+            monitor = sct.monitors[0]
+            if self.settings['record_area_mode'] == 'fullscreen':
+                x = monitor['left']
+                y = monitor['top']
+                w = monitor['width']
+                h = monitor['height']
+                monitor_index = 0
+            else:
+                x = self.settings['custom_x']
+                y = self.settings['custom_y']
+                w = self.settings['custom_w']
+                h = self.settings['custom_h']
+                monitor_index = monitor_for_region(sct.monitors, {'left': x, 'top': y, 'width': w, 'height': h})
+
+        # FPS settings - capped for performance
+        fps = max(10, min(60, int(self.settings['record_fps'])))  # Limit FPS range
+
+        stats = self._new_session_stats()
+        stats.update(fps_target=fps, width=w, height=h, started_at=time.time())
+        self.stats = stats
+
+        # Scheduling: pin/deprioritise this capture thread and cap OpenCV's worker pool
+        apply_thread_scheduling(self.settings.get('record_capture_cpus'), self.settings.get('record_nice', 0))
+        cv_threads = int(self.settings.get('record_cv_threads') or 0)
+        default_cv_threads = cv2.getNumThreads()
+        if cv_threads:
+            cv2.setNumThreads(cv_threads)
+
+        # Encoder runs on its own thread behind a bounded queue so a slow write
+        # shows up as queue depth instead of stalling the capture timeline
+        writer = SegmentedVideoWriter(folder, basename, self.settings['record_format'], fps,
+                                      self.settings.get('record_encoder', 'opencv'),
+                                      self.settings.get('record_crf', 23),
+                                      self.settings.get('record_encoder_threads', 0),
+                                      self.settings.get('record_encode_cpus'),
+                                      self.settings.get('record_nice', 0))
+        preset = self.settings.get('record_preset', 'veryfast') if writer.supports_preset else None
+        frame_queue = queue.Queue(maxsize=max(1, int(self.settings.get('record_queue_size', 8))))
+        encoder_thread = threading.Thread(target=self._encode_worker, args=(frame_queue, writer, stats),
+                                          name='RecordEncoder', daemon=True)
+
+        # Optional closed-loop quality control (fps -> scale -> preset)
+        controller = None
+        if self.settings.get('adaptive_quality_enabled'):
+            ladder = build_ladder(fps, self.settings.get('adaptive_min_fps', 10),
+                                  self.settings.get('adaptive_min_scale', 0.5),
+                                  preset, self.settings.get('adaptive_fastest_preset', 'ultrafast'))
+            controller = AdaptiveQualityController(ladder,
+                                                   cpu_high=self.settings.get('adaptive_cpu_high', 90),
+                                                   cpu_low=self.settings.get('adaptive_cpu_low', 60))
+            stats['adaptations'] = controller.log
+        quality = controller.state if controller else {'fps': fps, 'scale': 1.0, 'preset': preset}
+
+        # start audio stream if enabled
+        audio_thread = self._start_audio(audio_path)
 
         self.update_status('Recording')
+        encoder_thread.start()
         
         # Real-time timing variables
         start_time = time.time()
         frame_count = 0
-        last_frame_time = start_time
+        capture_period = 1.0 / quality['fps']
+        next_capture = start_time
+        max_catchup = 3
+        last_bgr = None
+        last_scale = None
+        last_cursor = None
+        cursor = self._create_cursor_overlay()
+        RECORDING_ACTIVE.set(1)
 
         try:
-            with mss.mss() as sct:
+            with self.create_capture_backend() as sct:
                 region = {"left": x, "top": y, "width": w, "height": h}
                 
                 while self.is_recording:
@@ -234,103 +605,521 @@ class RecordingEngine:
                         if self.is_recording:  # If not stopped during pause
                             pause_duration = time.time() - pause_start
                             start_time += pause_duration  # Adjust timeline
+                            next_capture += pause_duration
                         continue
                     
                     current_time = time.time()
                     elapsed_time = current_time - start_time
                     expected_frame = int(elapsed_time * fps)
+                    stats['active_s'] = elapsed_time
                     
-                    # Only capture if we need a new frame
-                    if frame_count <= expected_frame:
-                        # Capture frame
-                        img = sct.grab(region)
-                        frame = np.array(img)
-                        
-                        # Convert BGRA to BGR
-                        if frame.shape[2] == 4:
-                            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+                    # Only capture if we need a new frame (at the possibly reduced capture rate)
+                    if frame_count <= expected_frame and current_time >= next_capture:
+                        lateness = current_time - next_capture
+
+                        # Capture frame (BGRA view of the backend buffer)
+                        t0 = time.perf_counter()
+                        frame = grabbed = sct.grab(region)
+                        t1 = time.perf_counter()
+                        cursor_sample = cursor.sample(sct.last_grab_origin or (x, y)) if cursor else None
+                        cursor_key = CursorOverlay.key(cursor_sample) if cursor_sample else None
                         
-                        # Write frame - may write multiple times if we're behind
-                        frames_to_write = min(3, expected_frame - frame_count + 1)  # Limit catch-up
-                        for _ in range(frames_to_write):
-                            out.write(frame)
-                            frame_count += 1
+                        # Convert BGRA to BGR - reuse the last conversion if the screen (and cursor) did not change
+                        scale = quality['scale']
+                        if not sct.last_grab_changed and last_bgr is not None and scale == last_scale \
+                                and cursor_key == last_cursor:
+                            frame = last_bgr
+                            stats['frames_unchanged'] += 1
+                        else:
+                            if scale < 1.0:
+                                # Downscale before converting so the conversion touches fewer pixels
+                                # (from the frame: window capture frames follow the window, not the region)
+                                frame = cv2.resize(frame, self._scaled_size(frame, scale),
+                                                   interpolation=cv2.INTER_AREA)
+                            if frame.shape[2] == 4:
+                                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+                            if cursor_sample:
+                                frame = self._draw_cursor(cursor, frame, grabbed, cursor_sample, scale)
+                            last_bgr, last_scale, last_cursor = frame, scale, cursor_key
+                        t2 = time.perf_counter()
                         
-                        last_frame_time = current_time
+                        # Queue frame - may be written multiple times if we're behind
+                        frames_to_write = min(max_catchup, expected_frame - frame_count + 1)  # Limit catch-up
+                        while self.is_recording:
+                            try:
+                                frame_queue.put((frame, frames_to_write, quality['preset']), timeout=0.5)
+                                break
+                            except queue.Full:
+                                continue
+                        frame_count += frames_to_write
+                        queue_fill = frame_queue.qsize() / frame_queue.maxsize
+
+                        stats['frames_captured'] += 1
+                        stats['grab_s'] += t1 - t0
+                        stats['convert_s'] += t2 - t1
+                        stats['grab_max_s'] = max(stats['grab_max_s'], t1 - t0)
+                        stats['convert_max_s'] = max(stats['convert_max_s'], t2 - t1)
+                        stats['queue_max'] = max(stats['queue_max'], frame_queue.qsize())
+                        GRAB_SECONDS.observe(t1 - t0)
+                        CONVERT_SECONDS.observe(t2 - t1)
+                        FRAMES_CAPTURED.inc()
+                        QUEUE_DEPTH.set(frame_queue.qsize())
+                        if TRACER.enabled:
+                            trace_args = {'frame': frame_count, 'writes': frames_to_write}
+                            TRACER.complete('frame', t0, t2, trace_args, 'recording')
+                            TRACER.complete('grab', t0, t1, None, 'recording')
+                            TRACER.complete('convert', t1, t2, None, 'recording')
+
+                        # Watchdog: free space is re-read at most every few seconds
+                        if DISK_WRITER.space_low(writer.next_folder or writer.folder):
+                            self._handle_low_disk([writer], stats)
+
+                        next_capture += capture_period
+                        if next_capture < current_time - capture_period:
+                            next_capture = current_time  # Don't try to catch up on missed captures
+                        if controller:
+                            controller.record_capture(lateness, queue_fill)
+
+                    # Let the controller move along the quality ladder
+                    if controller:
+                        new_quality = controller.update()
+                        if new_quality:
+                            quality = new_quality
+                            capture_period = 1.0 / quality['fps']
+                            max_catchup = 2 + -(-fps // quality['fps'])
+                            self._log_adaptation(controller, stats)
                     
-                    # Smart sleep - adjust based on next frame time
-                    next_frame_time = start_time + (frame_count / fps)
+                    # Smart sleep - until both the next output slot and the next capture are due
+                    next_frame_time = max(start_time + (frame_count / fps), next_capture)
                     sleep_time = next_frame_time - time.time()
                     
                     if sleep_time > 0:
-                        time.sleep(min(sleep_time, target_frame_time))
-                    elif sleep_time < -0.1:  # If we're significantly behind
-                        # Skip to current time to prevent permanent lag
+                        time.sleep(min(sleep_time, capture_period))
+                    elif start_time + frame_count / fps - time.time() < -(0.1 + capture_period):
+                        # Significantly behind - skip to current time to prevent permanent lag
+                        dropped = max(0, expected_frame - frame_count)
+                        stats['frames_dropped'] += dropped
+                        FRAMES_DROPPED.inc(dropped)
+                        TRACER.instant('frames_dropped', {'count': dropped}, 'recording')
+                        if controller:
+                            controller.record_dropped(dropped)
                         frame_count = expected_frame
                         
         except Exception as e:
             print('Recording error:', e)
         finally:
-            out.release()
+            # Flush the encoder queue and close the video
+            frame_queue.put(None)
+            encoder_thread.join()
+            if cursor:
+                stats['cursor'] = dict(cursor.stats)
+                cursor.close()
+            if cv_threads:
+                cv2.setNumThreads(default_cv_threads)
+            stats['segments'] = writer.close()
+            video_path_raw = stats['segments'][0] if stats['segments'] else video_path_raw
+            if len(stats['segments']) > 1:
+                joined = writer.join_segments()
+                if joined:
+                    video_path_raw = joined
+                    stats['segments'] = [joined]
+                else:
+                    print(f"Recording kept as {len(stats['segments'])} parts (not joined: ffmpeg missing or the join failed)")
+            QUEUE_DEPTH.set(0)
+            RECORDING_ACTIVE.set(0)
             
-            # Stop audio
-            if self.settings['record_audio_enabled'] and self.audio_stream:
+            self._stop_audio(audio_thread)
+            final_path, merged = self._mux_output(video_path_raw, audio_path, final_path)
+            if merged:
                 try:
-                    self.audio_stream.stop()
-                    self.audio_stream.close()
+                    if os.path.exists(audio_path):
+                        os.remove(audio_path)
                 except:
                     pass
-            
-            # Wait for audio thread to finish
-            if audio_thread and audio_thread.is_alive():
-                audio_thread.join(timeout=3)
 
-            # try merge audio + video using ffmpeg if available
-            merged = False
-            if self.settings['record_audio_enabled'] and os.path.exists(audio_path):
-                try:
-                    # check ffmpeg
-                    subprocess.run(['ffmpeg', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    cmd = [
-                        'ffmpeg', '-y', '-i', video_path_raw, '-i', audio_path,
-                        '-c:v', 'copy', '-c:a', 'aac', final_path
-                    ]
-                    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    merged = os.path.exists(final_path)
-                except Exception as e:
-                    print('ffmpeg merge failed or ffmpeg not installed:', e)
-
-            if not merged:
-                # if no merge, and user chose mp4, move raw avi to final_path if no audio
-                if not self.settings['record_audio_enabled']:
-                    # convert/rename .avi to desired extension if user requested mp4 and ffmpeg exists
-                    if self.settings['record_format'] != 'avi':
-                        try:
-                            subprocess.run(['ffmpeg', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                            cmd = ['ffmpeg', '-y', '-i', video_path_raw, final_path]
-                            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                            if os.path.exists(final_path):
-                                os.remove(video_path_raw)
-                        except Exception:
-                            # leave avi as-is
-                            final_path = video_path_raw
+            stats['output_path'] = final_path
+            try:
+                stats['output_bytes'] = os.path.getsize(final_path)
+            except OSError:
+                pass
+
+            # Session metadata (adaptation log, disk events) next to the last video part
+            session_path = os.path.join(writer.folder, basename + '.session.json')
+            if self.settings.get('adaptive_quality_enabled') or stats['disk_events']:
+                self._write_session_metadata(session_path, stats)
+
+            # Dump the span trace next to the video when tracing is on
+            trace_path = os.path.join(folder, basename + '.trace.json')
+            if TRACER.enabled:
+                TRACER.dump(trace_path)
+
+            self._catalog_outputs(final_path, writer, stats, root, (x, y, monitor_index))
+
+            # Hand the finished files to the retention index
+            for path in dict.fromkeys(stats['segments'] + [final_path, audio_path, session_path, trace_path]):
+                if os.path.exists(path):
+                    RETENTION.add(path, folder=root)
+
+            if stats['stopped_reason'] == 'low_disk_space':
+                self.update_status(f"Saved: {os.path.basename(final_path)} (stopped - low disk space)")
+            else:
+                self.update_status(f"Saved: {os.path.basename(final_path)}")
+            gc.collect()
+
+    def _monitor_stream_worker(self, ticks, region, writer, stats):
+        """Stream thread of a per-monitor recording: for every scheduler tick (write count, scale, preset)
+        grab, convert and encode this monitor, until it gets None"""
+        apply_thread_scheduling(self.settings.get('record_encode_cpus'), self.settings.get('record_nice', 0))
+        last_bgr = None
+        last_scale = None
+        last_cursor = None
+        cursor = self._create_cursor_overlay()  # X connections are per thread too
+        try:
+            # Capture backends are not thread-safe, so every stream grabs through its own
+            with self.create_capture_backend() as sct:
+                while True:
+                    tick = ticks.get()
+                    if tick is None:
+                        return
+                    count, scale, preset = tick
+                    t0 = time.perf_counter()
+                    frame = grabbed = sct.grab(region)
+                    t1 = time.perf_counter()
+                    cursor_sample = cursor.sample((region['left'], region['top'])) if cursor else None
+                    cursor_key = CursorOverlay.key(cursor_sample) if cursor_sample else None
+                    if not sct.last_grab_changed and last_bgr is not None and scale == last_scale \
+                            and cursor_key == last_cursor:
+                        frame = last_bgr
+                        stats['frames_unchanged'] += 1
                     else:
-                        final_path = video_path_raw
+                        if scale < 1.0:
+                            frame = cv2.resize(frame, self._scaled_size(frame, scale), interpolation=cv2.INTER_AREA)
+                        if frame.shape[2] == 4:
+                            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+                        if cursor_sample:
+                            frame = self._draw_cursor(cursor, frame, grabbed, cursor_sample, scale)
+                        last_bgr, last_scale, last_cursor = frame, scale, cursor_key
+                    t2 = time.perf_counter()
+                    writer.write(frame, preset, count)
+                    t3 = time.perf_counter()
+
+                    stats['frames_captured'] += 1
+                    stats['frames_written'] += count
+                    stats['frames_duplicated'] += count - 1
+                    stats['grab_s'] += t1 - t0
+                    stats['convert_s'] += t2 - t1
+                    stats['write_s'] += t3 - t2
+                    stats['grab_max_s'] = max(stats['grab_max_s'], t1 - t0)
+                    stats['convert_max_s'] = max(stats['convert_max_s'], t2 - t1)
+                    stats['write_max_s'] = max(stats['write_max_s'], t3 - t2)
+                    GRAB_SECONDS.observe(t1 - t0)
+                    CONVERT_SECONDS.observe(t2 - t1)
+                    ENCODE_SECONDS.observe(t3 - t2)
+                    FRAMES_WRITTEN.inc(count)
+                    TRACER.complete('stream_frame', t0, t3, {'monitor': stats['monitor'], 'writes': count},
+                                    'recording')
+        except Exception as e:
+            print(f"Recording error (monitor {stats['monitor']}):", e)
+            self.update_status(f"Error: {e}")
+            # keep draining so the scheduler never blocks on this stream
+            while ticks.get() is not None:
+                pass
+        finally:
+            if cursor:
+                stats['cursor'] = dict(cursor.stats)
+                cursor.close()
+
+    def _grab_view_frames(self, sct, view_list, streams, count, stats, cursor=None, quality=None):
+        """Grab the union of the views once and return one (frame, count, preset) encoder item per stream,
+        at quality's scale and preset (default: full scale, each stream's preset)"""
+        scale = quality['scale'] if quality else 1.0
+        t0 = time.perf_counter()
+        frame, _, crops = grab_views(sct, view_list)
+        t1 = time.perf_counter()
+        unchanged = not sct.last_grab_changed
+        screen_cursor = cursor.sample((0, 0)) if cursor else None  # one pointer query for all views
+        items = []
+        for stream, (_, region, view) in zip(streams, crops):
+            cursor_sample = None
+            if screen_cursor:
+                image, cursor_x, cursor_y = screen_cursor
+                cursor_sample = (image, cursor_x - region['left'], cursor_y - region['top'])
+            cursor_key = CursorOverlay.key(cursor_sample) if cursor_sample else None
+            if unchanged and stream['last'] is not None and scale == stream['last_scale'] \
+                    and cursor_key == stream['last_cursor']:
+                bgr = stream['last']
+                stream['stats']['frames_unchanged'] += 1
+            else:
+                # The slice shares the backend buffer; resizing or converting gives the encoder its own copy
+                bgr = view
+                if scale < 1.0:
+                    bgr = cv2.resize(bgr, self._scaled_size(bgr, scale), interpolation=cv2.INTER_AREA)
+                if bgr.shape[2] == 4:
+                    bgr = cv2.cvtColor(bgr, cv2.COLOR_BGRA2BGR)
+                elif bgr is view:
+                    bgr = view.copy()
+                if cursor_sample:
+                    bgr = self._draw_cursor(cursor, bgr, view, cursor_sample, scale)
+                stream['last'], stream['last_scale'], stream['last_cursor'] = bgr, scale, cursor_key
+            items.append((bgr, count, quality['preset'] if quality else stream['preset']))
+        t2 = time.perf_counter()
+        stats['grab_s'] += t1 - t0
+        stats['convert_s'] += t2 - t1
+        stats['grab_max_s'] = max(stats['grab_max_s'], t1 - t0)
+        stats['convert_max_s'] = max(stats['convert_max_s'], t2 - t1)
+        GRAB_SECONDS.observe(t1 - t0)
+        CONVERT_SECONDS.observe(t2 - t1)
+        if TRACER.enabled:
+            TRACER.complete('grab', t0, t1, {'views': len(crops)}, 'recording')
+            TRACER.complete('convert', t1, t2, None, 'recording')
+        return items
+
+    def _record_streams_worker(self, views=False):
+        """Several synchronised videos from one scheduler; all streams get the same ticks, so the files
+        have identical frame timing and share one audio track.
+        Per monitor: every stream thread grabs, converts and encodes its own monitor in parallel.
+        Views: the scheduler grabs the union of the record_views once per tick and hands each stream's
+        encoder thread its slice (converted to BGR, the only copy), replacing N grabs with one"""
+        root = self.settings['folder_path']
+        folder, basename = OUTPUT_LAYOUT.reserve(root, 'record', self.settings.get('output_shard', 'none'))
+        audio_path = os.path.join(folder, basename + ".wav")
+
+        try:
+            with self.create_capture_backend() as sct:
+                if views:
+                    selected = [(name, monitor_for_region(sct.monitors, region), region)
+                                for name, region in resolve_views(self.settings['record_views'], sct.monitors)]
                 else:
-                    # audio present but merge failed -> keep separate files
-                    final_path = video_path_raw
+                    selected = [(f"mon{index}", index, {k: monitor[k] for k in ('left', 'top', 'width', 'height')})
+                                for index, monitor in select_monitors(sct.monitors,
+                                                                      self.settings.get('record_monitors'))]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error in record_views: {e}")
+            selected = []
+        if not selected:
+            print("No monitors or views selected for recording")
+            self.update_status("Error: No monitors or views selected for recording")
+            self.is_recording = False
+            return
 
-            # final cleanup: if audio merged, remove intermediates
-            if merged:
+        fps = max(10, min(60, int(self.settings['record_fps'])))  # Limit FPS range
+        started_at = time.time()
+        stats = self._new_session_stats()
+        union = union_region([region for _, _, region in selected])
+        stats.update(fps_target=fps, width=union['width'], height=union['height'], started_at=started_at,
+                     streams=[])
+        self.stats = stats
+
+        apply_thread_scheduling(self.settings.get('record_capture_cpus'), self.settings.get('record_nice', 0))
+        queue_size = max(1, int(self.settings.get('record_queue_size', 8)))
+        streams = []
+        for name, index, region in selected:
+            stream_basename = f"{basename}_{name}"
+            writer = SegmentedVideoWriter(folder, stream_basename, self.settings['record_format'], fps,
+                                          self.settings.get('record_encoder', 'opencv'),
+                                          self.settings.get('record_crf', 23),
+                                          self.settings.get('record_encoder_threads', 0),
+                                          self.settings.get('record_encode_cpus'),
+                                          self.settings.get('record_nice', 0))
+            stream_stats = self._new_session_stats()
+            stream_stats.update(stream=name, monitor=index, fps_target=fps, width=region['width'],
+                                height=region['height'], started_at=started_at)
+            ticks = queue.Queue(maxsize=queue_size)
+            if views:
+                thread = threading.Thread(target=self._encode_worker, args=(ticks, writer, stream_stats),
+                                          name=f'RecordEncoder-{name}', daemon=True)
+            else:
+                thread = threading.Thread(target=self._monitor_stream_worker,
+                                          args=(ticks, region, writer, stream_stats),
+                                          name=f'RecordMonitor{index}', daemon=True)
+            preset = self.settings.get('record_preset', 'veryfast') if writer.supports_preset else None
+            streams.append({'name': name, 'region': region, 'basename': stream_basename, 'writer': writer,
+                            'preset': preset, 'stats': stream_stats, 'ticks': ticks, 'thread': thread,
+                            'last': None, 'last_scale': None, 'last_cursor': None})
+            stats['streams'].append(stream_stats)
+        writers = [stream['writer'] for stream in streams]
+
+        # Optional closed-loop quality control, one controller for all streams so they stay in sync
+        controller = None
+        if self.settings.get('adaptive_quality_enabled'):
+            ladder = build_ladder(fps, self.settings.get('adaptive_min_fps', 10),
+                                  self.settings.get('adaptive_min_scale', 0.5),
+                                  streams[0]['preset'], self.settings.get('adaptive_fastest_preset', 'ultrafast'))
+            controller = AdaptiveQualityController(ladder,
+                                                   cpu_high=self.settings.get('adaptive_cpu_high', 90),
+                                                   cpu_low=self.settings.get('adaptive_cpu_low', 60))
+            stats['adaptations'] = controller.log
+        quality = controller.state if controller else {'fps': fps, 'scale': 1.0, 'preset': streams[0]['preset']}
+
+        audio_thread = self._start_audio(audio_path)
+
+        self.update_status(f"Recording ({len(streams)} {'views' if views else 'monitors'})")
+        for stream in streams:
+            stream['thread'].start()
+
+        start_time = time.time()
+        frame_count = 0
+        capture_period = 1.0 / quality['fps']
+        next_capture = start_time
+        max_catchup = 3
+        RECORDING_ACTIVE.set(1)
+        sct = None
+        cursor = None
+
+        try:
+            if views:
+                sct = self.create_capture_backend()
+                cursor = self._create_cursor_overlay()
+                view_list = [(stream['name'], stream['region']) for stream in streams]
+            while self.is_recording:
+                if self.is_paused:
+                    pause_start = time.time()
+                    while self.is_paused and self.is_recording:
+                        time.sleep(0.1)
+                    if self.is_recording:
+                        pause_duration = time.time() - pause_start
+                        start_time += pause_duration
+                        next_capture += pause_duration
+                    continue
+
+                current_time = time.time()
+                elapsed_time = current_time - start_time
+                expected_frame = int(elapsed_time * fps)
+                stats['active_s'] = elapsed_time
+
+                if frame_count <= expected_frame and current_time >= next_capture:
+                    lateness = current_time - next_capture
+                    # Every stream gets the same tick, so all files stay frame-for-frame in sync
+                    frames_to_write = min(max_catchup, expected_frame - frame_count + 1)
+                    items = [(frames_to_write, quality['scale'], quality['preset'])] * len(streams)
+                    if views:
+                        items = self._grab_view_frames(sct, view_list, streams, frames_to_write, stats, cursor,
+                                                       quality)
+                    for stream, item in zip(streams, items):
+                        while self.is_recording:
+                            try:
+                                stream['ticks'].put(item, timeout=0.5)
+                                break
+                            except queue.Full:
+                                continue
+                    frame_count += frames_to_write
+
+                    depth = max(stream['ticks'].qsize() for stream in streams)
+                    stats['frames_captured'] += 1
+                    stats['queue_max'] = max(stats['queue_max'], depth)
+                    FRAMES_CAPTURED.inc()
+                    QUEUE_DEPTH.set(depth)
+
+                    # Watchdog: all streams roll to the overflow folder together
+                    if DISK_WRITER.space_low(writers[0].next_folder or writers[0].folder):
+                        self._handle_low_disk(writers, stats)
+
+                    next_capture += capture_period
+                    if next_capture < current_time - capture_period:
+                        next_capture = current_time
+                    if controller:
+                        controller.record_capture(lateness, depth / queue_size)
+
+                if controller:
+                    new_quality = controller.update()
+                    if new_quality:
+                        quality = new_quality
+                        capture_period = 1.0 / quality['fps']
+                        max_catchup = 2 + -(-fps // quality['fps'])
+                        self._log_adaptation(controller, stats)
+
+                next_frame_time = max(start_time + (frame_count / fps), next_capture)
+                sleep_time = next_frame_time - time.time()
+                if sleep_time > 0:
+                    time.sleep(min(sleep_time, capture_period))
+                elif start_time + frame_count / fps - time.time() < -(0.1 + capture_period):
+                    # Significantly behind - skip ahead on every stream at once
+                    dropped = max(0, expected_frame - frame_count)
+                    stats['frames_dropped'] += dropped
+                    FRAMES_DROPPED.inc(dropped)
+                    TRACER.instant('frames_dropped', {'count': dropped}, 'recording')
+                    if controller:
+                        controller.record_dropped(dropped)
+                    frame_count = expected_frame
+
+        except Exception as e:
+            print('Recording error:', e)
+        finally:
+            if sct:
+                sct.close()
+            if cursor:
+                stats['cursor'] = dict(cursor.stats)
+                cursor.close()
+            for stream in streams:
+                stream['ticks'].put(None)
+            for stream in streams:
+                stream['thread'].join()
+            QUEUE_DEPTH.set(0)
+            RECORDING_ACTIVE.set(0)
+            self._stop_audio(audio_thread)
+
+            # Finish each stream; the one audio track is merged into every video
+            outputs = []
+            all_merged = True
+            for stream in streams:
+                writer, stream_stats = stream['writer'], stream['stats']
+                stream_stats['stopped_reason'] = stats['stopped_reason']
+                stream_stats['segments'] = writer.close()
+                video_path_raw = stream_stats['segments'][0] if stream_stats['segments'] else \
+                    os.path.join(folder, stream['basename'] + ".avi")
+                if len(stream_stats['segments']) > 1:
+                    joined = writer.join_segments()
+                    if joined:
+                        video_path_raw = joined
+                        stream_stats['segments'] = [joined]
+                    else:
+                        print(f"Stream {stream['name']} recording kept as "
+                              f"{len(stream_stats['segments'])} parts (not joined: ffmpeg missing or the join failed)")
+                final_path = os.path.join(folder, f"{stream['basename']}.{self.settings['record_format']}")
+                final_path, merged = self._mux_output(video_path_raw, audio_path, final_path)
+                all_merged = all_merged and merged
+                stream_stats['output_path'] = final_path
+                try:
+                    stream_stats['output_bytes'] = os.path.getsize(final_path)
+                except OSError:
+                    pass
+                outputs.append(final_path)
+                self._catalog_outputs(final_path, writer, stream_stats, root,
+                                      (stream['region']['left'], stream['region']['top'], stream_stats['monitor']))
+
+            if all_merged and outputs:
                 try:
-                    if os.path.exists(video_path_raw):
-                        os.remove(video_path_raw)
                     if os.path.exists(audio_path):
                         os.remove(audio_path)
                 except:
                     pass
 
-            self.update_status(f"Saved: {os.path.basename(final_path)}")
+            # With views the grab/convert timings are already on the scheduler's stats
+            stages = ('write',) if views else ('grab', 'convert', 'write')
+            for key in ('frames_written', 'frames_duplicated', 'frames_unchanged', 'output_bytes') + \
+                    tuple(f'{stage}_s' for stage in stages):
+                stats[key] = sum(s[key] for s in stats['streams'])
+            for stage in stages:
+                stats[f'{stage}_max_s'] = max(s[f'{stage}_max_s'] for s in stats['streams'])
+            stats['segments'] = [path for s in stats['streams'] for path in s['segments']]
+            stats['output_path'] = outputs[0] if outputs else None
+            stats['output_paths'] = outputs
+
+            session_path = os.path.join(writers[0].folder, basename + '.session.json')
+            if self.settings.get('adaptive_quality_enabled') or stats['disk_events']:
+                self._write_session_metadata(session_path, stats)
+            trace_path = os.path.join(folder, basename + '.trace.json')
+            if TRACER.enabled:
+                TRACER.dump(trace_path)
+
+            for path in dict.fromkeys(stats['segments'] + outputs + [audio_path, session_path, trace_path]):
+                if os.path.exists(path):
+                    RETENTION.add(path, folder=root)
+
+            summary = f"Saved: {len(outputs)} {'view' if views else 'monitor'} recordings ({basename}_*)"
+            if stats['stopped_reason'] == 'low_disk_space':
+                summary += " (stopped - low disk space)"
+            self.update_status(summary)
             gc.collect()
 
     def cleanup(self):
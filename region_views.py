@@ -0,0 +1,90 @@
+# region_views.py
+# Several named crops (views) of the screen from a single grab
+# Dependencies: numpy
+#
+# A view is a named rectangle, or a whole monitor:
+#
+#     {'name': 'terminal', 'x': 0, 'y': 600, 'width': 960, 'height': 480}
+#     {'name': 'full', 'monitor': 1}
+#
+# or the same as text for the command line: "terminal=0,600,960,480", "full=monitor:1".
+# The engines grab the union of all views once per tick and cut every view out
+# of that buffer as a numpy slice (no pixel copy), so N views cost one grab
+# instead of N. Each view still gets its own file or video stream.
+
+import re
+
+NAME_CHARS = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+def parse_view_spec(text):
+    """View dict from 'name=x,y,width,height' or 'name=monitor:N'"""
+    name, _, value = str(text).partition('=')
+    if not value:
+        raise ValueError(f"View must look like name=x,y,width,height or name=monitor:N: {text}")
+    value = value.strip()
+    if value.startswith('monitor:'):
+        return {'name': name.strip(), 'monitor': int(value[len('monitor:'):])}
+    parts = [int(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError(f"View needs x,y,width,height: {text}")
+    return {'name': name.strip(), 'x': parts[0], 'y': parts[1], 'width': parts[2], 'height': parts[3]}
+
+
+def resolve_views(views, monitors):
+    """[(name, region)] with absolute regions for view dicts/specs, checked against an mss-style
+    monitor list (regions are clipped to the desktop; names are made file-name safe and unique)"""
+    desktop = monitors[0]
+    resolved = []
+    names = set()
+    for number, view in enumerate(views or [], 1):
+        if isinstance(view, str):
+            view = parse_view_spec(view)
+        if 'monitor' in view:
+            index = int(view['monitor'])
+            if not 0 <= index < len(monitors):
+                raise ValueError(f"View {view.get('name') or number}: no monitor {index}")
+            monitor = monitors[index]
+            left, top, width, height = monitor['left'], monitor['top'], monitor['width'], monitor['height']
+        else:
+            left = int(view.get('x', view.get('left', 0)))
+            top = int(view.get('y', view.get('top', 0)))
+            width, height = int(view['width']), int(view['height'])
+
+        # Clip to the desktop so the union grab stays valid
+        right = min(left + width, desktop['left'] + desktop['width'])
+        bottom = min(top + height, desktop['top'] + desktop['height'])
+        left, top = max(left, desktop['left']), max(top, desktop['top'])
+        if right - left < 2 or bottom - top < 2:
+            raise ValueError(f"View {view.get('name') or number} is outside the screen")
+
+        name = NAME_CHARS.sub('_', str(view.get('name') or f"view{number}")).strip('_') or f"view{number}"
+        while name in names:
+            name += '_'
+        names.add(name)
+        resolved.append((name, {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}))
+    return resolved
+
+
+def union_region(regions):
+    """Smallest region containing all regions"""
+    left = min(r['left'] for r in regions)
+    top = min(r['top'] for r in regions)
+    right = max(r['left'] + r['width'] for r in regions)
+    bottom = max(r['top'] + r['height'] for r in regions)
+    return {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+
+
+def view_of(frame, union, region):
+    """region cut out of a frame grabbed at union, as a view sharing the frame's memory"""
+    x = region['left'] - union['left']
+    y = region['top'] - union['top']
+    return frame[y:y + region['height'], x:x + region['width']]
+
+
+def grab_views(sct, views):
+    """Grab the union of [(name, region)] once; returns (frame, union, [(name, region, view)]).
+    The views share the backend buffer, so use them before the next grab"""
+    union = union_region([region for _, region in views])
+    frame = sct.grab(union)
+    return frame, union, [(name, region, view_of(frame, union, region)) for name, region in views]
@@ -0,0 +1,187 @@
+# resource_monitor.py
+# Background sampler for process CPU, memory, threads and disk usage with a fixed-size history
+# Dependencies: psutil
+#
+# One psutil.Process handle is created up front and read inside oneshot(), so a
+# sample is a handful of cached /proc reads every few seconds on a daemon thread
+# - nothing runs on the Tk thread. Listeners are called from the sampler thread;
+# GUI listeners must hand the sample over to Tk themselves (root.after).
+#
+# process_write_bps is this process's own write rate (psutil io_counters): every
+# file it writes, in any folder, but not the ffmpeg encoder child processes. It is
+# not the save folder volume's throughput.
+
+import os
+import time
+import shutil
+import threading
+from collections import deque
+
+import psutil
+
+from metrics import REGISTRY
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+CPU_PERCENT = REGISTRY.gauge('nsnap_process_cpu_percent', 'Process CPU usage (100 = one core)')
+RSS_BYTES = REGISTRY.gauge('nsnap_process_rss_bytes', 'Process resident memory')
+THREAD_COUNT = REGISTRY.gauge('nsnap_process_threads', 'Process thread count')
+PROCESS_WRITE_RATE = REGISTRY.gauge('nsnap_process_write_bytes_per_second',
+                                    'Bytes per second written by this process (excludes ffmpeg children)')
+DISK_FREE_BYTES = REGISTRY.gauge('nsnap_disk_free_bytes', 'Free space on the save folder volume')
+
+
+def format_bytes(value):
+    """Human readable size, e.g. 1.5 GB"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def format_sample(sample):
+    """One-line summary of a sample for status labels"""
+    if not sample:
+        return "Resources: N/A"
+    parts = [f"CPU {sample['cpu_percent']:.0f}%", f"RAM {sample['rss_bytes'] / 1024 / 1024:.1f} MB",
+             f"{sample['threads']} threads"]
+    if sample['process_write_bps'] is not None:
+        parts.append(f"App write {format_bytes(sample['process_write_bps'])}/s")
+    if sample['disk_free_bytes'] is not None:
+        parts.append(f"Free {format_bytes(sample['disk_free_bytes'])}")
+    return " | ".join(parts)
+
+
+class ResourceMonitor:
+    """Samples this process every interval seconds into a ring of the last history samples"""
+
+    def __init__(self, interval=2.0, history=300, folder_getter=None):
+        self.interval = max(0.5, float(interval))
+        self.history = deque(maxlen=max(1, int(history)))
+        self.folder_getter = folder_getter
+        self.listeners = []
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_write_bytes = None
+        self.last_time = None
+
+    def add_listener(self, callback):
+        """Call callback(sample) after every sample (from the sampler thread)"""
+        self.listeners.append(callback)
+
+    def _write_bytes(self):
+        # io_counters is not available on every platform (e.g. macOS)
+        try:
+            return self.process.io_counters().write_bytes
+        except (AttributeError, psutil.Error):
+            return None
+
+    def _free_bytes(self):
+        folder = self.folder_getter() if self.folder_getter else None
+        if not folder or not os.path.isdir(folder):
+            return None
+        try:
+            return shutil.disk_usage(folder).free
+        except OSError:
+            return None
+
+    def sample(self):
+        """Take one sample, append it to the history and return it"""
+        now = time.monotonic()
+        with self.process.oneshot():
+            cpu = self.process.cpu_percent(interval=None)
+            rss = self.process.memory_info().rss
+            threads = self.process.num_threads()
+            write_bytes = self._write_bytes()
+
+        write_bps = None
+        if write_bytes is not None and self.last_write_bytes is not None and now > self.last_time:
+            write_bps = max(0.0, (write_bytes - self.last_write_bytes) / (now - self.last_time))
+        self.last_write_bytes, self.last_time = write_bytes, now
+
+        sample = {
+            'timestamp': time.time(),
+            'cpu_percent': cpu,
+            'rss_bytes': rss,
+            'threads': threads,
+            'process_write_bps': write_bps,
+            'disk_free_bytes': self._free_bytes(),
+        }
+        with self.lock:
+            self.history.append(sample)
+
+        CPU_PERCENT.set(cpu)
+        RSS_BYTES.set(rss)
+        THREAD_COUNT.set(threads)
+        if write_bps is not None:
+            PROCESS_WRITE_RATE.set(write_bps)
+        if sample['disk_free_bytes'] is not None:
+            DISK_FREE_BYTES.set(sample['disk_free_bytes'])
+        return sample
+
+    def _run(self):
+        # Prime cpu_percent and the write counter so the first stored sample has real deltas
+        self.process.cpu_percent(interval=None)
+        self.last_write_bytes, self.last_time = self._write_bytes(), time.monotonic()
+        while not self.stop_event.wait(self.interval):
+            try:
+                sample = self.sample()
+            except psutil.Error as e:
+                print(f"Error sampling resources: {e}")
+                continue
+            for callback in list(self.listeners):
+                try:
+                    callback(sample)
+                except Exception as e:
+                    print(f"Error in resource listener: {e}")
+
+    def start(self):
+        if self.thread:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='ResourceMonitor', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.thread:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=2)
+        self.thread = None
+
+    @property
+    def is_running(self):
+        return self.thread is not None
+
+    def latest(self):
+        """Most recent sample or None"""
+        with self.lock:
+            return self.history[-1] if self.history else None
+
+    def get_history(self, seconds=None):
+        """Samples from the last seconds (all stored samples if None), oldest first"""
+        with self.lock:
+            samples = list(self.history)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [s for s in samples if s['timestamp'] >= cutoff]
+
+    def summary(self, seconds=None):
+        """Average/peak CPU, RSS and process write rate over the history window"""
+        samples = self.get_history(seconds)
+        if not samples:
+            return {'samples': 0}
+        writes = [s['process_write_bps'] for s in samples if s['process_write_bps'] is not None]
+        return {
+            'samples': len(samples),
+            'window_s': round(samples[-1]['timestamp'] - samples[0]['timestamp'], 1),
+            'cpu_percent_avg': round(sum(s['cpu_percent'] for s in samples) / len(samples), 1),
+            'cpu_percent_max': max(s['cpu_percent'] for s in samples),
+            'rss_bytes_max': max(s['rss_bytes'] for s in samples),
+            'threads_max': max(s['threads'] for s in samples),
+            'process_write_bps_avg': round(sum(writes) / len(writes)) if writes else None,
+            'disk_free_bytes': samples[-1]['disk_free_bytes'],
+        }
@@ -0,0 +1,287 @@
+# retention.py
+# Size/age/count quotas for the capture folder, enforced in the background
+# Dependencies: none (standard library only)
+#
+# The manager keeps an in-memory index of capture outputs per kind, oldest first:
+#
+#     screenshots - screenshot_* / region_* images
+#     recordings  - record_* videos, audio and their .session/.trace JSON, and
+#                   autovideo_* direct-to-video auto-capture segments and frame indexes
+#
+# Files sharing an output stem (record_<time>.mp4, record_<time>_part2.mp4,
+# record_<time>_m1.mp4, record_<time>.wav, record_<time>.session.json, ...) are one
+# output: max_count counts outputs and an output is always deleted as a whole.
+#
+# Each save folder is scanned once (on the retention thread) when it is first
+# seen; after that the engines report every finished file with add(), so a
+# capture never triggers a directory listing. The engines may save to different
+# folders: every folder seen is tracked and the kind's files from all of them
+# share its quotas. When a kind goes over one of its quotas the oldest outputs are
+# deleted until it fits again. Quotas of 0 are off.
+
+import os
+import re
+import time
+import heapq
+import threading
+from collections import deque
+
+from metrics import REGISTRY
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+FILES_DELETED = REGISTRY.counter('nsnap_retention_files_deleted', 'Capture files deleted by retention quotas')
+BYTES_DELETED = REGISTRY.counter('nsnap_retention_bytes_deleted', 'Bytes freed by retention quotas')
+
+# kind -> file name prefixes
+KINDS = {
+    'screenshots': ('screenshot_', 'region_'),
+    'recordings': ('record_', 'autovideo_'),
+}
+
+# prefix_YYYYmmdd_HHMMSS with the _mmm_seq_tag of collision-free names
+STEM = re.compile(r'^[a-z]+_\d{8}_\d{6}(?:_\d{3}_\d{4}_[0-9a-z]+)?')
+
+
+def classify(name):
+    """Kind of a capture file name, or None for files retention must not touch"""
+    for kind, prefixes in KINDS.items():
+        if name.startswith(prefixes):
+            return kind
+    return None
+
+
+def output_stem(name):
+    """Name shared by every file of one output, e.g. record_20261019_142501_237_0042_2n9c for
+    its _partN/_mN videos, .wav audio and .session.json/.trace.json/.frames.jsonl sidecars"""
+    match = STEM.match(name)
+    return match.group(0) if match else name.split('.', 1)[0]
+
+
+class RetentionManager:
+    def __init__(self, check_interval=60.0):
+        self.check_interval = check_interval   # seconds between age checks when nothing is added
+        self.quotas = {kind: {'max_bytes': 0, 'max_age_s': 0, 'max_count': 0} for kind in KINDS}
+        self.index = {kind: deque() for kind in KINDS}  # (mtime, stem), oldest first
+        self.files = {kind: {} for kind in KINDS}       # stem -> {'mtime', 'paths': {path: size}}; a group's
+                                                        # newest file sets its mtime, older entries go stale
+        self.total_bytes = dict.fromkeys(KINDS, 0)
+        self.folders = []          # save folders seen, in order
+        self.pending_scans = []    # folders not indexed yet
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.listeners = []
+        self.stats = {
+            'scans': 0,
+            'scan_s': 0.0,
+            'files_deleted': 0,
+            'bytes_deleted': 0,
+            'errors': 0,
+        }
+
+    def configure(self, kind, max_mb=0, max_days=0, max_count=0):
+        """Set the quotas for one kind; 0 disables a quota"""
+        with self.condition:
+            was_enabled = self.enabled
+            self.quotas[kind] = {
+                'max_bytes': max(0, int(float(max_mb or 0) * 1024 * 1024)),
+                'max_age_s': max(0.0, float(max_days or 0) * 86400),
+                'max_count': max(0, int(max_count or 0)),
+            }
+            if self.enabled and not was_enabled:
+                # Nothing was indexed while retention was off
+                self._reset_index()
+            self.condition.notify_all()
+
+    def _reset_index(self):
+        for kind in KINDS:
+            self.index[kind].clear()
+            self.files[kind].clear()
+            self.total_bytes[kind] = 0
+        self.pending_scans = list(self.folders)
+
+    def add_listener(self, callback):
+        """Call callback(path) after each deletion (from the retention thread)"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    @property
+    def enabled(self):
+        return any(any(quota.values()) for quota in self.quotas.values())
+
+    def set_folder(self, folder):
+        """Track folder; a folder not seen before is indexed once, in the background"""
+        if not folder:
+            return
+        folder = os.path.abspath(folder)
+        if folder in self.folders:
+            return
+        with self.condition:
+            if folder not in self.folders:
+                self.folders.append(folder)
+                self.pending_scans.append(folder)
+                self.condition.notify_all()
+
+    def add(self, path, size=None, folder=None):
+        """Index a finished capture file and enforce its kind's quotas in the background"""
+        self.set_folder(folder)
+        kind = classify(os.path.basename(path))
+        if not kind or not self.enabled:
+            return
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+        path = os.path.abspath(path)
+        with self.condition:
+            self._index_file(kind, path, time.time(), size)
+            self._ensure_thread()
+            self.condition.notify_all()
+
+    def _index_file(self, kind, path, mtime, size):
+        stem = output_stem(os.path.basename(path))
+        group = self.files[kind].get(stem)
+        if group is None:
+            group = self.files[kind][stem] = {'mtime': mtime, 'paths': {}}
+            self.index[kind].append((mtime, stem))
+        elif mtime > group['mtime']:
+            group['mtime'] = mtime  # its old index entry is now stale
+            self.index[kind].append((mtime, stem))
+        self.total_bytes[kind] += size - group['paths'].get(path, 0)
+        group['paths'][path] = size
+
+    # -- retention thread ---------------------------------------------------
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='Retention', daemon=True)
+            self.thread.start()
+
+    def start(self):
+        """Start the background thread (indexes the folder and applies quotas)"""
+        if self.enabled:
+            with self.condition:
+                self._ensure_thread()
+                self.condition.notify_all()
+
+    def _scan(self, folder):
+        """Index existing capture files under folder (once per folder)"""
+        t0 = time.perf_counter()
+        found = {kind: [] for kind in KINDS}
+        pending = [folder]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith('.'):  # e.g. .thumbnails
+                                pending.append(entry.path)
+                            continue
+                        kind = classify(entry.name)
+                        if kind:
+                            stat = entry.stat()
+                            found[kind].append((stat.st_mtime, entry.path, stat.st_size))
+            except OSError as e:
+                print(f"Error indexing {folder}: {e}")
+        with self.condition:
+            if folder not in self.folders:
+                return  # index reset while scanning
+            for kind, files in found.items():
+                groups = self.files[kind]
+                entries = {}
+                for mtime, path, size in files:
+                    stem = output_stem(os.path.basename(path))
+                    group = groups.get(stem)
+                    if group is None:
+                        group = groups[stem] = {'mtime': mtime, 'paths': {}}
+                        entries[stem] = mtime
+                    elif path in group['paths']:
+                        continue  # already indexed (added during the scan, or under a nested folder)
+                    elif mtime > group['mtime']:
+                        group['mtime'] = entries[stem] = mtime
+                    group['paths'][path] = size
+                    self.total_bytes[kind] += size
+                if entries:
+                    new = sorted((mtime, stem) for stem, mtime in entries.items())
+                    self.index[kind] = deque(heapq.merge(new, self.index[kind]))
+        self.stats['scans'] += 1
+        self.stats['scan_s'] = time.perf_counter() - t0
+
+    def _over_quota(self, kind, now):
+        quota = self.quotas[kind]
+        index = self.index[kind]
+        if not index:
+            return False
+        return ((quota['max_count'] and len(self.files[kind]) > quota['max_count'])
+                or (quota['max_bytes'] and self.total_bytes[kind] > quota['max_bytes'])
+                or (quota['max_age_s'] and now - index[0][0] > quota['max_age_s']))
+
+    def enforce(self, now=None):
+        """Delete the oldest outputs of every kind that is over a quota; returns the number of files deleted"""
+        now = now or time.time()
+        deleted = 0
+        for kind in KINDS:
+            while True:
+                with self.condition:
+                    if not self._over_quota(kind, now):
+                        break
+                    mtime, stem = self.index[kind].popleft()
+                    group = self.files[kind].get(stem)
+                    if group is None or group['mtime'] != mtime:
+                        continue  # stale entry of an output that was written to again later
+                    del self.files[kind][stem]
+                    self.total_bytes[kind] -= sum(group['paths'].values())
+                deleted += self._delete_group(group)
+        return deleted
+
+    def _delete_group(self, group):
+        deleted = 0
+        for path, size in group['paths'].items():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # already removed by the user
+            except OSError as e:
+                self.stats['errors'] += 1
+                print(f"Error deleting {path}: {e}")
+                continue
+            deleted += 1
+            self.stats['files_deleted'] += 1
+            self.stats['bytes_deleted'] += size
+            FILES_DELETED.inc()
+            BYTES_DELETED.inc(size)
+            for callback in list(self.listeners):
+                try:
+                    callback(path)
+                except Exception as e:
+                    print(f"Error in retention listener: {e}")
+        return deleted
+
+    def _run(self):
+        while True:
+            with self.condition:
+                folder = self.pending_scans.pop(0) if self.pending_scans else None
+            if folder:
+                self._scan(folder)
+            try:
+                self.enforce()
+            except Exception as e:
+                print(f"Error applying retention: {e}")
+            with self.condition:
+                if not self.pending_scans:
+                    self.condition.wait(self.check_interval)
+
+    def get_stats(self):
+        with self.condition:
+            kinds = {kind: {'outputs': len(self.files[kind]),
+                            'files': sum(len(group['paths']) for group in self.files[kind].values()),
+                            'bytes': self.total_bytes[kind],
+                            'quotas': dict(self.quotas[kind])} for kind in KINDS}
+        stats = dict(self.stats)
+        stats.update(folders=list(self.folders), kinds=kinds)
+        return stats
+
+
+# Process-wide manager shared by the engines
+RETENTION = RetentionManager()
@@ -22,7 +22,16 @@ This application has been split into two main components:
    - Communication with the engine
 
 Usage:
-    python run_app.py
+    python run_app.py                        start (or show the running instance)
+    python run_app.py capture [--clipboard]  capture via the running instance
+    python run_app.py region X Y W H         capture a region via the running instance
+    python run_app.py record start|stop|pause|resume
+    python run_app.py stats
+
+Only one instance runs at a time. A second invocation forwards its command to
+the already-initialised instance over the local control API and exits, so a
+capture costs milliseconds instead of a cold start. Pass --multi-instance to
+skip the lock.
 
 Dependencies:
     - mss, opencv-python, sounddevice, numpy, scipy
@@ -35,19 +44,101 @@ The engine and GUI communicate through:
     - Direct method calls from GUI to engine
 """
 
-from main_gui import ScreenshotGUI
+import sys
+import json
+import time
+import argparse
+import threading
+
+# Only lightweight imports here - the GUI/engines load after the single-instance check
+from single_instance import InstanceLock
+from control_client import ControlClient, ControlError, add_command_parsers, request_from_args, print_result
+
+SETTINGS_FILE = "screenshot_settings.json"
+FORWARD_CONNECT_TIMEOUT = 10.0  # seconds to wait for a starting primary to begin listening
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Advanced Screenshot & ScreenRecorder Tool")
+    parser.add_argument('--multi-instance', action='store_true',
+                        help="Run a separate instance instead of forwarding to the running one")
+    sub = parser.add_subparsers(dest='command')
+    sub.add_parser('show', help="Show the main window")
+    add_command_parsers(sub)
+    return parser.parse_args(argv)
+
+
+def configured_socket_path():
+    """Control socket path from saved settings, without loading the engines"""
+    try:
+        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('control_socket_path') or None
+    except (OSError, ValueError):
+        return None
+
 
-def main():
+def forward_command(cmd, cmd_args):
+    """Send a command to the running instance and print its result"""
+    client = ControlClient(configured_socket_path())
+    deadline = time.time() + FORWARD_CONNECT_TIMEOUT
+    while True:
+        try:
+            client.connect()
+            break
+        except OSError as e:
+            # The primary holds the lock but may still be starting its control server
+            if time.time() >= deadline:
+                print(f"Error: running instance is not responding ({e})", file=sys.stderr)
+                return 1
+            time.sleep(0.05)
+
+    try:
+        print_result(client.call(cmd, **cmd_args))
+        return 0
+    except (OSError, ControlError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+
+
+def run_primary(cmd, cmd_args, single_instance):
+    """Start the full application, then run the initial command if one was given"""
+    from main_gui import ScreenshotGUI
+
+    app = ScreenshotGUI(control_api=single_instance)
+    if cmd and cmd != 'show' and app.control_server:
+        request = {'cmd': cmd, 'args': cmd_args}
+        threading.Thread(target=lambda: print_result(app.control_server.dispatch(request)),
+                         daemon=True).start()
+    app.run()
+    return 0
+
+
+def main(argv=None):
     """Main entry point"""
+    args = parse_args(argv)
+    if args.command:
+        cmd, cmd_args = request_from_args(args)
+    else:
+        cmd, cmd_args = None, {}
+
+    lock = InstanceLock()
+    if not args.multi_instance and not lock.acquire():
+        return forward_command(cmd or 'show', cmd_args)
+
     try:
-        app = ScreenshotGUI()
-        app.run()
+        return run_primary(cmd, cmd_args, not args.multi_instance)
     except KeyboardInterrupt:
         print("\nApplication terminated by user")
+        return 0
     except Exception as e:
         print(f"Application error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        lock.release()
+    return 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,6 +1,6 @@
 # screenshot_engine.py
 # Engine for screenshot functionality
-# Dependencies: keyboard, pystray, pillow, psutil, mss
+# Dependencies: keyboard, pystray, pillow, psutil, mss, numpy
 
 import os
 import time
@@ -14,6 +14,29 @@ from datetime import datetime
 import gc
 import psutil
 import io  # Add for clipboard functionality
+import numpy as np
+from capture_backends import create_capture_backend
+from metrics import REGISTRY, JsonSnapshotExporter, OpenMetricsServer
+from tracing import TRACER
+from resource_monitor import ResourceMonitor, format_sample
+from disk_writer import DISK_WRITER
+from retention import RETENTION
+from capture_catalog import CATALOG, catalog_path_for, monitor_for_region
+from output_layout import OUTPUT_LAYOUT
+from thumbnail_cache import THUMBNAILS, cache_dir_for, get_thumbnails
+from timelapse_builder import TimelapseBuilder, collect_frames
+from video_timelapse import VideoTimelapseWriter, export_frame
+from region_views import grab_views, resolve_views
+from image_formats import encode_capture, encode_image, encode_options
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+GRAB_SECONDS = REGISTRY.histogram('nsnap_grab_seconds', 'Screen grab latency', {'engine': 'screenshot'})
+CONVERT_SECONDS = REGISTRY.histogram('nsnap_convert_seconds', 'Pixel format conversion latency', {'engine': 'screenshot'})
+ENCODE_SECONDS = REGISTRY.histogram('nsnap_encode_seconds', 'Image encode latency', {'engine': 'screenshot'})
+WRITE_SECONDS = REGISTRY.histogram('nsnap_write_seconds', 'Screenshot file write latency')
+SCREENSHOTS_SAVED = REGISTRY.counter('nsnap_screenshots_saved', 'Screenshots written to disk')
+SCREENSHOT_BYTES = REGISTRY.counter('nsnap_screenshot_bytes', 'Bytes of screenshot files written')
+SCREENSHOT_ERRORS = REGISTRY.counter('nsnap_screenshot_errors', 'Screenshot captures that failed')
 
 
 class ScreenshotEngine:
@@ -29,6 +52,18 @@ class ScreenshotEngine:
         # Don't initialize MSS in __init__ - create per-thread instances instead
         self.main_sct = None
 
+        # One capture backend per thread, reused across captures (see get_capture_backend)
+        self.backend_local = threading.local()
+        self.backend_lock = threading.Lock()
+        self.backends = {}            # thread -> backend, to close them at shutdown
+        self.backend_generation = 0
+
+        # perf_counter() timestamp of the most recent completed grab
+        self.last_grab_time = None
+
+        # Stage timings of the most recent manual_capture (grab/convert/encode ms, bytes)
+        self.last_capture_stats = {}
+
         # Settings dictionary - only screenshot related
         self.settings = {
             'folder_path': '',
@@ -40,18 +75,84 @@ class ScreenshotEngine:
             'auto_start_hotkey': 'ctrl+shift+a',
             'auto_pause_hotkey': 'ctrl+shift+p',
             'auto_stop_hotkey': 'ctrl+shift+o',
-            'capture_format': 'png',  # png, jpg, bmp
+            'capture_format': 'png',  # png, jpg, bmp, webp, qoi, auto (see image_formats.py)
             'capture_quality': 95,    # for jpg format
+            'png_compress_level': 9,  # 0-9, only used when png_optimize is off
+            'png_optimize': True,     # extra slow pass for the smallest png
+            'png_palette': 'off',     # off, exact (indexed png for <= 256 colours), lossy (also quantize)
+            'png_palette_min_psnr': 40.0,  # lossy: keep the 256 colour version only above this PSNR
+            'webp_lossless': False,
+            'webp_quality': 90,       # lossy quality, or compression effort when lossless
+            'webp_method': 4,         # 0 (fastest) - 6 (smallest)
+            'auto_fidelity': 90,      # auto: quality for photo/video-like frames, 100 = always lossless
+            'auto_lossless_format': 'png',  # auto: png, webp or qoi for UI/text-like frames
+            'auto_lossy_format': 'jpg',     # auto: jpg or webp for photo/video-like frames
+            'auto_png_level': 6,
             'capture_region': 'fullscreen',  # fullscreen, custom
             'custom_region': {'x': 0, 'y': 0, 'width': 1920, 'height': 1080},
             'monitor_index': 1,  # which monitor to capture (1 = primary)
+            'control_api_enabled': False,  # local socket API (control_server.py)
+            'control_socket_path': '',     # empty = per-user default in temp dir
+            'capture_backend': 'mss',      # mss, xshm, xdamage, synthetic, replay (see capture_backends.py)
+            'capture_backend_options': {},
+            'metrics_enabled': False,      # in-process metrics registry (metrics.py)
+            'metrics_json_path': '',       # periodic JSON snapshot file, empty = off
+            'metrics_json_interval': 10,   # seconds between JSON snapshots
+            'metrics_http_port': 0,        # OpenMetrics endpoint on 127.0.0.1, 0 = off
+            'trace_enabled': False,        # span tracing of capture/recording (tracing.py)
+            'trace_buffer_events': 200000, # ring size; oldest spans are overwritten
+            'trace_hotkey': 'ctrl+shift+t',  # dump the trace ring to the save folder
+            'resource_sample_interval': 2.0,  # seconds between CPU/RAM/disk samples (resource_monitor.py)
+            'resource_history_size': 300,     # samples kept in the history ring
+            'disk_write_behind': True,     # write screenshots on the shared writer thread (disk_writer.py)
+            'disk_fsync': 'close',         # never, close, interval
+            'disk_fsync_interval': 5.0,    # seconds between fsyncs for the 'interval' policy
+            'disk_reserve_mb': 500,        # stop recording / pause auto-capture below this much free space
+            'disk_buffer_kb': 1024,        # write size for streamed files
+            'retention_screenshots_max_mb': 0,     # delete oldest screenshots above this total, 0 = off
+            'retention_screenshots_max_days': 0,   # delete screenshots older than this, 0 = off
+            'retention_screenshots_max_count': 0,  # keep at most this many screenshots, 0 = off
+            'catalog_enabled': True,       # SQLite catalog of every capture (capture_catalog.py)
+            'catalog_path': '',            # empty = capture_catalog.db in the save folder
+            'output_shard': 'none',        # none, day (FOLDER/YYYY-MM-DD/), hour (FOLDER/YYYY-MM-DD/HH/)
+            'thumbnails_enabled': True,    # JPEG thumbnails in FOLDER/.thumbnails (thumbnail_cache.py)
+            'thumbnail_size': 320,         # longest side in pixels
+            'timelapse_fps': 30,           # timelapse_builder.py output settings
+            'timelapse_scale': 0.5,
+            'timelapse_gaps': 'compress',  # compress, hold (repeat frames over missed captures)
+            'timelapse_encoder': 'opencv', # opencv, ffmpeg
+            'auto_capture_mode': 'images', # images (one file per tick) or video (video_timelapse.py)
+            'autovideo_fps': 10,           # playback fps of direct-to-video auto-capture
+            'autovideo_encoder': 'ffmpeg', # ffmpeg (fragmented MP4: a crash loses at most the last frame) or opencv
+            'autovideo_crf': 28,
+            'autovideo_segment_minutes': 10,  # start a new file this often
+            'capture_views': [],           # named regions saved from one grab per capture (region_views.py)
         }
 
+        # Metrics exporters (started by start_metrics)
+        self.metrics_exporter = None
+        self.metrics_server = None
+
+        # Background CPU/RAM/disk sampler (started by start_resource_monitor)
+        self.resource_monitor = None
+
+        # Open direct-to-video auto-capture session and the index of the last one
+        self.video_timelapse = None
+        self.last_video_index = None
+        self.video_lock = threading.Lock()
+
+        # Timelapse build running in the background (start_timelapse)
+        self.timelapse_builder = None
+        self.timelapse_stats = {}
+
         # Callbacks for UI updates
         self.status_callback = None
         self.memory_callback = None
 
         self.load_settings()
+        self.configure_disk_writer()
+        self.configure_retention()
+        RETENTION.add_listener(self._on_file_deleted)
 
     def set_callbacks(self, status_callback=None, memory_callback=None):
         """Set callback functions for UI updates"""
@@ -84,6 +185,8 @@ class ScreenshotEngine:
     def update_setting(self, key, value):
         """Update a single setting"""
         self.settings[key] = value
+        if key.startswith('retention_'):
+            self.configure_retention()
 
     def get_setting(self, key):
         """Get a setting value"""
@@ -95,6 +198,8 @@ class ScreenshotEngine:
             keyboard.unhook_all()
             keyboard.add_hotkey(self.settings['capture_hotkey'], self.manual_capture)
             keyboard.add_hotkey(self.settings['stop_hotkey'], self.stop_all_capture)
+            if self.settings.get('trace_enabled') and self.settings.get('trace_hotkey'):
+                keyboard.add_hotkey(self.settings['trace_hotkey'], self.dump_trace)
         except Exception as e:
             print(f"Error setting up hotkeys: {e}")
 
@@ -107,10 +212,71 @@ class ScreenshotEngine:
             print(f"Error creating MSS instance: {e}")
             return None
 
+    def get_capture_backend(self):
+        """Capture backend of the calling thread. It is created on first use and kept for the
+        thread's later captures (X11 connections, shared memory and damage state survive);
+        callers must not close it. A thread makes a new one when the capture_backend
+        settings change, and backends of exited threads are closed here"""
+        key = (self.backend_generation, self.settings.get('capture_backend', 'mss'),
+               json.dumps(self.settings.get('capture_backend_options') or {}, sort_keys=True, default=str))
+        entry = getattr(self.backend_local, 'entry', None)
+        if entry and entry[0] == key:
+            return entry[1]
+        self.reset_capture_backend()
+        self._close_exited_backends()
+        try:
+            backend = create_capture_backend(key[1], self.settings.get('capture_backend_options'))
+        except Exception as e:
+            print(f"Error creating capture backend: {e}")
+            return None
+        self.backend_local.entry = (key, backend)
+        with self.backend_lock:
+            self.backends[threading.current_thread()] = backend
+        return backend
+
+    def reset_capture_backend(self):
+        """Close the calling thread's backend; its next capture creates a new one"""
+        entry = getattr(self.backend_local, 'entry', None)
+        self.backend_local.entry = None
+        if entry:
+            with self.backend_lock:
+                owned = self.backends.get(threading.current_thread()) is entry[1]
+                if owned:
+                    del self.backends[threading.current_thread()]
+            if owned:
+                self._close_backend(entry[1])
+
+    def _close_exited_backends(self):
+        with self.backend_lock:
+            exited = [thread for thread in self.backends if not thread.is_alive()]
+            backends = [self.backends.pop(thread) for thread in exited]
+        for backend in backends:
+            self._close_backend(backend)
+
+    def close_capture_backends(self):
+        """Close the backends of all threads (shutdown); threads still capturing make new ones"""
+        with self.backend_lock:
+            self.backend_generation += 1
+            backends = list(self.backends.values())
+            self.backends.clear()
+        for backend in backends:
+            self._close_backend(backend)
+
+    @staticmethod
+    def _close_backend(backend):
+        try:
+            backend.close()
+        except Exception as e:
+            print(f"Error closing capture backend: {e}")
+
     def get_monitor_info(self):
-        """Get information about available monitors"""
-        sct = self.get_mss_instance()
-        if not sct:
+        """Get information about available monitors (from a fresh backend, so that monitor
+        changes show up even though capture backends are kept per thread)"""
+        try:
+            sct = create_capture_backend(self.settings.get('capture_backend', 'mss'),
+                                         self.settings.get('capture_backend_options'))
+        except Exception as e:
+            print(f"Error creating capture backend: {e}")
             return []
             
         try:
@@ -131,14 +297,11 @@ class ScreenshotEngine:
             print(f"Error getting monitor info: {e}")
             return []
         finally:
-            try:
-                sct.close()
-            except:
-                pass
+            self._close_backend(sct)
 
     def get_capture_region(self):
-        """Get the region to capture based on settings"""
-        sct = self.get_mss_instance()
+        """Get the region to capture based on settings (monitor geometry from this thread's backend)"""
+        sct = self.get_capture_backend()
         if not sct:
             return {'left': 0, 'top': 0, 'width': 1920, 'height': 1080}
             
@@ -177,11 +340,11 @@ class ScreenshotEngine:
             print(f"Error getting capture region: {e}")
             # Fallback to full screen
             return {'left': 0, 'top': 0, 'width': 1920, 'height': 1080}
-        finally:
-            try:
-                sct.close()
-            except:
-                pass
+
+    def frame_to_image(self, frame):
+        """Convert a (h, w, 4) BGRA frame from a capture backend to an RGB PIL Image"""
+        height, width = frame.shape[:2]
+        return Image.frombuffer("RGB", (width, height), np.ascontiguousarray(frame), "raw", "BGRX", 0, 1)
 
     def save_to_clipboard(self, image):
         """Save image to clipboard"""
@@ -226,100 +389,234 @@ class ScreenshotEngine:
         except Exception as e:
             print(f"Error saving to clipboard: {e}")
 
-    def manual_capture(self):
-        """Manual screenshot capture with MSS - sharper and faster"""
+    def encode_image(self, screenshot, capture_format):
+        """Encode a PIL image in the configured format and return the file bytes"""
+        return encode_image(screenshot, capture_format, encode_options(self.settings))
+
+    def encode_capture(self, screenshot, capture_format):
+        """(bytes, format used, auto decision or None); capture_format 'auto' picks per frame"""
+        return encode_capture(screenshot, capture_format, encode_options(self.settings))
+
+    def configure_disk_writer(self):
+        """Apply the disk_* settings to the shared write-behind writer"""
+        try:
+            DISK_WRITER.configure(fsync=self.settings.get('disk_fsync'),
+                                  fsync_interval=self.settings.get('disk_fsync_interval'),
+                                  reserve_mb=self.settings.get('disk_reserve_mb'),
+                                  buffer_kb=self.settings.get('disk_buffer_kb'))
+        except ValueError as e:
+            print(f"Error in disk settings: {e}")
+
+    def configure_retention(self):
+        """Apply the retention_screenshots_* quotas and start the retention thread if any is set"""
+        try:
+            RETENTION.configure('screenshots', self.settings.get('retention_screenshots_max_mb'),
+                                self.settings.get('retention_screenshots_max_days'),
+                                self.settings.get('retention_screenshots_max_count'))
+        except ValueError as e:
+            print(f"Error in retention settings: {e}")
+        RETENTION.set_folder(self.settings.get('folder_path'))
+        RETENTION.start()
+
+    def catalog_db_path(self):
+        """Catalog file for the current save folder, or None when the catalog is off"""
+        if not self.settings.get('catalog_enabled', True):
+            return None
+        return catalog_path_for(self.settings.get('folder_path'), self.settings.get('catalog_path'))
+
+    def catalog_capture(self, filename, kind, captured_at, region, monitor, frame, capture_format, data,
+                        decision=None):
+        """Queue a catalog row for a saved image (returns immediately); decision is the
+        capture_format 'auto' choice, kept in the row's extra JSON"""
+        height, width = frame.shape[:2]
+        CATALOG.record(self.catalog_db_path(), {
+            'path': os.path.abspath(filename), 'kind': kind, 'created': captured_at, 'monitor': monitor,
+            'region_x': region['left'], 'region_y': region['top'], 'width': width, 'height': height,
+            'format': capture_format, 'bytes': len(data), 'extra': {'auto': decision} if decision else None,
+        }, data)
+
+    def queue_thumbnail(self, screenshot, data):
+        """Hand the in-memory capture to the thumbnail cache (resized and saved in the background)"""
+        if self.settings.get('thumbnails_enabled', True):
+            THUMBNAILS.size = int(self.settings.get('thumbnail_size') or 320)
+            THUMBNAILS.submit(cache_dir_for(self.settings.get('folder_path')), screenshot, data)
+
+    def get_thumbnails(self, start=None, end=None, limit=1000, include_data=False):
+        """Catalogued screenshots in a time range with their cached thumbnails"""
+        CATALOG.flush(timeout=2)
+        THUMBNAILS.flush(timeout=2)
+        return get_thumbnails(self.settings.get('folder_path'), start, end, limit, include_data,
+                              self.catalog_db_path())
+
+    def _on_file_deleted(self, path):
+        """Retention listener: drop deleted files from the catalog"""
+        CATALOG.remove(self.catalog_db_path(), os.path.abspath(path))
+
+    def disk_space_low(self):
+        """True when the save folder is below the configured free-space reserve"""
+        return DISK_WRITER.space_low(self.settings.get('folder_path'))
+
+    def write_image_file(self, filename, data):
+        """Write (or queue, with disk_write_behind) encoded image bytes and return their size"""
+        if self.settings.get('disk_write_behind', True):
+            DISK_WRITER.write_file(filename, data, self._on_image_written)
+            return len(data)
+        with open(filename, 'wb') as f:
+            f.write(data)
+        RETENTION.add(filename, len(data), self.settings.get('folder_path'))
+        return len(data)
+
+    def _on_image_written(self, path, error):
+        """Write-behind completion callback (runs on the disk writer thread)"""
+        if error:
+            SCREENSHOT_ERRORS.inc()
+            self.update_status(f"Error saving {os.path.basename(path)}: {error}")
+            CATALOG.remove(self.catalog_db_path(), os.path.abspath(path))
+            return
+        RETENTION.add(path, folder=self.settings.get('folder_path'))
+
+    def observe_capture(self, t0, t1, t2, t3, t4, file_bytes):
+        """Record one screenshot's grab/convert/encode/write timestamps in metrics and the tracer"""
+        GRAB_SECONDS.observe(t1 - t0)
+        CONVERT_SECONDS.observe(t2 - t1)
+        ENCODE_SECONDS.observe(t3 - t2)
+        WRITE_SECONDS.observe(t4 - t3)
+        SCREENSHOTS_SAVED.inc()
+        SCREENSHOT_BYTES.inc(file_bytes)
+        if TRACER.enabled:
+            TRACER.complete('screenshot', t0, t4, {'bytes': file_bytes}, 'screenshot')
+            TRACER.complete('grab', t0, t1, None, 'screenshot')
+            TRACER.complete('convert', t1, t2, None, 'screenshot')
+            TRACER.complete('encode', t2, t3, None, 'screenshot')
+            TRACER.complete('write', t3, t4, None, 'screenshot')
+
+    def manual_capture(self, clipboard=True, timing=None):
+        """Manual screenshot capture with MSS - sharper and faster. Returns the saved path or None.
+        A timing dict gets this capture's 'grab_time' (perf_counter when the pixels were grabbed)"""
         if not self.settings['folder_path']:
             print("Error: Please select a save folder!")
-            return
+            return None
+        if self.disk_space_low():
+            self.update_status("Error: Not enough free disk space in the save folder")
+            return None
 
-        # Create thread-safe MSS instance
-        sct = self.get_mss_instance()
+        # Capture backend of this thread (kept between captures)
+        sct = self.get_capture_backend()
         if not sct:
-            self.update_status("Error: Could not initialize MSS")
-            return
+            self.update_status("Error: Could not initialize capture backend")
+            return None
 
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             capture_format = self.settings.get('capture_format', 'png').lower()
-            filename = os.path.join(self.settings['folder_path'], f"screenshot_{timestamp}.{capture_format}")
 
             # Get capture region
             region = self.get_capture_region()
             
-            # Take screenshot using MSS (much faster and sharper than pyautogui)
+            # Take screenshot using the capture backend (MSS by default)
+            captured_at = time.time()
+            t0 = time.perf_counter()
             screenshot_data = sct.grab(region)
+            self.last_grab_time = t1 = time.perf_counter()
+            if timing is not None:
+                timing['grab_time'] = t1
             
-            # Convert MSS screenshot to PIL Image
-            screenshot = Image.frombytes("RGB", screenshot_data.size, screenshot_data.bgra, "raw", "BGRX")
+            # Convert BGRA frame to PIL Image
+            screenshot = self.frame_to_image(screenshot_data)
+            t2 = time.perf_counter()
             
-            # Save to file with specified format and quality
-            if capture_format == 'jpg' or capture_format == 'jpeg':
-                screenshot = screenshot.convert('RGB')
-                quality = self.settings.get('capture_quality', 95)
-                screenshot.save(filename, format='JPEG', quality=quality, optimize=True)
-            elif capture_format == 'bmp':
-                screenshot.save(filename, format='BMP')
-            else:  # Default to PNG
-                screenshot.save(filename, format='PNG', optimize=True)
+            # Encode with specified format and quality ('auto' decides here), then write to file
+            data, capture_format, decision = self.encode_capture(screenshot, capture_format)
+            t3 = time.perf_counter()
+            filename = OUTPUT_LAYOUT.path(self.settings['folder_path'], 'screenshot', capture_format,
+                                          self.settings.get('output_shard', 'none'),
+                                          datetime.fromtimestamp(captured_at))
+            file_bytes = self.write_image_file(filename, data)
+            t4 = time.perf_counter()
+            self.catalog_capture(filename, 'screenshot', captured_at, region,
+                                 monitor_for_region(sct.monitors, region), screenshot_data,
+                                 capture_format, data, decision)
+            self.queue_thumbnail(screenshot, data)
             
             # Save to clipboard
-            self.save_to_clipboard(screenshot)
+            if clipboard:
+                self.save_to_clipboard(screenshot)
 
-            # Get file size for status
-            file_size = os.path.getsize(filename) / 1024  # KB
-            self.update_status(f"Captured: {os.path.basename(filename)} ({file_size:.1f}KB) + clipboard")
+            self.last_capture_stats = {
+                'format': capture_format,
+                'grab_ms': (t1 - t0) * 1000,
+                'convert_ms': (t2 - t1) * 1000,
+                'encode_ms': (t3 - t2) * 1000,
+                'write_ms': (t4 - t3) * 1000,
+                'bytes': file_bytes,
+                'auto': decision,
+            }
+            self.observe_capture(t0, t1, t2, t3, t4, file_bytes)
+            file_size = file_bytes / 1024  # KB
+            suffix = " + clipboard" if clipboard else ""
+            self.update_status(f"Captured: {os.path.basename(filename)} ({file_size:.1f}KB){suffix}")
 
             # Clean up memory
             del screenshot
             del screenshot_data
             gc.collect()
 
+            return filename
+
         except Exception as e:
             print(f"Failed to capture: {e}")
+            self.reset_capture_backend()  # a broken backend is not reused
+            SCREENSHOT_ERRORS.inc()
             self.update_status(f"Error: {e}")
-        finally:
-            # Always close the MSS instance
-            try:
-                sct.close()
-            except:
-                pass
+            return None
 
-    def capture_region(self, x, y, width, height):
-        """Capture a specific region of the screen"""
-        # Create thread-safe MSS instance
-        sct = self.get_mss_instance()
+    def capture_region(self, x, y, width, height, clipboard=True, timing=None):
+        """Capture a specific region of the screen (timing: see manual_capture)"""
+        if self.disk_space_low():
+            self.update_status("Error: Not enough free disk space in the save folder")
+            return None
+
+        # Capture backend of this thread (kept between captures)
+        sct = self.get_capture_backend()
         if not sct:
-            self.update_status("Error: Could not initialize MSS")
+            self.update_status("Error: Could not initialize capture backend")
             return None
 
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             capture_format = self.settings.get('capture_format', 'png').lower()
-            filename = os.path.join(self.settings['folder_path'], f"region_{timestamp}.{capture_format}")
 
             # Define custom region
             region = {'left': x, 'top': y, 'width': width, 'height': height}
             
-            # Take screenshot using MSS
+            # Take screenshot using the capture backend
+            captured_at = time.time()
+            t0 = time.perf_counter()
             screenshot_data = sct.grab(region)
+            self.last_grab_time = t1 = time.perf_counter()
+            if timing is not None:
+                timing['grab_time'] = t1
             
             # Convert to PIL Image
-            screenshot = Image.frombytes("RGB", screenshot_data.size, screenshot_data.bgra, "raw", "BGRX")
+            screenshot = self.frame_to_image(screenshot_data)
+            t2 = time.perf_counter()
             
             # Save to file
-            if capture_format == 'jpg' or capture_format == 'jpeg':
-                screenshot = screenshot.convert('RGB')
-                quality = self.settings.get('capture_quality', 95)
-                screenshot.save(filename, format='JPEG', quality=quality, optimize=True)
-            elif capture_format == 'bmp':
-                screenshot.save(filename, format='BMP')
-            else:
-                screenshot.save(filename, format='PNG', optimize=True)
+            data, capture_format, decision = self.encode_capture(screenshot, capture_format)
+            t3 = time.perf_counter()
+            filename = OUTPUT_LAYOUT.path(self.settings['folder_path'], 'region', capture_format,
+                                          self.settings.get('output_shard', 'none'),
+                                          datetime.fromtimestamp(captured_at))
+            file_bytes = self.write_image_file(filename, data)
+            self.observe_capture(t0, t1, t2, t3, time.perf_counter(), file_bytes)
+            self.catalog_capture(filename, 'region', captured_at, region,
+                                 monitor_for_region(sct.monitors, region), screenshot_data,
+                                 capture_format, data, decision)
+            self.queue_thumbnail(screenshot, data)
             
             # Save to clipboard
-            self.save_to_clipboard(screenshot)
+            if clipboard:
+                self.save_to_clipboard(screenshot)
 
-            file_size = os.path.getsize(filename) / 1024
+            file_size = file_bytes / 1024
             self.update_status(f"Region captured: {os.path.basename(filename)} ({file_size:.1f}KB)")
 
             # Clean up
@@ -331,14 +628,85 @@ class ScreenshotEngine:
 
         except Exception as e:
             print(f"Failed to capture region: {e}")
+            self.reset_capture_backend()  # a broken backend is not reused
+            SCREENSHOT_ERRORS.inc()
             self.update_status(f"Region capture error: {e}")
             return None
-        finally:
-            # Always close the MSS instance
-            try:
-                sct.close()
-            except:
-                pass
+
+    def capture_views(self, views=None, clipboard=False, timing=None):
+        """Grab the union of several named regions once and save each as its own file
+        (region_<time>_<name>). Uses the capture_views setting if views is not given.
+        Returns the saved paths (timing: see manual_capture)"""
+        if not self.settings['folder_path']:
+            print("Error: Please select a save folder!")
+            return []
+        if self.disk_space_low():
+            self.update_status("Error: Not enough free disk space in the save folder")
+            return []
+
+        sct = self.get_capture_backend()
+        if not sct:
+            self.update_status("Error: Could not initialize capture backend")
+            return []
+
+        try:
+            views = resolve_views(views if views is not None else self.settings.get('capture_views'), sct.monitors)
+            if not views:
+                raise ValueError("No capture views configured")
+            requested_format = self.settings.get('capture_format', 'png').lower()
+            # All views of one grab share the time stamp and sequence number in their names
+            folder, stem = OUTPUT_LAYOUT.reserve(self.settings['folder_path'], 'region',
+                                                 self.settings.get('output_shard', 'none'))
+
+            captured_at = time.time()
+            t0 = time.perf_counter()
+            frame, union, crops = grab_views(sct, views)
+            self.last_grab_time = grabbed = t1 = time.perf_counter()
+            if timing is not None:
+                timing['grab_time'] = t1
+            GRAB_SECONDS.observe(t1 - t0)
+
+            paths = []
+            total_bytes = 0
+            for name, region, view in crops:
+                t1 = time.perf_counter()
+                screenshot = self.frame_to_image(view)  # copies just this view's pixels
+                t2 = time.perf_counter()
+                # 'auto' decides per view: a video pane and a terminal can get different formats
+                data, capture_format, decision = self.encode_capture(screenshot, requested_format)
+                t3 = time.perf_counter()
+                filename = os.path.join(folder, f"{stem}_{name}.{capture_format}")
+                file_bytes = self.write_image_file(filename, data)
+                t4 = time.perf_counter()
+                CONVERT_SECONDS.observe(t2 - t1)
+                ENCODE_SECONDS.observe(t3 - t2)
+                WRITE_SECONDS.observe(t4 - t3)
+                SCREENSHOTS_SAVED.inc()
+                SCREENSHOT_BYTES.inc(file_bytes)
+                if TRACER.enabled:
+                    TRACER.complete('view', t1, t4, {'view': name, 'bytes': file_bytes}, 'screenshot')
+                self.catalog_capture(filename, 'region', captured_at, region,
+                                     monitor_for_region(sct.monitors, region), view, capture_format, data,
+                                     decision)
+                self.queue_thumbnail(screenshot, data)
+                if clipboard and not paths:
+                    self.save_to_clipboard(screenshot)
+                paths.append(filename)
+                total_bytes += file_bytes
+            if TRACER.enabled:
+                TRACER.complete('grab', t0, grabbed, {'views': len(crops)}, 'screenshot')
+
+            self.update_status(f"Captured {len(paths)} views: {stem} ({total_bytes / 1024:.1f}KB)")
+            del frame, crops
+            gc.collect()
+            return paths
+
+        except Exception as e:
+            print(f"Failed to capture views: {e}")
+            self.reset_capture_backend()  # a broken backend is not reused
+            SCREENSHOT_ERRORS.inc()
+            self.update_status(f"Error: {e}")
+            return []
 
     def start_auto_capture(self):
         """Start auto capture with duration support"""
@@ -376,8 +744,14 @@ class ScreenshotEngine:
                         self.update_status("Auto-capture completed - duration limit reached")
                         break
                 
-                # Take screenshot (this will create its own MSS instance)
-                self.manual_capture()
+                # Pause (without ending the session) while the disk is nearly full
+                if self.disk_space_low():
+                    self.update_status("Auto-capture paused: low disk space")
+                    time.sleep(min(5, self.settings['auto_capture_interval']))
+                    continue
+
+                # Take screenshot (this will create its own MSS instance) or append a video frame
+                self.auto_capture_tick()
                 
                 # Wait for the specified interval with interruption check
                 interval = self.settings['auto_capture_interval']
@@ -397,13 +771,20 @@ class ScreenshotEngine:
             except Exception as e:
                 print(f"Auto capture error: {e}")
                 time.sleep(1)
+        self.close_video_timelapse()
 
     def auto_capture_loop(self):
         """Auto capture loop running in background thread with clipboard support"""
         while self.settings['auto_capture_enabled'] and self.is_capturing:
             try:
-                # Use manual_capture which creates its own MSS instance
-                self.manual_capture()
+                # Pause while the disk is nearly full
+                if self.disk_space_low():
+                    self.update_status("Auto-capture paused: low disk space")
+                    time.sleep(min(5, self.settings['auto_capture_interval']))
+                    continue
+
+                # Use manual_capture which creates its own MSS instance (or append a video frame)
+                self.auto_capture_tick()
                 
                 # Wait for the specified interval
                 for _ in range(self.settings['auto_capture_interval']):
@@ -414,6 +795,133 @@ class ScreenshotEngine:
             except Exception as e:
                 print(f"Auto capture error: {e}")
                 time.sleep(1)
+        self.close_video_timelapse()
+
+    def auto_capture_tick(self):
+        """One auto-capture: a screenshot file (one per view with capture_views), or a frame of the
+        session video in 'video' mode"""
+        if self.settings.get('auto_capture_mode') == 'video':
+            return self.capture_to_video()
+        if self.settings.get('capture_views'):
+            return self.capture_views()
+        return self.manual_capture()
+
+    def capture_to_video(self):
+        """Grab the capture region and append it to the direct-to-video session. Returns the segment path"""
+        sct = self.get_capture_backend()
+        if not sct:
+            self.update_status("Error: Could not initialize capture backend")
+            return None
+        try:
+            region = self.get_capture_region()
+            captured_at = time.time()
+            t0 = time.perf_counter()
+            frame = sct.grab(region)
+            self.last_grab_time = t1 = time.perf_counter()
+            GRAB_SECONDS.observe(t1 - t0)
+
+            with self.video_lock:
+                return self._append_video_frame(frame, captured_at, t0)
+        except Exception as e:
+            print(f"Failed to capture video frame: {e}")
+            self.reset_capture_backend()  # a broken backend is not reused
+            SCREENSHOT_ERRORS.inc()
+            self.update_status(f"Error: {e}")
+            return None
+
+    def _append_video_frame(self, frame, captured_at, t0):
+        """Append to the open session, starting one if needed (caller holds video_lock)"""
+        if not self.video_timelapse:
+            folder = self.settings['folder_path']
+            directory, basename = OUTPUT_LAYOUT.reserve(folder, 'autovideo', self.settings.get('output_shard', 'none'))
+            self.video_timelapse = VideoTimelapseWriter(
+                directory, basename, fps=int(self.settings.get('autovideo_fps', 10)),
+                encoder=self.settings.get('autovideo_encoder', 'ffmpeg'),
+                segment_minutes=self.settings.get('autovideo_segment_minutes', 10),
+                crf=int(self.settings.get('autovideo_crf', 28)))
+            self.last_video_index = self.video_timelapse.index_path
+        path = self.video_timelapse.append(frame, captured_at)
+        if TRACER.enabled:
+            TRACER.complete('autovideo_frame', t0, time.perf_counter(), None, 'screenshot')
+        self.update_status(f"Auto-capture frame {self.video_timelapse.frames} -> {os.path.basename(path)}")
+        return path
+
+    def close_video_timelapse(self):
+        """Finish the direct-to-video session and hand its files to the catalog and retention"""
+        with self.video_lock:
+            writer, self.video_timelapse = self.video_timelapse, None
+            if not writer:
+                return []
+            paths = writer.close()
+        folder = self.settings.get('folder_path')
+        for segment in writer.writer.segments:
+            try:
+                size = os.path.getsize(segment['path'])
+            except OSError:
+                continue
+            CATALOG.record(self.catalog_db_path(), {
+                'path': os.path.abspath(segment['path']), 'kind': 'autovideo', 'created': segment.get('started'),
+                'width': segment['width'], 'height': segment['height'], 'format': writer.writer.extension,
+                'bytes': size, 'duration_s': round(segment['frames'] / writer.fps, 3), 'fps': writer.fps,
+                'extra': {'frames': segment['frames'], 'index': writer.index_path},
+            })
+            RETENTION.add(segment['path'], size, folder)
+        RETENTION.add(writer.index_path, folder=folder)
+        self.update_status(f"Auto-capture video saved: {writer.frames} frames in {len(paths)} file(s)")
+        return paths
+
+    def export_video_frame(self, when=None, frame_number=None, index_path=None, output_path=None):
+        """Export one frame of a direct-to-video session (default: the last session) as an image"""
+        index_path = index_path or self.last_video_index
+        if not index_path:
+            self.update_status("No auto-capture video session")
+            return None
+        try:
+            path, _ = export_frame(index_path, when, frame_number, output_path)
+        except (OSError, ValueError) as e:
+            self.update_status(f"Error exporting frame: {e}")
+            return None
+        self.update_status(f"Frame exported: {os.path.basename(path)}")
+        return path
+
+    def start_timelapse(self, start=None, end=None, output_path=None, wait=False):
+        """Build a timelapse of the save folder's screenshots (start..end) in the background.
+        Returns the output path, or the final stats with wait"""
+        folder = self.settings.get('folder_path')
+        if not folder:
+            self.update_status("Error: Please select a save folder!")
+            return None
+        if self.timelapse_builder:
+            self.update_status("A timelapse is already being built")
+            return None
+        output_path = output_path or OUTPUT_LAYOUT.path(folder, 'timelapse', 'mp4')
+        builder = self.timelapse_builder = TimelapseBuilder(
+            output_path, fps=int(self.settings.get('timelapse_fps', 30)),
+            scale=float(self.settings.get('timelapse_scale', 0.5)),
+            encoder=self.settings.get('timelapse_encoder', 'opencv'),
+            gaps=self.settings.get('timelapse_gaps', 'compress'),
+            progress=lambda stats: self.update_status(
+                f"Timelapse: {stats['decoded']}/{stats['screenshots']} frames ({stats['frames_per_s']:.0f} fps)"))
+
+        def run():
+            try:
+                self.timelapse_stats = builder.build(collect_frames(folder, start, end))
+                stats = self.timelapse_stats
+                self.update_status(f"Timelapse saved: {os.path.basename(output_path)} "
+                                   f"({stats['frames_written']} frames, {stats['frames_per_s']:.0f} fps)")
+            except Exception as e:
+                print(f"Timelapse error: {e}")
+                self.timelapse_stats = {'error': str(e)}
+                self.update_status(f"Timelapse error: {e}")
+            finally:
+                self.timelapse_builder = None
+
+        self.update_status("Building timelapse...")
+        if wait:
+            run()
+            return self.timelapse_stats
+        threading.Thread(target=run, name='Timelapse', daemon=True).start()
+        return output_path
 
     def start_background_capture(self):
         """Start background capture process with MSS"""
@@ -493,6 +1001,9 @@ class ScreenshotEngine:
 
     def get_memory_usage(self):
         """Get current memory usage"""
+        sample = self.resource_monitor.latest() if self.resource_monitor else None
+        if sample:
+            return f"Memory: {sample['rss_bytes'] / 1024 / 1024:.1f} MB"
         try:
             process = psutil.Process()
             memory_mb = process.memory_info().rss / 1024 / 1024
@@ -500,12 +1011,94 @@ class ScreenshotEngine:
         except:
             return "Memory: N/A"
 
+    def start_resource_monitor(self):
+        """Start sampling CPU, memory, threads and disk usage in the background"""
+        if self.resource_monitor:
+            return self.resource_monitor
+        self.resource_monitor = ResourceMonitor(
+            interval=self.settings.get('resource_sample_interval', 2.0),
+            history=self.settings.get('resource_history_size', 300),
+            folder_getter=lambda: self.settings.get('folder_path'),
+        )
+        self.resource_monitor.add_listener(self._on_resource_sample)
+        self.resource_monitor.start()
+        return self.resource_monitor
+
+    def stop_resource_monitor(self):
+        if self.resource_monitor:
+            self.resource_monitor.stop()
+            self.resource_monitor = None
+
+    def _on_resource_sample(self, sample):
+        """Forward each sample to the memory callback (called on the sampler thread)"""
+        if self.memory_callback:
+            self.memory_callback(format_sample(sample))
+
+    def get_resource_stats(self, seconds=None, include_history=False):
+        """Latest sample and summary of the resource history (empty if the sampler is not running)"""
+        if not self.resource_monitor:
+            return {'running': False}
+        result = {
+            'running': True,
+            'latest': self.resource_monitor.latest(),
+            'summary': self.resource_monitor.summary(seconds),
+        }
+        if include_history:
+            result['history'] = self.resource_monitor.get_history(seconds)
+        return result
+
+    def start_metrics(self):
+        """Enable the metrics registry and start the configured exporters"""
+        REGISTRY.enabled = True
+        json_path = self.settings.get('metrics_json_path')
+        if json_path and not self.metrics_exporter:
+            self.metrics_exporter = JsonSnapshotExporter(json_path, self.settings.get('metrics_json_interval', 10))
+            self.metrics_exporter.start()
+        port = int(self.settings.get('metrics_http_port') or 0)
+        if port and not self.metrics_server:
+            server = OpenMetricsServer(port)
+            if server.start():
+                self.metrics_server = server
+                print(f"Metrics endpoint: http://127.0.0.1:{server.port}/metrics")
+
+    def stop_metrics(self):
+        """Stop the exporters (writing a final JSON snapshot) and disable the registry"""
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        REGISTRY.enabled = False
+
+    def start_tracing(self):
+        """Start recording spans into the trace ring"""
+        TRACER.start(self.settings.get('trace_buffer_events'))
+
+    def dump_trace(self):
+        """Write the trace ring to the save folder as Chrome trace JSON (open in ui.perfetto.dev)"""
+        if not TRACER.enabled:
+            self.update_status("Tracing is not enabled")
+            return None
+        folder = self.settings.get('folder_path') or '.'
+        path = TRACER.dump(OUTPUT_LAYOUT.path(folder, 'trace', 'json'))
+        if path:
+            self.update_status(f"Trace saved: {os.path.basename(path)}")
+        return path
+
     def cleanup(self):
         """Cleanup resources"""
         self.is_capturing = False
         self.save_settings()
+        self.stop_metrics()
+        self.stop_resource_monitor()
+        self.close_video_timelapse()
+        # Let queued screenshots reach the disk (and the catalog) before exiting
+        DISK_WRITER.wait_idle(timeout=10)
+        CATALOG.flush(timeout=5)
+        THUMBNAILS.flush(timeout=5)
         
-        # MSS instances are created per-call and closed immediately, no cleanup needed
+        self.close_capture_backends()
         
         if self.tray_icon:
             try:
@@ -0,0 +1,86 @@
+# single_instance.py
+# Single-instance lock so only one process owns the hotkeys, tray icon and engines
+# Dependencies: none (standard library only)
+#
+# The lock is an OS-level file lock (flock on POSIX, msvcrt.locking on Windows).
+# The OS drops it when the owning process dies, so a crash never leaves a lock
+# that blocks the next launch; the PID written into the file is informational.
+
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def default_lock_path():
+    """Per-user lock file path in the temp directory"""
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f"n-snaprecorder-{uid}.lock")
+
+
+class InstanceLock:
+    def __init__(self, path=None):
+        self.path = path or default_lock_path()
+        self.handle = None
+
+    @property
+    def acquired(self):
+        return self.handle is not None
+
+    def acquire(self):
+        """Try to become the primary instance. Returns False if another live process holds the lock"""
+        if self.handle:
+            return True
+        handle = open(self.path, 'a+')
+        try:
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.close()
+            return False
+
+        # Lock is ours - any previous owner has exited (cleanly or not), so overwrite its PID
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self.handle = handle
+        return True
+
+    def owner_pid(self):
+        """PID recorded by the current lock owner, or None"""
+        try:
+            with open(self.path, 'r') as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        """Release the lock"""
+        if not self.handle:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            self.handle.close()
+            self.handle = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,98 @@
+# test_adaptive_quality.py
+# Tests for the adaptive quality ladder and its closed-loop controller
+# Dependencies: pytest, psutil
+
+from adaptive_quality import AdaptiveQualityController, build_ladder
+
+
+def controller(ladder=None, cpu=0.0, **kwargs):
+    """Controller with a fixed process CPU reading and a known start time of 0"""
+    kwargs.setdefault('cooldown', 2.0)
+    kwargs.setdefault('recover_after', 5.0)
+    ctl = AdaptiveQualityController(ladder or build_ladder(30, 10, 0.5), **kwargs)
+    ctl.process_cpu = lambda: cpu
+    ctl.started = ctl.window_start = ctl.last_change = 0.0
+    return ctl
+
+
+def test_ladder_lowers_fps_then_scale_then_preset():
+    ladder = build_ladder(30, 10, 0.5, preset='fast', fastest_preset='veryfast')
+    assert ladder[0] == {'fps': 30, 'scale': 1.0, 'preset': 'fast'}
+    assert [step['fps'] for step in ladder[:4]] == [30, 22, 15, 10]
+    assert [step['scale'] for step in ladder[3:6]] == [1.0, 0.75, 0.5]
+    assert [step['preset'] for step in ladder[5:]] == ['fast', 'faster', 'veryfast']
+    assert ladder[-1] == {'fps': 10, 'scale': 0.5, 'preset': 'veryfast'}
+
+
+def test_ladder_respects_floors():
+    ladder = build_ladder(10, 25)  # min fps above fps is clamped to fps, scale floor 1.0
+    assert ladder == [{'fps': 10, 'scale': 1.0, 'preset': None}]
+    ladder = build_ladder(30, 1, 0.3)
+    assert min(step['fps'] for step in ladder) == 8
+    assert min(step['scale'] for step in ladder) == 0.35
+
+
+def test_ladder_ignores_unknown_presets():
+    ladder = build_ladder(30, 30, preset='mjpg', fastest_preset='ultrafast')
+    assert ladder == [{'fps': 30, 'scale': 1.0, 'preset': 'mjpg'}]
+
+
+def test_no_evaluation_before_interval():
+    ctl = controller()
+    ctl.record_dropped(5)
+    assert ctl.update(now=0.5) is None
+    assert ctl.level == 0 and ctl.dropped == 5
+
+
+def test_dropped_frames_degrade_one_step():
+    ctl = controller()
+    ctl.record_dropped(1)
+    assert ctl.update(now=2.0) == ctl.ladder[1]
+    assert ctl.level == 1
+    entry = ctl.log[-1]
+    assert entry['action'] == 'degrade' and entry['session_s'] == 2.0
+    assert entry['from'] == ctl.ladder[0] and entry['to'] == ctl.ladder[1]
+    assert entry['reason']['dropped'] == 1
+
+
+def test_queue_lateness_and_cpu_count_as_pressure():
+    for report, cpu in ((lambda c: c.record_capture(0.0, 0.6), 0.0),
+                        (lambda c: c.record_capture(0.04, 0.0), 0.0),  # > half a 30 fps period
+                        (lambda c: c.record_capture(0.0, 0.0), 95.0)):
+        ctl = controller(cpu=cpu)
+        report(ctl)
+        assert ctl.update(now=2.0) is not None and ctl.level == 1
+
+
+def test_cooldown_limits_changes():
+    ctl = controller()
+    ctl.record_dropped(1)
+    ctl.update(now=2.0)
+    ctl.record_dropped(1)
+    assert ctl.update(now=3.0) is None  # still within the cooldown
+    ctl.record_dropped(1)
+    assert ctl.update(now=4.0) is not None and ctl.level == 2
+
+
+def test_stays_on_the_cheapest_step():
+    ctl = controller(build_ladder(30, 30))
+    ctl.record_dropped(1)
+    assert ctl.update(now=2.0) is None and ctl.level == 0
+
+
+def test_recovers_after_sustained_headroom():
+    ctl = controller()
+    ctl.record_dropped(1)
+    ctl.update(now=2.0)
+    for now in (3.0, 4.0, 5.0, 6.0, 7.0):
+        assert ctl.update(now=now) is None  # healthy since 3.0
+    assert ctl.update(now=8.0) == ctl.ladder[0]
+    assert ctl.log[-1]['action'] == 'recover'
+
+
+def test_moderate_load_neither_degrades_nor_recovers():
+    ctl = controller(cpu=70.0)  # between cpu_low and cpu_high
+    ctl.level = 1
+    for now in range(1, 12):
+        assert ctl.update(now=float(now)) is None
+    assert ctl.level == 1 and ctl.healthy_since is None
@@ -0,0 +1,119 @@
+# test_capture_backends.py
+# Tests for the synthetic and replay capture backends and backend selection with fallbacks
+# Dependencies: pytest, numpy, opencv-python
+
+import cv2
+import numpy as np
+import pytest
+
+import capture_backends
+from capture_backends import ReplayBackend, SyntheticBackend, create_capture_backend
+
+
+def region(left, top, width, height):
+    return {'left': left, 'top': top, 'width': width, 'height': height}
+
+
+def test_synthetic_frames_are_bgra_of_the_region():
+    with SyntheticBackend(320, 200) as backend:
+        assert backend.monitors == [region(0, 0, 320, 200), region(0, 0, 320, 200)]
+        frame = backend.grab(region(10, 20, 100, 50))
+        assert frame.shape == (50, 100, 4) and frame.dtype == np.uint8
+        assert frame.flags['C_CONTIGUOUS'] and (frame[:, :, 3] == 255).all()
+
+
+@pytest.mark.parametrize('pattern', SyntheticBackend.PATTERNS)
+def test_synthetic_sequence_is_deterministic_per_seed(pattern):
+    first, second = SyntheticBackend(160, 120, pattern, seed=1), SyntheticBackend(160, 120, pattern, seed=1)
+    full = region(0, 0, 160, 120)
+    frames = [first.grab(full) for _ in range(3)]
+    for frame in frames:
+        assert np.array_equal(frame, second.grab(full))
+    changes = not np.array_equal(frames[0], frames[1])
+    assert changes == (pattern != 'static')
+    other = SyntheticBackend(160, 120, pattern, seed=2)
+    assert not np.array_equal(frames[0], other.grab(full))
+
+
+def test_synthetic_rejects_regions_outside_the_screen():
+    backend = SyntheticBackend(320, 200)
+    for bad in (region(-1, 0, 10, 10), region(0, 0, 321, 10), region(300, 190, 30, 20)):
+        with pytest.raises(ValueError):
+            backend.grab(bad)
+    with pytest.raises(ValueError):
+        SyntheticBackend(pattern='plaid')
+
+
+def test_synthetic_monitors_are_side_by_side():
+    backend = SyntheticBackend(monitors=[(200, 100), (300, 150)], pattern='static')
+    assert backend.monitors == [region(0, 0, 500, 150), region(0, 0, 200, 100), region(200, 0, 300, 150)]
+    assert backend.grab(backend.monitors[2]).shape == (150, 300, 4)
+
+
+def write_video(path, colors, size=(64, 48)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10, size)
+    for color in colors:
+        writer.write(np.full((size[1], size[0], 3), color, dtype=np.uint8))
+    writer.release()
+
+
+def test_replay_returns_video_frames_and_loops(tmp_path):
+    path = tmp_path / 'replay.avi'
+    write_video(path, [(0, 0, 250), (0, 250, 0)])
+    with ReplayBackend(str(path)) as backend:
+        assert backend.monitors[1] == region(0, 0, 64, 48)
+        grabs = [backend.grab(region(8, 4, 16, 8)) for _ in range(3)]
+        assert grabs[0].shape == (8, 16, 4)
+        assert grabs[0][0, 0, 2] > 200 and grabs[1][0, 0, 1] > 200
+        assert np.array_equal(grabs[2], grabs[0])  # looped back to the first frame
+
+
+def test_replay_without_loop_ends(tmp_path):
+    path = tmp_path / 'replay.avi'
+    write_video(path, [(0, 0, 250)])
+    backend = ReplayBackend(str(path), loop=False)
+    backend.grab(region(0, 0, 64, 48))
+    with pytest.raises(EOFError):
+        backend.grab(region(0, 0, 64, 48))
+    with pytest.raises(IOError):
+        ReplayBackend(str(tmp_path / 'missing.avi'))
+
+
+def failing_backend(**options):
+    raise OSError("no display")
+
+
+def test_create_by_name_and_unknown_name():
+    backend = create_capture_backend('synthetic', {'width': 64, 'height': 32})
+    assert isinstance(backend, SyntheticBackend) and backend.width == 64
+    with pytest.raises(ValueError):
+        create_capture_backend('gdi')
+
+
+def test_fallback_chain_and_options(monkeypatch, capsys):
+    created = []
+
+    def recording_backend(**options):
+        created.append(options)
+        return SyntheticBackend()
+
+    monkeypatch.setitem(capture_backends.BACKENDS, 'fast', failing_backend)
+    monkeypatch.setitem(capture_backends.BACKENDS, 'faster', failing_backend)
+    monkeypatch.setitem(capture_backends.BACKENDS, 'plain', recording_backend)
+    monkeypatch.setitem(capture_backends.FALLBACKS, 'faster', ('fast', True))
+    monkeypatch.setitem(capture_backends.FALLBACKS, 'fast', ('plain', False))
+    monkeypatch.setattr(capture_backends, '_reported_fallbacks', set())
+
+    assert isinstance(create_capture_backend('faster', {'window': 1}), SyntheticBackend)
+    assert created == [{}]  # 'fast' keeps the options, 'plain' does not take them
+    out = capsys.readouterr().out
+    assert "'faster' unavailable (no display), using 'fast'" in out and "using 'plain'" in out
+
+    create_capture_backend('fast')
+    assert capsys.readouterr().out == ''  # reported once per backend
+
+
+def test_backends_without_fallback_raise(monkeypatch):
+    monkeypatch.setitem(capture_backends.BACKENDS, 'xwindow', failing_backend)
+    with pytest.raises(OSError):
+        create_capture_backend('xwindow')
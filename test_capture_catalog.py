@@ -0,0 +1,61 @@
+# test_capture_catalog.py
+# Tests for the capture catalog: batched inserts and metadata queries
+# Dependencies: pytest
+
+import os
+
+from capture_catalog import CaptureCatalog, hash_bytes, monitor_for_region, parse_time, query
+
+
+def test_record_flush_and_query(tmp_path):
+    db_path = str(tmp_path / 'capture_catalog.db')
+    catalog = CaptureCatalog(flush_interval=0.05)
+    for i in range(10):
+        catalog.record(db_path, {
+            'path': str(tmp_path / f'screenshot_{i}.png'), 'kind': 'screenshot' if i % 2 else 'region',
+            'created': 1700000000 + i, 'monitor': 1 + i % 2, 'format': 'png', 'bytes': 3,
+            'fps': None, 'backend': 'mss',
+        }, data=b'abc')
+    assert catalog.flush(timeout=10)
+    assert catalog.get_stats()['rows_written'] == 10
+
+    rows = query(db_path)
+    assert [row['created'] for row in rows] == [1700000000 + i for i in range(10)]
+    assert rows[0]['hash'] == hash_bytes(b'abc')
+    assert rows[0]['extra'] == {'backend': 'mss'}
+
+    rows = query(db_path, start=1700000002, end=1700000006, monitor=2)
+    assert [row['created'] for row in rows] == [1700000003, 1700000005]
+    assert len(query(db_path, kind='region', limit=2)) == 2
+
+
+def test_remove_and_replace(tmp_path):
+    db_path = str(tmp_path / 'capture_catalog.db')
+    catalog = CaptureCatalog(flush_interval=0.05)
+    path = str(tmp_path / 'record_1.mp4')
+    catalog.record(db_path, {'path': path, 'kind': 'recording', 'created': 1700000000}, data=b'')
+    catalog.record(db_path, {'path': path, 'kind': 'recording', 'created': 1700000000, 'duration_s': 4.5},
+                   data=b'')
+    assert catalog.flush(timeout=10)
+    assert [row['duration_s'] for row in query(db_path)] == [4.5]
+
+    catalog.remove(db_path, path)
+    assert catalog.flush(timeout=10)
+    assert query(db_path) == []
+
+
+def test_query_of_missing_catalog(tmp_path):
+    assert query(str(tmp_path / 'missing.db')) == []
+    assert not os.path.exists(tmp_path / 'missing.db')
+
+
+def test_parse_time_and_monitor_lookup():
+    assert parse_time(12.5) == 12.5
+    assert parse_time('1700000000') == 1700000000.0
+    reference = parse_time('2026-10-19 14:00')
+    assert parse_time('14:30', reference) - reference == 1800
+    monitors = [{'left': 0, 'top': 0, 'width': 3840, 'height': 1080},
+                {'left': 0, 'top': 0, 'width': 1920, 'height': 1080},
+                {'left': 1920, 'top': 0, 'width': 1920, 'height': 1080}]
+    assert monitor_for_region(monitors, {'left': 2000, 'top': 10, 'width': 100, 'height': 100}) == 2
+    assert monitor_for_region(monitors, {'left': -500, 'top': 10, 'width': 100, 'height': 100}) == 0
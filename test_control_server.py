@@ -0,0 +1,165 @@
+# test_control_server.py
+# Tests for the control API: dispatch, error replies, socket round trips and TCP token auth
+# Dependencies: pytest
+
+import os
+import socket
+import time
+
+import pytest
+
+from control_client import ControlClient, ControlError
+from control_server import ControlServer, encode_message, decode_message, read_token
+from disk_writer import DISK_WRITER
+
+
+class FakeScreenshotEngine:
+    is_capturing = False
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def manual_capture(self, clipboard=False, timing=None):
+        timing['grab_time'] = time.perf_counter()
+        path = os.path.join(self.folder, 'shot.png')
+        DISK_WRITER.write_file(path, b'png')
+        return path
+
+
+class FakeRecorder:
+    def __init__(self, folder='folder', recording=False, starts=True):
+        self.is_recording = recording
+        self.folder = folder
+        self.starts = starts
+        self.start_calls = 0
+
+    def get_setting(self, key):
+        return {'folder_path': self.folder}[key]
+
+    def start_recording(self):
+        self.start_calls += 1
+        return self.starts
+
+
+def test_ping_and_unknown_command():
+    server = ControlServer()
+    response = server.dispatch({'id': 1, 'cmd': 'ping'})
+    assert response['id'] == 1 and response['ok'] is True and response['result'] == 'pong'
+    assert response['latency_ms'] >= 0 and 'pixels_ms' not in response
+    response = server.dispatch({'id': 2, 'cmd': 'nope'})
+    assert response == {'id': 2, 'ok': False, 'error': "Unknown command: nope"}
+
+
+def test_handler_errors_become_error_replies():
+    server = ControlServer()
+    server.register_command('boom', lambda args: 1 / 0)
+    server.register_command('echo', lambda args: args)
+    response = server.dispatch({'id': 3, 'cmd': 'boom'})
+    assert response['ok'] is False and 'division by zero' in response['error']
+    assert server.dispatch({'cmd': 'echo', 'args': {'a': 1}})['result'] == {'a': 1}
+    response = server.dispatch({'cmd': 'capture'})
+    assert response['ok'] is False and response['error'] == "Screenshot engine not available"
+    stats = server._cmd_stats({})['commands']
+    assert stats['boom']['errors'] == 1 and stats['echo']['errors'] == 0
+    assert stats['capture']['count'] == 1
+
+
+def test_capture_reports_pixels_time_and_waits_for_the_file(tmp_path):
+    server = ControlServer(screenshot_engine=FakeScreenshotEngine(str(tmp_path)))
+    response = server.dispatch({'id': 1, 'cmd': 'capture'})
+    assert response['ok'] is True
+    assert open(response['result'], 'rb').read() == b'png'
+    assert 0 <= response['pixels_ms'] <= response['latency_ms']
+
+
+def test_wait_written_reports_failed_writes(tmp_path):
+    server = ControlServer()
+    path = str(tmp_path / 'missing' / 'shot.png')
+    DISK_WRITER.write_file(path, b'png')
+    with pytest.raises(RuntimeError, match='Failed to write'):
+        server._wait_written({}, [path])
+    server._wait_written({'wait': False}, [path])  # opted out: no check
+
+
+def test_record_start_checks_preconditions(monkeypatch):
+    monkeypatch.setattr(DISK_WRITER, 'space_low', lambda folder: folder == 'full')
+    cases = [
+        (FakeRecorder(recording=True), "Already recording"),
+        (FakeRecorder(folder=''), "No save folder selected"),
+        (FakeRecorder(folder='full'), "Not enough free disk space in the save folder"),
+        (FakeRecorder(starts=False), "Recording not started"),
+    ]
+    for recorder, error in cases:
+        response = ControlServer(recording_controller=recorder).dispatch({'cmd': 'record_start'})
+        assert response['ok'] is False and response['error'] == error
+    recorder = FakeRecorder()
+    assert ControlServer(recording_controller=recorder).dispatch({'cmd': 'record_start'})['result'] is True
+    assert recorder.start_calls == 1
+
+
+def test_unix_socket_round_trip(tmp_path):
+    address = str(tmp_path / 'ctl.sock')
+    server = ControlServer(address=address)
+    assert server.start()
+    try:
+        assert os.stat(address).st_mode & 0o777 == 0o600
+        with ControlClient(address, timeout=5) as client:
+            assert client.ping() == 'pong'
+            assert client.request('ping')['id'] == 2  # same connection, ids in order
+            with pytest.raises(ControlError, match='Unknown command'):
+                client.call('nope')
+    finally:
+        server.stop()
+    assert not os.path.exists(address)
+
+
+def test_bad_requests_get_error_replies(tmp_path):
+    address = str(tmp_path / 'ctl.sock')
+    server = ControlServer(address=address)
+    assert server.start()
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(address)
+        reader = sock.makefile('rb')
+        sock.sendall(b'not json\n[1, 2]\n' + encode_message({'id': 7, 'cmd': 'ping'}))
+        first, second, third = (decode_message(reader.readline()) for _ in range(3))
+        assert first['ok'] is False and first['error'].startswith('Bad request')
+        assert second['ok'] is False and 'not a JSON object' in second['error']
+        assert third['id'] == 7 and third['result'] == 'pong'
+        reader.close()
+        sock.close()
+    finally:
+        server.stop()
+
+
+def test_stale_socket_file_is_replaced_but_live_one_is_not(tmp_path):
+    address = str(tmp_path / 'ctl.sock')
+    open(address, 'w').close()
+    first = ControlServer(address=address)
+    assert first.start()
+    try:
+        assert ControlServer(address=address).start() is False
+    finally:
+        first.stop()
+
+
+def test_tcp_requires_the_token(tmp_path):
+    token_path = str(tmp_path / 'ctl.token')
+    server = ControlServer(address=('127.0.0.1', 0), token_path=token_path)
+    assert server.start()
+    try:
+        address = server.server.server_address
+        assert os.stat(token_path).st_mode & 0o777 == 0o600
+        assert read_token(token_path) == server.token
+        with ControlClient(address, timeout=5, token_path=token_path) as client:
+            assert client.ping() == 'pong'
+        with ControlClient(address, timeout=5, token='wrong') as client:
+            with pytest.raises(ControlError, match='Unauthorized'):
+                client.ping()
+        with ControlClient(address, timeout=5, token_path=str(tmp_path / 'none')) as client:
+            with pytest.raises(ControlError, match='Unauthorized'):
+                client.ping()
+    finally:
+        server.stop()
+    assert not os.path.exists(token_path)
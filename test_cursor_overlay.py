@@ -0,0 +1,92 @@
+# test_cursor_overlay.py
+# Tests for the cursor overlay: premultiplied blending, clipping at the frame edges and sampling
+# Dependencies: pytest, numpy
+
+import numpy as np
+import pytest
+
+from cursor_overlay import CursorImage, CursorOverlay, SyntheticCursorSource, arrow_cursor, blend_cursor
+
+
+def solid_cursor(width=4, height=3, bgr=(10, 20, 30), alpha=255):
+    bgra = np.zeros((height, width, 4), dtype=np.uint8)
+    bgra[:, :] = (*bgr, alpha)
+    return CursorImage(bgra)
+
+
+def gray_frame(width=20, height=10, channels=3, value=200):
+    return np.full((height, width, channels), value, dtype=np.uint8)
+
+
+def touched(frame, value=200):
+    """(x0, y0, x1, y1) of the pixels that changed, or None"""
+    ys, xs = np.nonzero((frame[:, :, :3] != value).any(axis=2))
+    if not len(xs):
+        return None
+    return xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+
+def test_blend_inside_touches_only_the_box():
+    frame = gray_frame()
+    assert blend_cursor(frame, solid_cursor(), 5, 2) == (5, 2, 9, 5)
+    assert touched(frame) == (5, 2, 9, 5)
+    assert (frame[2:5, 5:9] == (10, 20, 30)).all()
+
+
+@pytest.mark.parametrize('x, y, box', [
+    (-2, 3, (0, 3, 2, 6)),     # left edge
+    (18, 3, (18, 3, 20, 6)),   # right edge
+    (5, -1, (5, 0, 9, 2)),     # top edge
+    (5, 8, (5, 8, 9, 10)),     # bottom edge
+    (-3, -2, (0, 0, 1, 1)),    # corner
+])
+def test_blend_clips_at_the_edges(x, y, box):
+    frame = gray_frame()
+    assert blend_cursor(frame, solid_cursor(), x, y) == box
+    assert touched(frame) == box
+
+
+@pytest.mark.parametrize('x, y', [(-4, 0), (20, 0), (0, -3), (0, 10), (100, 100)])
+def test_blend_off_frame_does_nothing(x, y):
+    frame = gray_frame()
+    assert blend_cursor(frame, solid_cursor(), x, y) is None
+    assert touched(frame) is None
+
+
+def test_blend_uses_premultiplied_alpha():
+    frame = gray_frame()
+    # Half-transparent: premultiplied colour 100 plus 200 * (255 - 128) / 255
+    blend_cursor(frame, solid_cursor(bgr=(100, 0, 50), alpha=128), 0, 0)
+    assert tuple(frame[0, 0]) == (200, 100, 150)
+    blend_cursor(frame, solid_cursor(bgr=(0, 0, 0), alpha=0), 10, 0)  # fully transparent
+    assert touched(frame) == (0, 0, 4, 3)
+
+
+def test_blend_keeps_the_alpha_channel_of_bgra_frames():
+    frame = gray_frame(channels=4, value=255)
+    blend_cursor(frame, solid_cursor(), 0, 0)
+    assert (frame[0, 0] == (10, 20, 30, 255)).all()
+
+
+def test_arrow_cursor_is_outlined():
+    cursor = arrow_cursor(20)
+    assert (cursor.height, cursor.width) == (20, 13)
+    opaque = cursor.inverse_alpha[:, :, 0] == 0
+    assert opaque[0, 0] and not opaque[0, 12]
+    colours = {tuple(c) for c in cursor.color[opaque]}
+    assert colours == {(0, 0, 0), (255, 255, 255)}
+
+
+def test_overlay_samples_relative_to_the_origin_and_scales():
+    source = SyntheticCursorSource(100, 100, step=10)
+    overlay = CursorOverlay(source)
+    image, x, y = overlay.sample((20, 5))
+    assert (x, y) == (30 - 20, 20 - 5)
+    assert CursorOverlay.key((image, x, y)) == (id(image), 10, 15)
+
+    frame = gray_frame(50, 50, value=100)
+    overlay.draw(frame, (solid_cursor(), 10, 15), scale=0.5)
+    assert touched(frame, 100) == (5, 7, 9, 10)
+    overlay.draw(frame, (solid_cursor(), 500, 500), scale=0.5)
+    assert overlay.stats['frames'] == 2 and overlay.stats['drawn'] == 1
+    overlay.close()
@@ -0,0 +1,133 @@
+# test_disk_writer.py
+# Tests for the write-behind disk writer: streamed files, whole-file writes and the free-space watchdog
+# Dependencies: pytest
+
+import wave
+
+import pytest
+
+from disk_writer import ALIGNMENT, DiskWriter
+
+
+def small_writer(buffer_kb=4):
+    writer = DiskWriter()
+    writer.configure(fsync='never', buffer_kb=buffer_kb)
+    return writer
+
+
+def test_streamed_file_writes_all_data(tmp_path):
+    writer = small_writer()
+    path = tmp_path / 'out.bin'
+    data = bytes(range(256)) * 100  # spans several aligned blocks plus a remainder
+    with writer.open(str(path)) as f:
+        for i in range(0, len(data), 1000):
+            f.write(data[i:i + 1000])
+        assert f.tell() == len(data)
+    assert path.read_bytes() == data
+    assert writer.get_stats()['files_written'] == 1
+
+
+def test_write_hands_over_whole_aligned_blocks():
+    writer = small_writer()
+    submitted = []
+    writer._submit = submitted.append
+    f = writer.open('unused')
+    f.write(b'x' * (writer.buffer_size + 100))
+    assert len(submitted) == 1 and len(submitted[0][2]) % ALIGNMENT == 0
+    assert len(f.buffer) == writer.buffer_size + 100 - len(submitted[0][2])
+
+
+def test_seek_rewrites_earlier_bytes(tmp_path):
+    writer = small_writer()
+    path = tmp_path / 'seek.bin'
+    f = writer.open(str(path))
+    f.write(b'0000abcd')
+    assert f.seek(0) == 0 and f.tell() == 0
+    f.write(b'12')
+    assert f.tell() == 2
+    f.seek(8)
+    f.write(b'ef')
+    f.close()
+    assert path.read_bytes() == b'1200abcdef'
+
+
+def test_seek_only_supports_absolute_offsets():
+    f = small_writer().open('unused')
+    with pytest.raises(ValueError):
+        f.seek(0, 2)
+
+
+def test_write_after_close_fails(tmp_path):
+    f = small_writer().open(str(tmp_path / 'closed.bin'))
+    f.close()
+    f.close()  # closing twice is harmless
+    with pytest.raises(ValueError):
+        f.write(b'x')
+
+
+def test_wave_header_is_patched_through_seek(tmp_path):
+    writer = small_writer()
+    path = tmp_path / 'audio.wav'
+    frames = b'\x01\x00' * 8000
+    f = writer.open(str(path))
+    with wave.open(f, 'wb') as wav:  # wave leaves a passed-in file open
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(frames)
+    f.close()
+    with wave.open(str(path), 'rb') as wav:
+        assert wav.getnframes() == 8000
+        assert wav.readframes(8000) == frames
+
+
+def test_open_failure_is_reported_on_close(tmp_path):
+    f = small_writer().open(str(tmp_path / 'missing' / 'out.bin'))
+    f.write(b'data')
+    with pytest.raises(OSError):
+        f.close()
+
+
+def test_write_file_runs_callback_and_wait_written(tmp_path):
+    writer = small_writer()
+    done = []
+    good = str(tmp_path / 'a.png')
+    bad = str(tmp_path / 'missing' / 'b.png')
+    writer.write_file(good, b'abc', lambda path, error: done.append((path, error)))
+    writer.write_file(bad, b'abc', lambda path, error: done.append((path, error)))
+    assert writer.wait_written([good, bad], timeout=5)
+    assert not writer.pending_files
+    assert (tmp_path / 'a.png').read_bytes() == b'abc'
+    results = dict(done)
+    assert results[good] is None and isinstance(results[bad], OSError)
+    assert writer.get_stats()['errors'] == 1
+
+
+def test_wait_written_times_out_while_queued():
+    writer = small_writer()
+    writer._ensure_thread = lambda: None  # nothing drains the queue
+    writer.write_file('queued.png', b'abc')
+    assert writer.wait_written(['queued.png'], timeout=0.05) is False
+    assert writer.wait_written(['other.png'], timeout=0.05) is True
+
+
+def test_space_low_subtracts_pending_bytes(monkeypatch):
+    writer = small_writer()
+    writer.reserve_bytes = 1000
+    monkeypatch.setattr(writer, 'free_bytes', lambda folder: 1500)
+    assert writer.space_low('folder') is False
+    writer.pending_bytes = 600
+    assert writer.space_low('folder') is True
+
+
+def test_space_low_is_false_when_free_space_is_unknown(tmp_path):
+    writer = small_writer()
+    writer.reserve_bytes = 10 ** 30
+    assert writer.space_low(None) is False
+    assert writer.space_low(str(tmp_path / 'missing')) is False
+    assert writer.space_low(str(tmp_path)) is True
+
+
+def test_configure_rejects_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        DiskWriter().configure(fsync='sometimes')
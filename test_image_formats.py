@@ -0,0 +1,124 @@
+# test_image_formats.py
+# Tests for exact palette (indexed PNG) conversion and the 'auto' format decision for screenshots
+# Dependencies: pytest, pillow, numpy
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from image_formats import choose_format, encode_capture, encode_image, palette_image
+
+
+def ui_like_image(width=640, height=400, colours=200):
+    """RGB frame with exactly colours colours in flat blocks"""
+    rng = np.random.default_rng(7)
+    palette = rng.integers(0, 256, size=(colours, 3), dtype=np.uint8)
+    blocks = np.arange(width * height // 16) % colours
+    rng.shuffle(blocks)
+    pixels = palette[np.repeat(blocks, 16)].reshape(height, width, 3)
+    return Image.fromarray(pixels, 'RGB')
+
+
+def photo_pixels(width=1280, height=720):
+    """Smooth true-colour content: upscaled noise, no flat areas"""
+    rng = np.random.default_rng(3)
+    small = Image.fromarray(rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8), 'RGB')
+    return np.asarray(small.resize((width, height), Image.BICUBIC)).copy()
+
+
+def text_pixels(width=1280, height=720):
+    """Dark glyph blocks on a light background"""
+    pixels = np.full((height, width, 3), 250, dtype=np.uint8)
+    for top in range(0, height, 24):
+        for x in range(0, width, 16):
+            pixels[top + 4:top + 16, x + 2:x + 10] = 20
+    return pixels
+
+
+def mixed_image(right):
+    """Photo on the left two thirds, right on the rest"""
+    pixels = photo_pixels()
+    pixels[:, 832:] = right[:, 832:]
+    return Image.fromarray(pixels, 'RGB')
+
+
+def test_palette_image_is_pixel_identical():
+    image = ui_like_image()
+    indexed = palette_image(image)
+    assert indexed is not None and indexed.mode == 'P'
+    assert np.array_equal(np.asarray(indexed.convert('RGB')), np.asarray(image))
+
+
+def test_palette_image_survives_png_round_trip():
+    image = ui_like_image(colours=256)
+    buffer = io.BytesIO()
+    palette_image(image).save(buffer, 'PNG')
+    buffer.seek(0)
+    assert np.array_equal(np.asarray(Image.open(buffer).convert('RGB')), np.asarray(image))
+
+
+def test_palette_image_rejects_too_many_colours():
+    assert palette_image(ui_like_image(colours=257)) is None
+    noise = np.random.default_rng(1).integers(0, 256, size=(1080, 1920, 3), dtype=np.uint8)
+    assert palette_image(Image.fromarray(noise, 'RGB')) is None
+
+
+def test_palette_image_only_takes_rgb():
+    assert palette_image(ui_like_image().convert('RGBA')) is None
+
+
+def test_encode_image_png_palette_exact_writes_indexed_png():
+    image = ui_like_image()
+    data = encode_image(image, 'png', {'png_palette': 'exact'})
+    with Image.open(io.BytesIO(bytes(data))) as decoded:
+        assert decoded.mode == 'P'
+        assert np.array_equal(np.asarray(decoded.convert('RGB')), np.asarray(image))
+    with Image.open(io.BytesIO(bytes(encode_image(image, 'png', {'png_palette': 'off'})))) as decoded:
+        assert decoded.mode == 'RGB'
+
+
+def test_encode_image_png_palette_exact_keeps_true_colour_frames():
+    noise = Image.fromarray(np.random.default_rng(2).integers(0, 256, size=(120, 160, 3), dtype=np.uint8), 'RGB')
+    with Image.open(io.BytesIO(bytes(encode_image(noise, 'png', {'png_palette': 'exact'})))) as decoded:
+        assert decoded.mode == 'RGB'
+
+
+def test_choose_format_keeps_ui_frames_lossless():
+    ui = np.full((720, 1280, 3), 240, dtype=np.uint8)
+    ui[100:300, 100:700] = (30, 60, 200)
+    ui[400:700, 700:1200] = photo_pixels()[400:700, 700:1200]  # a picture inside a window
+    for image in (Image.fromarray(text_pixels(), 'RGB'), Image.fromarray(ui, 'RGB')):
+        capture_format, options, decision = choose_format(image)
+        assert (capture_format, decision['content'], decision['quality']) == ('png', 'ui', 'lossless')
+        assert options['png_optimize'] is False and options['png_compress_level'] == 6
+
+
+def test_choose_format_sends_photos_to_the_lossy_format():
+    capture_format, options, decision = choose_format(Image.fromarray(photo_pixels(), 'RGB'))
+    assert (capture_format, decision['content'], decision['quality']) == ('jpg', 'photo', 90)
+    assert options['capture_quality'] == 90 and decision['format'] == 'jpg'
+    capture_format, options, _ = choose_format(Image.fromarray(photo_pixels(), 'RGB'),
+                                               {'auto_lossy_format': 'WEBP', 'auto_fidelity': 80})
+    assert capture_format == 'webp' and options['webp_quality'] == 80 and not options['webp_lossless']
+
+
+def test_choose_format_needs_more_photo_when_text_is_present():
+    # Same photo share either way; only the text raises the bar above it
+    assert choose_format(mixed_image(np.full((720, 1280, 3), 250, dtype=np.uint8)))[2]['content'] == 'photo'
+    assert choose_format(mixed_image(text_pixels()))[2]['content'] == 'ui'
+
+
+def test_choose_format_full_fidelity_is_lossless():
+    capture_format, _, decision = choose_format(Image.fromarray(photo_pixels(), 'RGB'), {'auto_fidelity': 100})
+    assert capture_format == 'png' and decision['content'] == 'photo' and decision['quality'] == 'lossless'
+
+
+def test_encode_capture_resolves_auto():
+    image = Image.fromarray(photo_pixels(320, 192), 'RGB')
+    data, capture_format, decision = encode_capture(image, 'auto')
+    assert capture_format == 'jpg' and decision['format'] == 'jpg'
+    with Image.open(io.BytesIO(bytes(data))) as decoded:
+        assert decoded.format == 'JPEG' and decoded.size == (320, 192)
+    data, capture_format, decision = encode_capture(image, 'png')
+    assert capture_format == 'png' and decision is None
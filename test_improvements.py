@@ -109,6 +109,7 @@ def performance_tips():
     print("  • Video Quality: CRF 18-23 for high quality (lower = better)")
     print("  • Audio: Use 44100 Hz, Stereo for best quality")
     print("  • For large recordings: Ensure sufficient disk space")
+    print("  • Measure changes: python benchmark_suite.py --baseline baseline.json")
 
 def main():
     """Run all tests"""
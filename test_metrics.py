@@ -0,0 +1,63 @@
+# test_metrics.py
+# Tests for the metrics registry: HDR histogram percentiles and OpenMetrics text
+# Dependencies: pytest
+
+from metrics import REGISTRY, Histogram, MetricsRegistry
+
+
+def enabled_registry():
+    registry = MetricsRegistry()
+    registry.enabled = True
+    return registry
+
+
+def test_disabled_metrics_record_nothing():
+    registry = MetricsRegistry()
+    counter = registry.counter('test_disabled', 'x')
+    histogram = registry.histogram('test_disabled_seconds', 'x')
+    counter.inc()
+    histogram.observe(0.01)
+    assert counter.value == 0 and histogram.count == 0
+
+
+def test_histogram_buckets_are_within_precision():
+    histogram = enabled_registry().histogram('test_seconds')
+    for micros in (0, 1, 15, 16, 17, 1000, 123456, 10 ** 9):
+        lower, upper = histogram._bucket_bounds(histogram._index(micros))
+        assert lower <= micros < upper
+        assert upper - lower <= max(1, lower / Histogram.SUB_COUNT)
+
+
+def test_histogram_percentiles():
+    histogram = enabled_registry().histogram('test_seconds')
+    for i in range(1, 1001):
+        histogram.observe(i / 1000)  # 1 ms .. 1 s
+    assert histogram.count == 1000
+    assert abs(histogram.percentile(0.5) - 0.5) <= 0.5 * 0.07
+    assert abs(histogram.percentile(0.99) - 0.99) <= 0.99 * 0.07
+    assert histogram.percentile(0.999) <= histogram.max == 1.0
+
+
+def test_openmetrics_text():
+    registry = enabled_registry()
+    registry.counter('test_frames', 'Frames written').inc(3)
+    histogram = registry.histogram('test_grab_seconds', 'Grab latency', labels={'backend': 'mss'})
+    for seconds in (0.0002, 0.003, 0.003, 20.0):
+        histogram.observe(seconds)
+    text = registry.openmetrics()
+    lines = text.splitlines()
+
+    assert text.endswith('# EOF\n')
+    assert lines.count('# EOF') == 1
+    assert '# TYPE test_frames counter' in lines
+    assert 'test_frames_total 3' in lines
+    assert 'test_grab_seconds_bucket{backend="mss",le="0.0005"} 1' in lines
+    assert 'test_grab_seconds_bucket{backend="mss",le="0.005"} 3' in lines
+    assert 'test_grab_seconds_bucket{backend="mss",le="10.0"} 3' in lines
+    assert 'test_grab_seconds_bucket{backend="mss",le="+Inf"} 4' in lines
+    assert 'test_grab_seconds_count{backend="mss"} 4' in lines
+
+
+def test_process_registry_renders():
+    text = REGISTRY.openmetrics()
+    assert text.endswith('# EOF\n')
@@ -0,0 +1,42 @@
+# test_output_layout.py
+# Tests for collision-free output names and the capture time read back from them
+# Dependencies: pytest
+
+import os
+from datetime import datetime
+
+from output_layout import OUTPUT_LAYOUT, OutputLayout, parse_output_time, process_tag
+
+
+def test_parse_output_time_round_trips(tmp_path):
+    when = datetime(2026, 10, 19, 14, 25, 1, 237000)
+    path = OUTPUT_LAYOUT.path(str(tmp_path), 'screenshot', 'png', when=when)
+    assert parse_output_time(path) == when.timestamp()
+
+
+def test_parse_output_time_round_trips_in_shards(tmp_path):
+    when = datetime(2026, 10, 19, 9, 5, 59, 4000)
+    path = OUTPUT_LAYOUT.path(str(tmp_path), 'region', 'jpg', shard='hour', when=when)
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), '2026-10-19', '09')
+    assert parse_output_time(path) == when.timestamp()
+
+
+def test_names_are_unique_within_a_millisecond(tmp_path):
+    when = datetime(2026, 10, 19, 14, 25, 1)
+    layout = OutputLayout()
+    paths = {layout.path(str(tmp_path), 'screenshot', 'png', when=when) for _ in range(1000)}
+    assert len(paths) == 1000
+
+
+def test_process_tag_separates_processes():
+    assert process_tag(0) == '0'
+    assert process_tag(35) == 'z'
+    assert process_tag(36) == '10'
+    assert process_tag(1234) != process_tag(1235)
+
+
+def test_parse_output_time_falls_back_to_mtime(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('x')
+    os.utime(path, (1700000000, 1700000000))
+    assert parse_output_time(str(path)) == 1700000000
@@ -0,0 +1,80 @@
+# test_recording_engine.py
+# Tests for per-monitor recording: monitor selection, scaled sizes and one video per monitor
+# Dependencies: pytest, numpy, opencv-python, sounddevice
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip('sounddevice')
+
+import cv2
+import numpy as np
+
+from recording_engine import RecordingEngine, select_monitors
+
+MONITORS = [{'left': 0, 'top': 0, 'width': 300, 'height': 100},
+            {'left': 0, 'top': 0, 'width': 100, 'height': 100},
+            {'left': 100, 'top': 0, 'width': 200, 'height': 80}]
+
+
+def test_select_monitors():
+    assert select_monitors(MONITORS) == [(1, MONITORS[1]), (2, MONITORS[2])]
+    assert select_monitors(MONITORS, ' ') == [(1, MONITORS[1]), (2, MONITORS[2])]
+    assert select_monitors(MONITORS, '2') == [(2, MONITORS[2])]
+    assert select_monitors(MONITORS, '2, x, 7, 1') == [(1, MONITORS[1]), (2, MONITORS[2])]
+    assert select_monitors(MONITORS, '0,9') == []
+
+
+def test_scaled_size_is_even():
+    frame = np.zeros((101, 75, 3), dtype=np.uint8)
+    assert RecordingEngine._scaled_size(frame, 1.0) == (74, 100)
+    assert RecordingEngine._scaled_size(frame, 0.5) == (36, 50)
+    assert RecordingEngine._scaled_size(frame, 0.01) == (2, 2)
+
+
+def record(tmp_path, seconds=1.0, **settings):
+    engine = RecordingEngine()
+    engine.update_settings({
+        'folder_path': str(tmp_path), 'record_audio_enabled': False, 'record_format': 'avi',
+        'record_encoder': 'opencv', 'record_fps': 10, 'catalog_enabled': False,
+        'capture_backend': 'synthetic',
+        'capture_backend_options': {'monitors': [(64, 48), (32, 40)], 'pattern': 'static'},
+        'record_monitor_mode': 'per_monitor', **settings})
+    assert engine.start_recording()
+    time.sleep(seconds)
+    engine.stop_recording()
+    engine.record_thread.join(timeout=10)
+    return engine
+
+
+def video_info(path):
+    capture = cv2.VideoCapture(path)
+    info = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            int(capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+    capture.release()
+    return info
+
+
+def test_per_monitor_recording_writes_one_synchronised_video_per_monitor(tmp_path):
+    engine = record(tmp_path)
+    videos = sorted(name for name in os.listdir(tmp_path) if name.endswith('.avi'))
+    assert [name.rsplit('_', 1)[1] for name in videos] == ['mon1.avi', 'mon2.avi']
+    first, second = (video_info(str(tmp_path / name)) for name in videos)
+    assert first[:2] == (64, 48) and second[:2] == (32, 40)
+    assert first[2] == second[2] > 0  # same ticks on every stream
+    streams = engine.stats['streams']
+    assert [s['stream'] for s in streams] == ['mon1', 'mon2'] and [s['monitor'] for s in streams] == [1, 2]
+
+
+def test_per_monitor_recording_of_selected_monitors(tmp_path):
+    record(tmp_path, 0.5, record_monitors='2')
+    videos = [name for name in os.listdir(tmp_path) if name.endswith('.avi')]
+    assert len(videos) == 1 and videos[0].endswith('_mon2.avi')
+
+
+def test_no_matching_monitor_stops_with_an_error(tmp_path):
+    engine = record(tmp_path, 0.2, record_monitors='5')
+    assert not engine.is_recording
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.avi')]
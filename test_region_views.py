@@ -0,0 +1,74 @@
+# test_region_views.py
+# Tests for named views: spec parsing, clipping and names, and slicing one grab into views
+# Dependencies: pytest, numpy
+
+import numpy as np
+import pytest
+
+from capture_backends import SyntheticBackend
+from region_views import grab_views, parse_view_spec, resolve_views, union_region, view_of
+
+# Two monitors side by side, the second offset down and shorter
+MONITORS = [{'left': 0, 'top': 0, 'width': 300, 'height': 100},
+            {'left': 0, 'top': 0, 'width': 100, 'height': 100},
+            {'left': 100, 'top': 20, 'width': 200, 'height': 80}]
+
+
+def region(left, top, width, height):
+    return {'left': left, 'top': top, 'width': width, 'height': height}
+
+
+def test_parse_view_spec():
+    assert parse_view_spec('term=0, 60,96,40') == {'name': 'term', 'x': 0, 'y': 60, 'width': 96, 'height': 40}
+    assert parse_view_spec(' full =monitor:2') == {'name': 'full', 'monitor': 2}
+    for bad in ('term', 'term=1,2,3', 'term=a,b,c,d'):
+        with pytest.raises(ValueError):
+            parse_view_spec(bad)
+
+
+def test_resolve_views_regions_and_monitors():
+    views = resolve_views(['a=10,10,50,20', {'name': 'b', 'monitor': 2},
+                           {'name': 'c', 'left': 5, 'top': 6, 'width': 7, 'height': 8}], MONITORS)
+    assert views == [('a', region(10, 10, 50, 20)), ('b', region(100, 20, 200, 80)), ('c', region(5, 6, 7, 8))]
+    assert resolve_views(None, MONITORS) == []
+
+
+def test_resolve_views_clips_to_the_desktop():
+    assert resolve_views(['a=-20,-10,50,40'], MONITORS) == [('a', region(0, 0, 30, 30))]
+    assert resolve_views(['a=280,90,100,100'], MONITORS) == [('a', region(280, 90, 20, 10))]
+    for outside in ('a=300,0,10,10', 'a=-10,0,11,10', 'a=0,99,10,10'):
+        with pytest.raises(ValueError, match='outside the screen'):
+            resolve_views([outside], MONITORS)
+    with pytest.raises(ValueError, match='no monitor 3'):
+        resolve_views(['a=monitor:3'], MONITORS)
+
+
+def test_resolve_views_makes_names_safe_and_unique():
+    views = resolve_views(['my view!=0,0,10,10', 'my/view=0,0,10,10', '../..=0,0,10,10',
+                           {'x': 0, 'y': 0, 'width': 10, 'height': 10}, 'view4=0,0,10,10'], MONITORS)
+    assert [name for name, _ in views] == ['my_view', 'my_view_', 'view3', 'view4', 'view4_']
+
+
+def test_union_region():
+    assert union_region([region(10, 20, 30, 40)]) == region(10, 20, 30, 40)
+    assert union_region([region(10, 20, 30, 40), region(100, 0, 10, 10)]) == region(10, 0, 100, 60)
+
+
+def test_view_of_shares_the_frame_memory():
+    union = region(10, 20, 30, 40)
+    frame = np.arange(40 * 30 * 4, dtype=np.uint32).reshape(40, 30, 4).astype(np.uint8)
+    view = view_of(frame, union, region(15, 25, 5, 6))
+    assert view.shape == (6, 5, 4) and np.shares_memory(view, frame)
+    assert np.array_equal(view, frame[5:11, 5:10])
+
+
+def test_grab_views_grabs_the_union_once():
+    backend = SyntheticBackend(monitors=[(100, 100), (200, 80)], pattern='noise')
+    views = resolve_views(['left=10,10,20,20', 'right=150,50,40,30'], backend.monitors)
+    frame, union, cut = grab_views(backend, views)
+    assert backend.frame_index == 1
+    assert union == region(10, 10, 180, 70) and frame.shape == (70, 180, 4)
+    assert [(name, view.shape) for name, _, view in cut] == [('left', (20, 20, 4)), ('right', (30, 40, 4))]
+    # Same pixels as grabbing each view on its own from the same frame of the sequence
+    fresh = SyntheticBackend(monitors=[(100, 100), (200, 80)], pattern='noise')
+    assert np.array_equal(cut[1][2], fresh.grab(region(150, 50, 40, 30)))
@@ -0,0 +1,129 @@
+# test_retention.py
+# Tests for the retention quotas: the oldest files of a kind go first
+# Dependencies: pytest
+
+import os
+
+from retention import RetentionManager, classify, output_stem
+
+
+def make_files(folder, names, size=1024, start=1700000000):
+    """Capture files with mtimes one minute apart, in the given order (oldest first)"""
+    paths = []
+    for offset, name in enumerate(names):
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * size)
+        os.utime(path, (start + offset * 60, start + offset * 60))
+        paths.append(path)
+    return paths
+
+
+def indexed_manager(folder, **quota):
+    manager = RetentionManager()
+    manager.configure('screenshots', **quota)
+    manager._ensure_thread = lambda: None  # scan and enforce on the test thread
+    manager.set_folder(folder)
+    manager._scan(manager.pending_scans.pop())
+    return manager
+
+
+def test_classify():
+    assert classify('screenshot_20261019_142501_237_0042_2n9c.png') == 'screenshots'
+    assert classify('region_20261019_142501_237_0043_2n9c.jpg') == 'screenshots'
+    assert classify('record_20261019_142501_237_0044_2n9c.mp4') == 'recordings'
+    assert classify('capture_catalog.db') is None
+
+
+def test_count_quota_evicts_oldest_first(tmp_path):
+    folder = str(tmp_path)
+    # Names sort the other way round from their mtimes, so only the mtime decides
+    paths = make_files(folder, [f'screenshot_{9 - i}.png' for i in range(5)])
+    keep = make_files(folder, ['capture_catalog.db', 'record_1.mp4'])
+    manager = indexed_manager(folder, max_count=2)
+    deleted = []
+    manager.add_listener(deleted.append)
+
+    assert manager.enforce() == 3
+    assert deleted == paths[:3]
+    assert [os.path.exists(p) for p in paths] == [False, False, False, True, True]
+    assert all(os.path.exists(p) for p in keep)
+    assert manager.enforce() == 0
+
+
+def test_size_quota_evicts_oldest_first(tmp_path):
+    folder = str(tmp_path)
+    paths = make_files(folder, [f'region_{i}.png' for i in range(4)], size=1024)
+    manager = indexed_manager(folder, max_mb=2 / 1024)  # 2 KB
+
+    assert manager.enforce() == 2
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+    assert manager.get_stats()['kinds']['screenshots']['bytes'] == 2048
+
+
+def test_age_quota(tmp_path):
+    folder = str(tmp_path)
+    paths = make_files(folder, [f'screenshot_{i}.png' for i in range(3)], start=1700000000)
+    manager = indexed_manager(folder, max_days=1)
+
+    assert manager.enforce(now=1700000000 + 86400 + 90) == 2
+    assert [os.path.exists(p) for p in paths] == [False, False, True]
+
+
+def test_rewritten_file_is_not_evicted_as_old(tmp_path):
+    folder = str(tmp_path)
+    first, second = make_files(folder, ['screenshot_a.png', 'screenshot_b.png'])
+    manager = indexed_manager(folder, max_count=1)
+    manager._index_file('screenshots', first, 1700001000, 1024)  # written again, now the newest
+
+    assert manager.enforce() == 1
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+
+
+def test_second_folder_is_scanned_once_and_shares_quotas(tmp_path):
+    shots, videos = str(tmp_path / 'shots'), str(tmp_path / 'videos')
+    os.makedirs(shots)
+    os.makedirs(videos)
+    old = make_files(shots, ['screenshot_old.png'], start=1700000000)
+    new = make_files(videos, ['screenshot_new.png', 'screenshot_newer.png'], start=1700000600)
+    manager = indexed_manager(shots, max_count=2)
+
+    manager.add(new[1], folder=videos)  # the other engine's folder does not reset this one's index
+    assert manager.pending_scans == [os.path.abspath(videos)]
+    assert len(manager.files['screenshots']) == 2
+    manager._scan(manager.pending_scans.pop())
+    manager.add(old[0], 1024, folder=shots)
+    assert manager.pending_scans == [] and manager.stats['scans'] == 2
+
+    assert manager.enforce() == 1
+    assert [os.path.exists(p) for p in old + new] == [True, False, True]
+
+
+def test_output_stem_groups_sidecars():
+    stem = 'record_20261019_142501_237_0042_2n9c'
+    for name in (f'{stem}.mp4', f'{stem}_part2.mp4', f'{stem}_m1.mp4', f'{stem}.wav', f'{stem}.session.json',
+                 f'{stem}.trace.json', f'{stem}_segments.txt'):
+        assert output_stem(name) == stem
+    assert output_stem('autovideo_20261019_142501.frames.jsonl') == 'autovideo_20261019_142501'
+    assert output_stem('screenshot_1.png') == 'screenshot_1'
+
+
+def test_recordings_are_counted_and_evicted_as_a_unit(tmp_path):
+    folder = str(tmp_path)
+    old_stem, new_stem = 'record_20261019_100000_000_0001_2n9c', 'record_20261019_110000_000_0002_2n9c'
+    old = make_files(folder, [f'{old_stem}.mp4', f'{old_stem}_part2.mp4', f'{old_stem}.wav',
+                              f'{old_stem}.session.json'], start=1700000000)
+    new = make_files(folder, [f'{new_stem}.mp4', f'{new_stem}.wav'], start=1700003600)
+    manager = RetentionManager()
+    manager._ensure_thread = lambda: None
+    manager.configure('recordings', max_count=1)
+    manager.set_folder(folder)
+    manager._scan(manager.pending_scans.pop())
+    kinds = manager.get_stats()['kinds']['recordings']
+    assert (kinds['outputs'], kinds['files']) == (2, 6)
+
+    assert manager.enforce() == 4
+    assert not any(os.path.exists(p) for p in old)
+    assert all(os.path.exists(p) for p in new)
+    assert manager.get_stats()['kinds']['recordings']['bytes'] == 2048
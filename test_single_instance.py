@@ -0,0 +1,60 @@
+# test_single_instance.py
+# Tests for the single-instance lock and forwarding commands to the running instance
+# Dependencies: pytest
+
+import os
+
+import run_app
+from control_server import ControlServer
+from single_instance import InstanceLock
+
+
+def test_second_lock_is_refused_until_released(tmp_path):
+    path = str(tmp_path / 'app.lock')
+    first, second = InstanceLock(path), InstanceLock(path)
+    assert first.acquire() and first.acquired
+    assert first.acquire()  # already held: no-op
+    assert second.acquire() is False and not second.acquired
+    assert second.owner_pid() == os.getpid()
+    first.release()
+    assert not first.acquired
+    assert second.acquire()
+    second.release()
+
+
+def test_lock_file_left_by_a_dead_owner_is_taken_over(tmp_path):
+    path = tmp_path / 'app.lock'
+    path.write_text('999999999')  # PID of a crashed owner; the OS lock died with it
+    with InstanceLock(str(path)) as lock:
+        assert lock.acquired
+        assert lock.owner_pid() == os.getpid()
+    assert InstanceLock(str(tmp_path / 'none.lock')).owner_pid() is None
+
+
+def test_second_invocation_forwards_to_the_primary(tmp_path, monkeypatch, capsys):
+    address = str(tmp_path / 'ctl.sock')
+    server = ControlServer(address=address)
+    server.register_command('show', lambda args: 'shown')
+    assert server.start()
+    primary = InstanceLock(str(tmp_path / 'app.lock'))
+    primary.acquire()
+    monkeypatch.setattr(run_app, 'InstanceLock', lambda: InstanceLock(primary.path))
+    monkeypatch.setattr(run_app, 'configured_socket_path', lambda: address)
+    monkeypatch.setattr(run_app, 'run_primary', lambda *args: 'primary started')
+    try:
+        assert run_app.main([]) == 0
+        assert 'shown' in capsys.readouterr().out
+        assert run_app.main(['stats']) == 0
+        assert '"show": {' in capsys.readouterr().out  # the forwarded show was counted
+        assert run_app.main(['record', 'stop']) == 1  # the primary has no recorder
+        assert 'Recording engine not available' in capsys.readouterr().err
+    finally:
+        server.stop()
+        primary.release()
+
+
+def test_forward_gives_up_when_the_primary_never_listens(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(run_app, 'configured_socket_path', lambda: str(tmp_path / 'none.sock'))
+    monkeypatch.setattr(run_app, 'FORWARD_CONNECT_TIMEOUT', 0.1)
+    assert run_app.forward_command('ping', {}) == 1
+    assert 'not responding' in capsys.readouterr().err
@@ -0,0 +1,84 @@
+# test_thumbnail_cache.py
+# Tests for the content-addressed thumbnail cache, backfill and time-range lookup
+# Dependencies: pytest, pillow
+
+import io
+import os
+import threading
+
+from PIL import Image
+
+from capture_catalog import CaptureCatalog, hash_bytes
+from thumbnail_cache import ThumbnailCache, backfill, cache_dir_for, get_thumbnails, save_thumbnail, thumbnail_path
+
+
+def png_bytes(size, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_save_thumbnail_fits_the_box(tmp_path):
+    path = str(tmp_path / 'ab' / 'thumb.jpg')
+    save_thumbnail(Image.new('RGBA', (1920, 1080), (10, 20, 30, 255)), path, size=320)
+    with Image.open(path) as thumb:
+        assert thumb.format == 'JPEG' and thumb.size == (320, 180)
+    assert os.listdir(tmp_path / 'ab') == ['thumb.jpg']  # no temp file left behind
+
+
+def test_submit_writes_by_content_hash_once(tmp_path):
+    cache = ThumbnailCache(size=64)
+    cache_dir = cache_dir_for(str(tmp_path))
+    data = png_bytes((1000, 500), 'red')
+    image = Image.open(io.BytesIO(data))
+    cache.submit(cache_dir, image, data)
+    assert cache.flush(timeout=10)
+    path = thumbnail_path(cache_dir, hash_bytes(data))
+    with Image.open(path) as thumb:
+        assert thumb.size == (64, 32)
+    cache.submit(cache_dir, image, data)
+    cache.submit(None, image, data)  # no folder: ignored
+    assert cache.flush(timeout=10)
+    assert cache.get_stats()['written'] == 1 and cache.get_stats()['cached'] == 1
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    cache = ThumbnailCache(max_queue=1)
+    # A live thread that never drains the queue stands in for a busy worker
+    release = threading.Event()
+    cache.thread = threading.Thread(target=release.wait, daemon=True)
+    cache.thread.start()
+    image = Image.new('RGB', (10, 10))
+    cache.submit(str(tmp_path), image, b'a')
+    cache.submit(str(tmp_path), image, b'b')
+    assert cache.get_stats()['dropped'] == 1 and cache.pending == 1
+    assert cache.flush(timeout=0.05) is False
+    release.set()
+
+
+def test_backfill_and_get_thumbnails(tmp_path):
+    folder = str(tmp_path)
+    db_path = os.path.join(folder, 'capture_catalog.db')
+    catalog = CaptureCatalog(flush_interval=0.05)
+    for i, color in enumerate(('red', 'green')):
+        data = png_bytes((200, 100), color)
+        path = os.path.join(folder, f'screenshot_{i}.png')
+        with open(path, 'wb') as f:
+            f.write(data)
+        catalog.record(db_path, {'path': path, 'kind': 'screenshot', 'created': 1700000000 + i}, data=data)
+    catalog.record(db_path, {'path': os.path.join(folder, 'record_1.mp4'), 'kind': 'recording',
+                             'created': 1700000001}, data=b'')
+    open(os.path.join(folder, 'notes.png'), 'wb').close()  # not a capture name
+    assert catalog.flush(timeout=10)
+
+    assert [entry['thumbnail'] for entry in get_thumbnails(folder)] == [None, None]
+    result = backfill(folder, workers=2, size=50)
+    assert (result['files'], result['written'], result['errors']) == (2, 2, 0)
+    assert backfill(folder, workers=1)['cached'] == 2
+
+    entries = get_thumbnails(folder, start=1700000001, include_data=True)
+    assert len(entries) == 1 and entries[0]['path'].endswith('screenshot_1.png')
+    with Image.open(entries[0]['thumbnail']) as thumb:
+        assert thumb.size == (50, 25)
+    assert entries[0]['data'].startswith('/9j/')  # base64 of a JPEG header
+    assert get_thumbnails('') == []
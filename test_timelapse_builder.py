@@ -0,0 +1,100 @@
+# test_timelapse_builder.py
+# Tests for the timelapse builder: gap handling, letterboxing and unreadable screenshots
+# Dependencies: pytest, numpy, opencv-python
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from timelapse_builder import TimelapseBuilder, collect_frames, fit_frame, output_size, repeat_counts
+
+RED, GREEN, BLUE = (0, 0, 255), (0, 255, 0), (255, 0, 0)
+
+
+def test_repeat_counts_compress_is_one_per_screenshot():
+    assert repeat_counts([0, 10, 100]) == [1, 1, 1]
+    assert repeat_counts([5], 'hold') == [1]
+
+
+def test_repeat_counts_hold_uses_the_median_interval():
+    # Median of the deltas (10) is the interval; the 30 s gap holds 3 frames
+    assert repeat_counts([0, 10, 20, 50, 55], 'hold') == [1, 1, 3, 1, 1]
+    assert repeat_counts([0, 10, 20], 'hold', interval=5) == [2, 2, 1]
+    assert repeat_counts([0, 10, 1000], 'hold', interval=10, max_hold=4) == [1, 4, 1]
+    assert repeat_counts([3, 3, 3], 'hold') == [1, 1, 1]  # zero median falls back to 1 s
+
+
+def test_fit_frame_letterboxes_keeping_aspect():
+    image = np.full((50, 100, 3), 200, dtype=np.uint8)
+    assert fit_frame(image, (100, 50)) is image
+    fitted = fit_frame(image, (100, 100))
+    assert fitted.shape == (100, 100, 3)
+    assert (fitted[:25] == 0).all() and (fitted[75:] == 0).all()
+    assert (fitted[25:75] == 200).all()
+    tall = fit_frame(np.full((100, 20, 3), 200, dtype=np.uint8), (40, 50))
+    assert (tall[:, :15] == 0).all() and (tall[:, 15:25] == 200).all() and (tall[:, 25:] == 0).all()
+    assert fit_frame(image, (50, 25)).shape == (25, 50, 3)
+
+
+def write_screenshot(folder, clock, color=None, size=(64, 48)):
+    path = os.path.join(folder, f'screenshot_20261019_{clock}.png')
+    if color is None:
+        with open(path, 'wb') as f:
+            f.write(b'not an image')
+    else:
+        cv2.imwrite(path, np.full((size[1], size[0], 3), color, dtype=np.uint8))
+    return path
+
+
+def test_output_size_skips_unreadable_frames(tmp_path):
+    broken = write_screenshot(str(tmp_path), '140000')
+    good = write_screenshot(str(tmp_path), '140010', RED, (101, 75))
+    assert output_size([broken, good], 1.0) == (100, 74)
+    assert output_size([good], 0.5) == (50, 36)
+    with pytest.raises(IOError):
+        output_size([broken], 1.0)
+
+
+def read_video(path):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def test_build_holds_gaps_and_bridges_unreadable_screenshots(tmp_path):
+    folder = str(tmp_path)
+    write_screenshot(folder, '140000')                  # unreadable first frame: nothing to bridge with
+    write_screenshot(folder, '140010', RED)
+    write_screenshot(folder, '140020')                  # unreadable: the red frame is repeated instead
+    write_screenshot(folder, '140030', GREEN)
+    write_screenshot(folder, '140100', BLUE, (32, 48))  # 30 s gap, other size: letterboxed
+    frames = collect_frames(folder, '2026-10-19 14:00:05')
+    assert len(frames) == 4
+
+    output = str(tmp_path / 'out.avi')
+    stats = TimelapseBuilder(output, fps=10, gaps='hold', workers=2, read_ahead=2).build(
+        collect_frames(folder))
+    assert (stats['width'], stats['height']) == (64, 48)
+    assert stats['unreadable'] == 2 and stats['decoded'] == 3
+    assert stats['frames_written'] == 6 and stats['held'] == 2
+
+    video = read_video(output)
+    assert len(video) == 6
+    centers = [tuple(int(c) for c in frame[24, 32]) for frame in video]
+    expected = [RED, RED, GREEN, GREEN, GREEN, BLUE]
+    for center, color in zip(centers, expected):
+        assert max(abs(a - b) for a, b in zip(center, color)) < 40
+    assert video[5][24, 4].max() < 40  # letterbox bar
+
+
+def test_build_without_screenshots(tmp_path):
+    stats = TimelapseBuilder(str(tmp_path / 'out.avi')).build([])
+    assert stats['frames_written'] == 0 and not os.path.exists(tmp_path / 'out.avi')
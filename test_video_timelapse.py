@@ -0,0 +1,78 @@
+# test_video_timelapse.py
+# Tests for direct-to-video auto-capture: segment rolling, the frame index and frame export
+# Dependencies: pytest, numpy, opencv-python
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from video_timelapse import VideoTimelapseWriter, export_frame, load_index
+
+START = 1792400000.0
+COLORS = [(0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 255, 255)]
+
+
+def bgra(color, size=(64, 48)):
+    frame = np.full((size[1], size[0], 4), 255, dtype=np.uint8)
+    frame[:, :, :3] = color
+    return frame
+
+
+def write_session(folder):
+    # OpenCV/AVI: runs without ffmpeg; rolls after 60 s and on the size change
+    writer = VideoTimelapseWriter(folder, 'autovideo_test', fps=2, encoder='opencv', record_format='avi',
+                                  segment_minutes=1)
+    writer.append(bgra(COLORS[0]), START)
+    writer.append(bgra(COLORS[1]), START + 30)
+    writer.append(bgra(COLORS[2]), START + 70)
+    writer.append(bgra(COLORS[3], (32, 48)), START + 80)
+    writer.close()
+    return writer
+
+
+def close_to(image, color):
+    return max(abs(int(a) - b) for a, b in zip(image[10, 10], color)) < 40
+
+
+def test_segments_roll_on_time_and_size(tmp_path):
+    writer = write_session(str(tmp_path))
+    assert [os.path.basename(p) for p in writer.segments] == [
+        'autovideo_test.avi', 'autovideo_test_part2.avi', 'autovideo_test_part3.avi']
+    entries = load_index(writer.index_path)
+    assert [(e['segment'][-9:], e['frame']) for e in entries] == [
+        ('_test.avi', 0), ('_test.avi', 1), ('part2.avi', 0), ('part3.avi', 0)]
+    assert entries[3]['width'] == 32 and entries[0]['time'] == START
+
+
+def test_export_by_frame_number_and_time(tmp_path):
+    writer = write_session(str(tmp_path))
+    path, entry = export_frame(writer.index_path, frame_number=1, output_path=str(tmp_path / 'one.png'))
+    assert entry['time'] == START + 30 and close_to(cv2.imread(path), COLORS[1])
+
+    path, entry = export_frame(writer.index_path, when=START + 68)  # closest capture wins
+    assert entry['time'] == START + 70 and close_to(cv2.imread(path), COLORS[2])
+    assert os.path.dirname(path) == str(tmp_path) and os.path.basename(path).startswith('frame_')
+
+    path, entry = export_frame(writer.index_path, output_path=str(tmp_path / 'last.png'))
+    assert entry['width'] == 32 and cv2.imread(path).shape == (48, 32, 3)
+    assert export_frame(writer.index_path, frame_number=99)[1] == entry  # clamped to the last frame
+
+
+def test_torn_index_line_is_skipped(tmp_path):
+    writer = write_session(str(tmp_path))
+    with open(writer.index_path, 'a', encoding='utf-8') as f:
+        f.write('{"time": 17924')  # crash mid-line
+    assert len(load_index(writer.index_path)) == 4
+
+
+def test_export_errors(tmp_path):
+    empty = tmp_path / 'autovideo_empty.frames.jsonl'
+    empty.write_text('')
+    with pytest.raises(ValueError):
+        export_frame(str(empty))
+    missing = tmp_path / 'autovideo_gone.frames.jsonl'
+    missing.write_text('{"time": 1, "segment": "autovideo_gone.avi", "frame": 0}\n')
+    with pytest.raises(IOError):
+        export_frame(str(missing))
@@ -0,0 +1,177 @@
+# test_x11_capture.py
+# Tests for xwindow window matching and geometry tracking against a scripted in-memory Xlib,
+# and for the benchmark's --window option parsing (no X display needed)
+# Dependencies: pytest
+
+import ctypes
+from contextlib import contextmanager
+
+import pytest
+
+import x11_lib
+from benchmark_suite import window_options
+from x11_capture import WindowTracker
+
+ROOT = 1
+
+
+class FakeX11:
+    """Answers the Xlib calls WindowTracker makes from a dict of windows:
+    id -> {'parent', 'children', 'title', 'pid', 'x', 'y', 'width', 'height', 'mapped'}"""
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.events = []
+        self.keep = []  # buffers handed out through pointers
+
+    def _point(self, pointer, data):
+        buffer = ctypes.create_string_buffer(data, len(data))
+        self.keep.append(buffer)
+        ctypes.c_void_p.from_buffer(pointer._obj).value = ctypes.addressof(buffer)
+
+    def XInternAtom(self, display, name, only_if_exists):
+        return name.decode()
+
+    def XFree(self, data):
+        pass
+
+    def XQueryTree(self, display, window, root, parent, children, count):
+        if window != ROOT and window not in self.windows:
+            return 0
+        kids = [w for w, info in self.windows.items() if info['parent'] == window]
+        parent._obj.value = self.windows[window]['parent'] if window != ROOT else 0
+        count._obj.value = len(kids)
+        if kids:
+            self._point(children, bytes((ctypes.c_ulong * len(kids))(*kids)))
+        return 1
+
+    def XGetWindowAttributes(self, display, window, attrs):
+        info = self.windows.get(window)
+        if info is None:
+            return 0
+        attrs._obj.width, attrs._obj.height = info['width'], info['height']
+        attrs._obj.map_state = x11_lib.IsViewable if info['mapped'] else 0
+        return 1
+
+    def XTranslateCoordinates(self, display, window, root, x0, y0, x, y, child):
+        info = self.windows.get(window)
+        if info is None:
+            return 0
+        x._obj.value, y._obj.value = info['x'], info['y']
+        return 1
+
+    def XGetWindowProperty(self, display, window, atom, offset, length, delete, req_type,
+                           actual_type, actual_format, count, remaining, data):
+        info = self.windows.get(window, {})
+        if atom == '_NET_WM_NAME' and info.get('title') is not None:
+            value, actual_format._obj.value = info['title'].encode(), 8
+        elif atom == '_NET_WM_PID' and info.get('pid') is not None:
+            value, actual_format._obj.value = bytes(ctypes.c_long(info['pid'])), 32
+        else:
+            return x11_lib.Success
+        count._obj.value = 1 if atom == '_NET_WM_PID' else len(value)
+        self._point(data, value)
+        return x11_lib.Success
+
+    def XFetchName(self, display, window, name):
+        return 0
+
+    def XSelectInput(self, display, window, mask):
+        pass
+
+    def XSync(self, display, discard):
+        pass
+
+    def XEventsQueued(self, display, mode):
+        return len(self.events)
+
+    def XNextEvent(self, display, event):
+        event._obj.type = self.events.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def no_error_handler(monkeypatch):
+    @contextmanager
+    def trap_errors(display):
+        yield x11_lib._ErrorTrap()
+    monkeypatch.setattr(x11_lib, 'trap_errors', trap_errors)
+
+
+def window(parent, title=None, pid=None, x=0, y=0, width=100, height=80, mapped=True):
+    return {'parent': parent, 'title': title, 'pid': pid, 'x': x, 'y': y,
+            'width': width, 'height': height, 'mapped': mapped}
+
+
+def desktop():
+    # Stacking order is bottom to top: 10 (WM frame of 11), 20, 30 (topmost, unmapped)
+    return FakeX11({
+        10: window(ROOT, x=40, y=30, width=110, height=100),
+        11: window(10, 'Firefox - page', pid=500, x=45, y=50),
+        20: window(ROOT, 'Terminal', pid=600, x=200, y=0),
+        30: window(ROOT, 'Firefox (hidden)', pid=700, mapped=False),
+    })
+
+
+def tracker(x11, **options):
+    return WindowTracker(x11, 'display', ROOT, **options)
+
+
+def test_find_by_title_prefers_a_viewable_match():
+    x11 = desktop()
+    assert tracker(x11, title='^Firefox').find() == 11
+    x11.windows[11]['mapped'] = False
+    assert tracker(x11, title='^Firefox').find() == 30  # topmost unmapped match as the fallback
+    assert tracker(x11, title='^Chrome').find() is None
+
+
+def test_find_by_pid_and_id():
+    x11 = desktop()
+    assert tracker(x11, pid=600).find() == 20
+    assert tracker(x11, pid='500', title='page').find() == 11
+    assert tracker(x11, pid=500, title='Terminal').find() is None
+    assert tracker(x11, window='0x14').find() == 20
+    assert tracker(x11, window=99).find() is None
+
+
+def test_needs_a_window_option():
+    with pytest.raises(x11_lib.X11Error):
+        tracker(desktop())
+
+
+def test_geometry_is_cached_until_a_structure_event():
+    x11 = desktop()
+    follow = tracker(x11, title='Firefox')
+    assert follow.geometry() == (45, 50, 100, 80, True)
+    assert follow.watched == [11, 10]  # the window and its WM frame
+    queries = follow.stats['geometry_queries']
+    for _ in range(5):
+        follow.geometry()
+    assert follow.stats['geometry_queries'] == queries  # steady window: no round trips
+
+    x11.windows[11].update(x=300, width=64)
+    x11.events.append(x11_lib.ConfigureNotify)
+    assert follow.geometry() == (300, 50, 64, 80, True)
+    assert follow.stats['events'] == 1 and follow.stats['geometry_queries'] == queries + 1
+
+
+def test_destroyed_window_is_searched_for_again():
+    x11 = desktop()
+    follow = tracker(x11, pid=600)
+    assert follow.geometry()[:2] == (200, 0)
+    del x11.windows[20]
+    x11.events.append(x11_lib.DestroyNotify)
+    assert follow.geometry() is None and follow.window is None
+
+    x11.windows[21] = window(ROOT, 'Terminal', pid=600, x=5, y=6)
+    assert follow.geometry() is None  # searches are rate limited
+    follow.next_search = 0.0
+    assert follow.geometry() == (5, 6, 100, 80, True)
+
+
+def test_window_options():
+    assert window_options('0x2a00003') == {'composite': False, 'window': 0x2a00003}
+    assert window_options('44040195', True) == {'composite': True, 'window': 44040195}
+    assert window_options('pid:1234') == {'composite': False, 'pid': 1234}
+    assert window_options('Firefox$') == {'composite': False, 'title': 'Firefox$'}
+    with pytest.raises(ValueError):
+        window_options('')
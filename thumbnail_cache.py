@@ -0,0 +1,225 @@
+# thumbnail_cache.py
+# Thumbnail cache for captured screenshots, keyed by content hash
+# Dependencies: pillow
+#
+# At capture time the engine hands over the image it already has in memory: it
+# is box-reduced to about twice the thumbnail size on the calling thread (a
+# few ms, and it copies the pixels out of backend buffers that get reused), then
+# hashed, resized and saved as JPEG on a background thread. Thumbnails live in
+#
+#     FOLDER/.thumbnails/<first 2 hash chars>/<blake2b-128 of the file>.jpg
+#
+# which is the same hash the capture catalog stores, so a time range of
+# thumbnails is one indexed catalog query plus path lookups (get_thumbnails).
+# Existing captures are backfilled in parallel worker processes:
+#
+#     python thumbnail_cache.py backfill FOLDER [--workers N]
+#     python thumbnail_cache.py list FOLDER --from "14:00" --to "14:30"
+
+import os
+import sys
+import json
+import time
+import queue
+import base64
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from metrics import REGISTRY
+from retention import KINDS
+from output_layout import iter_outputs
+from capture_catalog import DEFAULT_FILENAME, hash_bytes, query
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+THUMBNAILS_WRITTEN = REGISTRY.counter('nsnap_thumbnails_written', 'Thumbnails written to the cache')
+THUMBNAILS_DROPPED = REGISTRY.counter('nsnap_thumbnails_dropped', 'Thumbnails skipped because the queue was full')
+THUMBNAIL_SECONDS = REGISTRY.histogram('nsnap_thumbnail_seconds', 'Background resize + save time per thumbnail')
+
+CACHE_DIRNAME = '.thumbnails'
+DEFAULT_SIZE = 320
+DEFAULT_QUALITY = 80
+
+
+def cache_dir_for(folder):
+    return os.path.join(folder, CACHE_DIRNAME) if folder else None
+
+
+def thumbnail_path(cache_dir, content_hash):
+    return os.path.join(cache_dir, content_hash[:2], f"{content_hash}.jpg")
+
+
+def save_thumbnail(image, path, size=DEFAULT_SIZE, quality=DEFAULT_QUALITY):
+    """Resize image to fit size x size and save it atomically as JPEG"""
+    image = image.convert('RGB') if image.mode != 'RGB' else image
+    image.thumbnail((size, size), Image.BILINEAR, reducing_gap=2.0)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(temp_path, format='JPEG', quality=quality)
+    os.replace(temp_path, path)
+
+
+class ThumbnailCache:
+    def __init__(self, size=DEFAULT_SIZE, quality=DEFAULT_QUALITY, max_queue=256):
+        self.size = size
+        self.quality = quality
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        self.idle = threading.Condition()
+        self.pending = 0
+        self.stats = {
+            'written': 0,
+            'cached': 0,      # content already had a thumbnail
+            'dropped': 0,
+            'errors': 0,
+            'reduce_ms_max': 0.0,
+        }
+
+    def submit(self, cache_dir, image, data):
+        """Queue a thumbnail for a capture whose file content is data (never blocks)"""
+        if not cache_dir:
+            return
+        t0 = time.perf_counter()
+        factor = max(1, max(image.width, image.height) // (self.size * 2))
+        small = image.reduce(factor) if factor > 1 else image.copy()
+        self.stats['reduce_ms_max'] = max(self.stats['reduce_ms_max'], (time.perf_counter() - t0) * 1000)
+
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='Thumbnails', daemon=True)
+                self.thread.start()
+        with self.idle:
+            self.pending += 1
+        try:
+            self.queue.put_nowait((cache_dir, small, data))
+        except queue.Full:
+            with self.idle:
+                self.pending -= 1
+                self.idle.notify_all()
+            self.stats['dropped'] += 1
+            THUMBNAILS_DROPPED.inc()
+
+    def flush(self, timeout=None):
+        """Wait until every queued thumbnail is saved; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.idle:
+            while self.pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            cache_dir, image, data = self.queue.get()
+            t0 = time.perf_counter()
+            try:
+                path = thumbnail_path(cache_dir, hash_bytes(data))
+                if os.path.exists(path):
+                    self.stats['cached'] += 1
+                else:
+                    save_thumbnail(image, path, self.size, self.quality)
+                    self.stats['written'] += 1
+                    THUMBNAILS_WRITTEN.inc()
+                    THUMBNAIL_SECONDS.observe(time.perf_counter() - t0)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Error writing thumbnail: {e}")
+            finally:
+                with self.idle:
+                    self.pending -= 1
+                    self.idle.notify_all()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queued'] = self.queue.qsize()
+        return stats
+
+
+# Process-wide cache shared by the engines
+THUMBNAILS = ThumbnailCache()
+
+
+def get_thumbnails(folder, start=None, end=None, limit=1000, include_data=False, db_path=None):
+    """Screenshots in a time range with their thumbnail paths (None if not built yet);
+    include_data adds the JPEG bytes base64-encoded"""
+    if not folder:
+        return []
+    cache_dir = cache_dir_for(folder)
+    rows = query(db_path or os.path.join(folder, DEFAULT_FILENAME), start, end, limit=limit)
+    results = []
+    for row in rows:
+        if row['kind'] not in ('screenshot', 'region') or not row['hash']:
+            continue
+        path = thumbnail_path(cache_dir, row['hash'])
+        entry = {'path': row['path'], 'created_iso': row['created_iso'], 'monitor': row['monitor'],
+                 'thumbnail': path if os.path.exists(path) else None}
+        if include_data and entry['thumbnail']:
+            with open(path, 'rb') as f:
+                entry['data'] = base64.b64encode(f.read()).decode('ascii')
+        results.append(entry)
+    return results
+
+
+def _backfill_one(job):
+    """Worker process: build the thumbnail for one capture file; returns 'written', 'cached' or an error"""
+    source, cache_dir, size, quality = job
+    try:
+        with open(source, 'rb') as f:
+            data = f.read()
+        path = thumbnail_path(cache_dir, hash_bytes(data))
+        if os.path.exists(path):
+            return 'cached'
+        with Image.open(source) as image:
+            image.draft('RGB', (size * 2, size * 2))  # JPEG: decode at reduced scale
+            save_thumbnail(image, path, size, quality)
+        return 'written'
+    except Exception as e:
+        return f"{source}: {e}"
+
+
+def backfill(folder, workers=None, size=DEFAULT_SIZE, quality=DEFAULT_QUALITY):
+    """Build missing thumbnails for existing captures in parallel; returns counts"""
+    cache_dir = cache_dir_for(folder)
+    jobs = [(path, cache_dir, size, quality) for path in iter_outputs(folder, KINDS['screenshots'])]
+    result = {'files': len(jobs), 'written': 0, 'cached': 0, 'errors': 0}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for outcome in pool.map(_backfill_one, jobs, chunksize=16):
+            if outcome in ('written', 'cached'):
+                result[outcome] += 1
+            else:
+                result['errors'] += 1
+                print(f"Error: {outcome}")
+    result['seconds'] = round(time.perf_counter() - t0, 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or list capture thumbnails")
+    sub = parser.add_subparsers(dest='command', required=True)
+    fill = sub.add_parser('backfill', help="Create thumbnails for existing screenshots")
+    fill.add_argument('folder')
+    fill.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    fill.add_argument('--size', type=int, default=DEFAULT_SIZE)
+    listing = sub.add_parser('list', help="List thumbnails for a time range (needs the capture catalog)")
+    listing.add_argument('folder')
+    listing.add_argument('--from', dest='start')
+    listing.add_argument('--to', dest='end')
+    listing.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'backfill':
+        print(json.dumps(backfill(args.folder, args.workers, args.size), indent=2))
+    else:
+        for entry in get_thumbnails(args.folder, args.start, args.end, args.limit):
+            print(f"{entry['created_iso']}  {entry['thumbnail'] or '(missing)'}  {entry['path']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# timelapse_builder.py
+# Streams a series of auto-capture screenshots into a timelapse video
+# Dependencies: opencv-python, numpy; optional ffmpeg binary on PATH
+#
+# Frames are decoded by a thread pool (cv2.imread and cv2.resize release the
+# GIL) with a fixed read-ahead window, and written in capture order, so memory
+# stays at about read_ahead decoded frames however long the series is. With
+# scale <= 0.5 OpenCV decodes at reduced resolution directly.
+#
+# Every frame is letterboxed into the output size, so captures with other
+# dimensions (a monitor change, region captures) do not break the video. Gaps:
+#     compress - one video frame per screenshot (default)
+#     hold     - repeat the previous screenshot for missed capture intervals
+#
+#     python timelapse_builder.py FOLDER -o day.mp4 --fps 30 --scale 0.5 --from "09:00" --to "18:00"
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from output_layout import OUTPUT_LAYOUT, iter_outputs, parse_output_time
+from capture_catalog import parse_time
+from video_encoders import create_video_encoder
+from image_formats import read_image
+
+PREFIXES = ('screenshot_',)
+GAP_MODES = ('compress', 'hold')
+
+
+def collect_frames(folder, start=None, end=None, prefixes=PREFIXES):
+    """[(capture time, path)] of screenshots under folder in capture order, optionally within start..end"""
+    start = parse_time(start)
+    end = parse_time(end, start)
+    frames = []
+    for path in iter_outputs(folder, prefixes):
+        when = parse_output_time(path)
+        if (start is None or when >= start) and (end is None or when <= end):
+            frames.append((when, path))
+    frames.sort()
+    return frames
+
+
+def repeat_counts(times, mode='compress', interval=None, max_hold=10):
+    """Video frames to write per screenshot; with 'hold' a gap of n intervals holds the frame n times"""
+    if mode != 'hold' or len(times) < 2:
+        return [1] * len(times)
+    deltas = [b - a for a, b in zip(times, times[1:])]
+    interval = interval or sorted(deltas)[len(deltas) // 2] or 1.0  # median capture interval
+    counts = [max(1, min(max_hold, int(round(delta / interval)))) for delta in deltas]
+    return counts + [1]
+
+
+def _imread_flags(scale):
+    """Let the decoder skip pixels when the output is much smaller than the screenshots"""
+    if scale <= 0.125:
+        return cv2.IMREAD_REDUCED_COLOR_8
+    if scale <= 0.25:
+        return cv2.IMREAD_REDUCED_COLOR_4
+    if scale <= 0.5:
+        return cv2.IMREAD_REDUCED_COLOR_2
+    return cv2.IMREAD_COLOR
+
+
+def read_frame(path, flags=cv2.IMREAD_COLOR):
+    """BGR image from a screenshot file; formats OpenCV cannot read (QOI) are decoded at full size"""
+    image = cv2.imread(path, flags)
+    if image is None and path.lower().endswith('.qoi'):
+        try:
+            image = cv2.cvtColor(read_image(path), cv2.COLOR_RGB2BGR)
+        except (OSError, ValueError):
+            return None
+    return image
+
+
+def fit_frame(image, size):
+    """Resize image to fit size (w, h) keeping its aspect ratio, padding with black"""
+    width, height = size
+    h, w = image.shape[:2]
+    if (w, h) == (width, height):
+        return image
+    ratio = min(width / w, height / h)
+    new_w, new_h = max(1, int(w * ratio)), max(1, int(h * ratio))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR)
+    if (new_w, new_h) == (width, height):
+        return resized
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    top, left = (height - new_h) // 2, (width - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def output_size(paths, scale):
+    """Output (w, h) from the first readable screenshot: scaled and rounded down to even numbers for yuv420"""
+    for path in paths:
+        image = read_frame(path)
+        if image is not None:
+            h, w = image.shape[:2]
+            return max(2, int(w * scale) // 2 * 2), max(2, int(h * scale) // 2 * 2)
+    raise IOError("None of the screenshots could be read")
+
+
+class TimelapseBuilder:
+    def __init__(self, output_path, fps=30, scale=1.0, encoder='opencv', gaps='compress', interval=None,
+                 max_hold=10, workers=None, read_ahead=None, preset='veryfast', crf=23, progress=None):
+        self.output_path = output_path
+        self.fps = fps
+        self.scale = scale
+        self.encoder_name = encoder
+        self.gaps = gaps if gaps in GAP_MODES else 'compress'
+        self.interval = interval
+        self.max_hold = max_hold
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.read_ahead = read_ahead or self.workers * 2   # decoded frames held at most
+        self.preset = preset
+        self.crf = crf
+        self.progress = progress                            # progress(stats) about once a second
+        self.cancelled = False
+        self.stats = {}
+
+    def _decode(self, path, size):
+        image = read_frame(path, _imread_flags(self.scale))
+        if image is None:
+            return None
+        return fit_frame(image, size)
+
+    def build(self, frames):
+        """Encode [(time, path)] in order; returns stats including frames_per_s"""
+        stats = self.stats = {'screenshots': len(frames), 'frames_written': 0, 'decoded': 0, 'unreadable': 0,
+                              'held': 0, 'seconds': 0.0, 'frames_per_s': 0.0, 'output_path': self.output_path}
+        if not frames:
+            return stats
+        size = output_size((path for _, path in frames), self.scale)
+        stats['width'], stats['height'] = size
+        counts = repeat_counts([t for t, _ in frames], self.gaps, self.interval, self.max_hold)
+        record_format = 'mp4' if self.output_path.lower().endswith('.mp4') else 'avi'
+        encoder = create_video_encoder(self.output_path, record_format, self.fps, size, self.encoder_name,
+                                       self.preset, self.crf)
+        t0 = last_report = time.perf_counter()
+        previous = None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='TimelapseDecode') as pool:
+                window = deque()
+                upcoming = iter(zip(frames, counts))
+                for item in upcoming:
+                    window.append((pool.submit(self._decode, item[0][1], size), item[1]))
+                    if len(window) >= self.read_ahead:
+                        break
+                while window and not self.cancelled:
+                    future, count = window.popleft()
+                    for item in upcoming:  # keep the read-ahead window full
+                        window.append((pool.submit(self._decode, item[0][1], size), item[1]))
+                        break
+                    frame = future.result()
+                    if frame is None:
+                        stats['unreadable'] += 1
+                        # Bridge with the last frame, keeping this screenshot's hold so timing does not drift
+                        frame, count = previous, count if previous is not None else 0
+                    else:
+                        stats['decoded'] += 1
+                        previous = frame
+                    for _ in range(count):
+                        encoder.write(frame)
+                    stats['frames_written'] += count
+                    stats['held'] += max(0, count - 1)
+
+                    now = time.perf_counter()
+                    if self.progress and now - last_report >= 1.0:
+                        last_report = now
+                        stats['seconds'] = now - t0
+                        stats['frames_per_s'] = stats['decoded'] / stats['seconds']
+                        self.progress(dict(stats))
+                for future, _ in window:
+                    future.cancel()
+        finally:
+            encoder.release()
+        stats['seconds'] = round(time.perf_counter() - t0, 3)
+        stats['frames_per_s'] = round(stats['decoded'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+        stats['cancelled'] = self.cancelled
+        return stats
+
+
+def build_timelapse(folder, output_path, start=None, end=None, **options):
+    """Collect the screenshots in folder (optionally within start..end) and build the timelapse"""
+    builder = TimelapseBuilder(output_path, **options)
+    return builder.build(collect_frames(folder, start, end))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a timelapse video from auto-capture screenshots")
+    parser.add_argument('folder', help="Save folder (searched recursively)")
+    parser.add_argument('-o', '--output', help="Output video (default: FOLDER/timelapse_<time>.mp4)")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--scale', type=float, default=1.0, help="Output scale relative to the first screenshot")
+    parser.add_argument('--from', dest='start', help="Start time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time")
+    parser.add_argument('--to', dest='end', help="End time (HH:MM is taken on the --from date)")
+    parser.add_argument('--gaps', choices=GAP_MODES, default='compress')
+    parser.add_argument('--interval', type=float, help="Expected capture interval for --gaps hold (default: median)")
+    parser.add_argument('--encoder', choices=['opencv', 'ffmpeg'], default='opencv')
+    parser.add_argument('--preset', default='veryfast')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--read-ahead', type=int)
+    args = parser.parse_args(argv)
+
+    output = args.output or OUTPUT_LAYOUT.path(args.folder, 'timelapse', 'mp4')
+
+    def report(stats):
+        print(f"  {stats['decoded']}/{stats['screenshots']} frames, {stats['frames_per_s']:.1f} frames/s",
+              file=sys.stderr)
+
+    try:
+        stats = build_timelapse(args.folder, output, args.start, args.end, fps=args.fps, scale=args.scale,
+                                encoder=args.encoder, gaps=args.gaps, interval=args.interval,
+                                workers=args.workers, read_ahead=args.read_ahead, preset=args.preset,
+                                progress=report)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(stats, indent=2))
+    return 0 if stats['decoded'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
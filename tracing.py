@@ -0,0 +1,143 @@
+# tracing.py
+# Opt-in span tracer for the capture/recording hot paths, exported as Chrome trace-event JSON
+# Dependencies: none (standard library only)
+#
+# Spans are recorded into a fixed-size ring (oldest events are overwritten) and
+# written out as Chrome trace-event JSON that opens in https://ui.perfetto.dev or
+# chrome://tracing. Each span carries the native thread id, so stalls in grab,
+# convert, encode and disk writes - and threads waiting on each other for the GIL -
+# line up on a shared timeline.
+#
+# Hot paths that already take perf_counter() timestamps pass them to complete(),
+# so tracing adds no extra clock reads:
+#
+#     from tracing import TRACER
+#     t0 = time.perf_counter(); frame = grab(); t1 = time.perf_counter()
+#     TRACER.complete('grab', t0, t1)
+#
+# When TRACER.enabled is False every call returns after a single attribute check.
+# Measured cost: python benchmark_suite.py --only tracing
+
+import os
+import json
+import time
+import itertools
+import threading
+from contextlib import nullcontext
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.complete(self.name, self.start, time.perf_counter(), self.args, self.cat)
+
+
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    def __init__(self, capacity=200000):
+        self.enabled = False
+        self.thread_names = {}
+        self.resize(capacity)
+
+    def resize(self, capacity):
+        """Reallocate the ring (drops recorded events)"""
+        self.capacity = max(1000, int(capacity))
+        self.ring = [None] * self.capacity
+        # next() on itertools.count is atomic under the GIL, so writers never share a slot
+        self.sequence = itertools.count()
+        self.epoch = time.perf_counter()
+
+    def start(self, capacity=None):
+        """Clear the ring and start recording"""
+        if capacity and int(capacity) != self.capacity:
+            self.resize(capacity)
+        else:
+            self.clear()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def clear(self):
+        self.ring = [None] * self.capacity
+        self.sequence = itertools.count()
+        self.epoch = time.perf_counter()
+
+    def _thread_id(self):
+        tid = threading.get_native_id()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def complete(self, name, start, end, args=None, cat='capture'):
+        """Record a span from two perf_counter() timestamps"""
+        if not self.enabled:
+            return
+        seq = next(self.sequence)
+        self.ring[seq % self.capacity] = (seq, name, cat, start, end, self._thread_id(), args)
+
+    def instant(self, name, args=None, cat='capture'):
+        """Record a point-in-time event (e.g. a dropped frame)"""
+        if not self.enabled:
+            return
+        seq = next(self.sequence)
+        self.ring[seq % self.capacity] = (seq, name, cat, time.perf_counter(), None, self._thread_id(), args)
+
+    def span(self, name, args=None, cat='capture'):
+        """Context manager recording the enclosed block as a span"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def events(self):
+        """Recorded events in Chrome trace-event format, oldest first"""
+        records = sorted((r for r in list(self.ring) if r is not None), key=lambda r: r[0])
+        pid = os.getpid()
+        events = [{'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0, 'args': {'name': 'N-SnapRecorder'}}]
+        for tid, thread_name in list(self.thread_names.items()):
+            events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}})
+        for seq, name, cat, start, end, tid, args in records:
+            event = {'name': name, 'cat': cat, 'pid': pid, 'tid': tid,
+                     'ts': round((start - self.epoch) * 1e6, 3)}
+            if end is None:
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=round((end - start) * 1e6, 3))
+            if args:
+                event['args'] = args
+            events.append(event)
+        return events
+
+    def dump(self, path):
+        """Write the ring as Chrome trace JSON; returns the path or None on error"""
+        events = self.events()
+        recorded = sum(1 for e in events if e['ph'] != 'M')
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'ring_capacity': self.capacity, 'events': recorded},
+        }
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(trace, f, separators=(',', ':'))
+        except Exception as e:
+            print(f"Error writing trace: {e}")
+            return None
+        return path
+
+
+# Process-wide tracer used by the engines
+TRACER = Tracer()
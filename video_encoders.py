@@ -0,0 +1,239 @@
+# video_encoders.py
+# Video encoders used by the recording pipeline
+# Dependencies: opencv-python, numpy; optional ffmpeg binary on PATH
+#
+# Encoders:
+#   opencv - cv2.VideoWriter (mp4v / XVID), always available
+#   ffmpeg - raw BGR frames piped to an ffmpeg libx264 process; supports encoder
+#            presets (ultrafast..medium) so the recorder can trade size for CPU
+#
+# SegmentedVideoWriter starts a new file whenever the frame size or preset changes
+# (containers cannot switch resolution mid-stream) and can join the parts at the end:
+# by stream copy when all parts share size and codec, re-encoded otherwise. The
+# parts are only deleted once ffmpeg succeeded and the joined file has (about) as
+# many frames as the parts together.
+
+import os
+import shutil
+import subprocess
+
+import cv2
+
+from cpu_scheduling import apply_process_scheduling
+
+# x264 presets from fastest (least CPU) to slowest
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium']
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+def count_video_frames(path):
+    """Number of video packets (frames) in a file according to ffprobe, or None if unknown"""
+    if not shutil.which('ffprobe'):
+        return None
+    cmd = ['ffprobe', '-v', 'error', '-count_packets', '-select_streams', 'v:0',
+           '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        return int(result.stdout.strip().splitlines()[0].strip(',')) if result.returncode == 0 else None
+    except (OSError, ValueError, IndexError, subprocess.SubprocessError):
+        return None
+
+
+class OpenCVEncoder:
+    name = 'opencv'
+    supports_preset = False
+
+    def __init__(self, path, record_format, fps, size):
+        fourcc = cv2.VideoWriter_fourcc(*('mp4v' if record_format == 'mp4' else 'XVID'))
+        self.path = path
+        self.writer = cv2.VideoWriter(path, fourcc, fps, size)
+        if not self.writer.isOpened():
+            raise IOError(f"Could not open video writer: {path}")
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+
+class FFmpegPipeEncoder:
+    name = 'ffmpeg'
+    supports_preset = True
+
+    def __init__(self, path, record_format, fps, size, preset='veryfast', crf=23, threads=0, cpus=None, nice=0,
+                 fragmented=False):
+        width, height = size
+        cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+            '-c:v', 'libx264', '-preset', preset, '-crf', str(crf), '-pix_fmt', 'yuv420p',
+            '-threads', str(int(threads)),
+        ]
+        if fragmented and record_format == 'mp4':
+            # Frames leave x264 as soon as they are written (no lookahead or B-frames) and each
+            # becomes its own fragment, flushed when the next frame arrives: if the process dies
+            # mid-segment the file stays playable and only the last frame is lost
+            cmd += ['-tune', 'zerolatency', '-bf', '0', '-g', str(max(1, int(round(fps)))),
+                    '-movflags', '+frag_every_frame+empty_moov+default_base_moof', '-flush_packets', '1']
+        cmd.append(path)
+        self.path = path
+        self.frame_bytes = width * height * 3
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # The encoder process gets the same CPU mask/priority as the encoder thread
+        if cpus or nice:
+            apply_process_scheduling(self.process.pid, cpus, nice)
+
+    def write(self, frame):
+        # Contiguous BGR frames can be handed to the pipe without a copy
+        data = memoryview(frame if frame.flags['C_CONTIGUOUS'] else frame.copy()).cast('B')
+        if len(data) != self.frame_bytes:
+            raise ValueError(f"Frame size {len(data)} does not match encoder size {self.frame_bytes}")
+        self.process.stdin.write(data)
+
+    def release(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+def create_video_encoder(path, record_format, fps, size, encoder='opencv', preset='veryfast', crf=23, threads=0,
+                         cpus=None, nice=0, fragmented=False):
+    """Create an encoder, falling back to OpenCV when ffmpeg is not installed"""
+    if encoder == 'ffmpeg':
+        if ffmpeg_available():
+            return FFmpegPipeEncoder(path, record_format, fps, size, preset, crf, threads, cpus, nice, fragmented)
+        print("ffmpeg not found, using OpenCV encoder")
+    return OpenCVEncoder(path, record_format, fps, size)
+
+
+class SegmentedVideoWriter:
+    """Writes frames through one encoder, rolling to basename_partN files when the
+    frame size or encoder preset changes"""
+
+    def __init__(self, folder, basename, record_format, fps, encoder='opencv', crf=23, threads=0,
+                 cpus=None, nice=0, fragmented=False):
+        self.folder = folder
+        self.basename = basename
+        self.extension = 'mp4' if record_format == 'mp4' else 'avi'
+        self.record_format = record_format
+        self.fps = fps
+        self.encoder_name = encoder
+        self.crf = crf
+        self.threads = threads
+        self.cpus = cpus
+        self.nice = nice
+        self.fragmented = fragmented
+        self.encoder = None
+        self.key = None
+        self.next_folder = None  # set by roll(); applied by the encoder thread on the next write
+        self.segments = []  # [{'path', 'width', 'height', 'preset', 'frames'}]
+
+    @property
+    def supports_preset(self):
+        return self.encoder_name == 'ffmpeg' and ffmpeg_available()
+
+    def _segment_path(self):
+        suffix = '' if not self.segments else f"_part{len(self.segments) + 1}"
+        return os.path.join(self.folder, f"{self.basename}{suffix}.{self.extension}")
+
+    def _open(self, width, height, preset):
+        self.close_segment()
+        path = self._segment_path()
+        self.encoder = create_video_encoder(path, self.record_format, self.fps, (width, height),
+                                            self.encoder_name, preset or 'veryfast', self.crf, self.threads,
+                                            self.cpus, self.nice, self.fragmented)
+        self.key = (width, height, preset)
+        self.segments.append({'path': path, 'width': width, 'height': height, 'preset': preset, 'frames': 0,
+                              'codec': self.encoder.name})
+
+    def roll(self, folder=None):
+        """Start a new segment (optionally in another folder) at the next write"""
+        self.next_folder = folder or self.folder
+
+    def write(self, frame, preset=None, count=1):
+        """Write frame count times, starting a new segment if size, preset or folder changed"""
+        height, width = frame.shape[:2]
+        if self.next_folder:
+            self.folder, self.next_folder = self.next_folder, None
+            self.key = None
+        if self.key != (width, height, preset):
+            self._open(width, height, preset)
+        for _ in range(count):
+            self.encoder.write(frame)
+        self.segments[-1]['frames'] += count
+
+    def close_segment(self):
+        if self.encoder:
+            self.encoder.release()
+            self.encoder = None
+
+    def close(self):
+        self.close_segment()
+        return [s['path'] for s in self.segments]
+
+    def join_segments(self):
+        """Join all segments into the first segment's path using ffmpeg: stream copy when they
+        share size and codec, else re-encoded at the first segment's size. Returns the path of
+        the single resulting file, or None if the parts were kept."""
+        if len(self.segments) < 2:
+            return self.segments[0]['path'] if self.segments else None
+        if not ffmpeg_available():
+            return None
+        first = self.segments[0]
+        if any(os.path.dirname(s['path']) != os.path.dirname(first['path']) for s in self.segments):
+            return None  # rolled to an overflow folder - the original volume has no room for a joined copy
+        list_path = os.path.join(self.folder, f"{self.basename}_segments.txt")
+        joined_path = os.path.join(self.folder, f"{self.basename}_joined.{self.extension}")
+        same_stream = all((s['width'], s['height'], s.get('codec')) == (first['width'], first['height'],
+                                                                      first.get('codec')) for s in self.segments)
+        if same_stream:
+            codec = ['-c', 'copy']
+        else:
+            codec = ['-vf', f"scale={first['width']}:{first['height']}", '-r', str(self.fps)]
+            codec += ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(self.crf), '-pix_fmt', 'yuv420p'] \
+                if self.extension == 'mp4' else ['-c:v', 'mpeg4', '-q:v', '5']
+        joined = False
+        try:
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for segment in self.segments:
+                    escaped = os.path.abspath(segment['path']).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path] + \
+                codec + [joined_path]
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                error = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+                print(f"Error joining video segments: ffmpeg exited with {result.returncode}"
+                      f"{': ' + error[-1] if error else ''}")
+                return None
+            # ffmpeg creates the output before it knows whether every part is readable:
+            # only a joined file with the parts' frames replaces them
+            expected = sum(segment['frames'] for segment in self.segments)
+            frames = count_video_frames(joined_path)
+            if frames is None or abs(frames - expected) > max(2, expected // 100):
+                print(f"Error joining video segments: joined file has {frames} frames, expected {expected}")
+                return None
+            joined = True
+            os.replace(joined_path, first['path'])
+            for segment in self.segments[1:]:
+                os.remove(segment['path'])
+            return first['path']
+        except Exception as e:
+            print(f"Error joining video segments: {e}")
+            return None
+        finally:
+            if not joined:
+                try:
+                    os.remove(joined_path)
+                except OSError:
+                    pass
+            try:
+                os.remove(list_path)
+            except OSError:
+                pass
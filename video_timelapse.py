@@ -0,0 +1,163 @@
+# video_timelapse.py
+# Direct-to-video auto-capture: each capture tick appends one frame to a low-fps video
+# Dependencies: opencv-python, numpy; optional ffmpeg binary on PATH
+#
+# Uses the recorder's encoder backends (video_encoders.SegmentedVideoWriter).
+# A session is a series of segments, autovideo_<time>[_partN].mp4, rolled every
+# segment_minutes (and whenever the screen size changes), so a crash loses at
+# most the open segment. With ffmpeg (fragmented MP4, one fragment per frame) it
+# loses at most the last frame: every earlier frame is already on disk, and can be
+# exported, while the segment is still open.
+#
+# Every frame gets one line in autovideo_<time>.frames.jsonl, written as it is
+# encoded, mapping capture time to (segment, frame number). That index is what
+# makes single frames exportable again:
+#
+#     python video_timelapse.py export FOLDER/autovideo_<time>.frames.jsonl --time "14:05" -o frame.png
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import cv2
+
+from metrics import REGISTRY
+from capture_catalog import parse_time
+from video_encoders import SegmentedVideoWriter
+
+# Metrics (no-ops until REGISTRY.enabled is set)
+FRAMES_APPENDED = REGISTRY.counter('nsnap_autovideo_frames', 'Auto-capture frames appended to video')
+APPEND_SECONDS = REGISTRY.histogram('nsnap_autovideo_append_seconds', 'Convert + encode time per auto-capture frame')
+
+INDEX_SUFFIX = '.frames.jsonl'
+
+
+class VideoTimelapseWriter:
+    def __init__(self, folder, basename, fps=10, encoder='ffmpeg', record_format='mp4', segment_minutes=10,
+                 preset='veryfast', crf=28):
+        self.folder = folder
+        self.basename = basename
+        self.fps = fps
+        self.preset = preset
+        self.segment_seconds = max(0.0, float(segment_minutes) * 60)
+        self.writer = SegmentedVideoWriter(folder, basename, record_format, fps, encoder, crf, fragmented=True)
+        self.index_path = os.path.join(folder, basename + INDEX_SUFFIX)
+        self.index_file = open(self.index_path, 'a', encoding='utf-8', buffering=1)  # line buffered
+        self.segment_started = None
+        self.frames = 0
+
+    @property
+    def segments(self):
+        return [s['path'] for s in self.writer.segments]
+
+    def append(self, frame, when=None):
+        """Append one BGRA (or BGR) capture as the next video frame"""
+        t0 = time.perf_counter()
+        when = when or time.time()
+        if frame.ndim == 3 and frame.shape[2] == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        # Roll to a new segment so finished parts are closed (and safe) regularly
+        if self.segment_started is not None and self.segment_seconds \
+                and when - self.segment_started >= self.segment_seconds:
+            self.writer.roll()
+            self.segment_started = None
+        segment_count = len(self.writer.segments)
+        self.writer.write(frame, self.preset)
+        segment = self.writer.segments[-1]
+        if len(self.writer.segments) != segment_count or self.segment_started is None:
+            self.segment_started = when
+            segment['started'] = when
+        self.frames += 1
+        self.index_file.write(json.dumps({
+            'time': round(when, 3),
+            'segment': os.path.basename(segment['path']),
+            'frame': segment['frames'] - 1,
+            'width': segment['width'],
+            'height': segment['height'],
+        }) + '\n')
+        FRAMES_APPENDED.inc()
+        APPEND_SECONDS.observe(time.perf_counter() - t0)
+        return segment['path']
+
+    def close(self):
+        """Finish the open segment and the index; returns the segment paths"""
+        paths = self.writer.close()
+        try:
+            self.index_file.close()
+        except OSError as e:
+            print(f"Error closing frame index: {e}")
+        return paths
+
+
+def load_index(index_path):
+    """Frame index entries, oldest first (a torn last line from a crash is skipped)"""
+    entries = []
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def export_frame(index_path, when=None, frame_number=None, output_path=None):
+    """Write the frame captured closest to when (or the Nth frame of the session) as an image.
+    Returns (output path, index entry)"""
+    entries = load_index(index_path)
+    if not entries:
+        raise ValueError(f"No frames in {index_path}")
+    if frame_number is not None:
+        entry = entries[max(0, min(len(entries) - 1, int(frame_number)))]
+    else:
+        target = parse_time(when, entries[0]['time']) if when is not None else entries[-1]['time']
+        entry = min(entries, key=lambda e: abs(e['time'] - target))
+
+    folder = os.path.dirname(index_path)
+    capture = cv2.VideoCapture(os.path.join(folder, entry['segment']))
+    try:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, entry['frame'])
+        ok, image = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        raise IOError(f"Could not read frame {entry['frame']} of {entry['segment']}")
+
+    if not output_path:
+        stamp = datetime.fromtimestamp(entry['time']).strftime('%Y%m%d_%H%M%S_%f')[:-3]
+        output_path = os.path.join(folder, f"frame_{stamp}.png")
+    cv2.imwrite(output_path, image)
+    return output_path, entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export frames from direct-to-video auto-capture sessions")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Export one frame as an image")
+    export.add_argument('index', help=f"Session index file (*{INDEX_SUFFIX})")
+    export.add_argument('--time', help="Capture time: 'YYYY-MM-DD HH:MM[:SS]', 'HH:MM' or unix time (default: last)")
+    export.add_argument('--frame', type=int, help="Frame number within the session instead of a time")
+    export.add_argument('-o', '--output', help="Image path (default: frame_<time>.png next to the index)")
+    listing = sub.add_parser('list', help="Show the frames of a session")
+    listing.add_argument('index')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'export':
+            path, entry = export_frame(args.index, args.time, args.frame, args.output)
+            print(f"{path}  ({entry['segment']} frame {entry['frame']})")
+        else:
+            for number, entry in enumerate(load_index(args.index)):
+                stamp = datetime.fromtimestamp(entry['time']).isoformat(timespec='milliseconds')
+                print(f"{number:>6}  {stamp}  {entry['segment']}#{entry['frame']}  {entry['width']}x{entry['height']}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,698 @@
+# x11_capture.py
+# X11-specific capture backends (see capture_backends.py for the interface)
+# Dependencies: numpy, mss (monitor layout), libX11 + libXext (+ libXdamage, libXfixes, libXcomposite) via x11_lib
+#
+# xshm    - MIT-SHM capture: XShmGetImage into a persistent shared memory segment,
+#           so the server writes pixels straight into our buffer instead of copying
+#           the whole frame through the X socket as XGetImage (the mss path) does.
+# xdamage - keeps a persistent framebuffer and only re-reads the rectangles the
+#           DAMAGE extension reports as changed. With no damage events pending a
+#           grab makes no X request at all.
+# xwindow - follows one window (by id, title regex or PID) wherever it moves;
+#           the region passed to grab() is ignored. Geometry is cached and only
+#           re-queried when the window or one of its ancestors reports a
+#           StructureNotify event, so a steady window costs no extra round trips.
+#           With composite=True the window's own XComposite pixmap is read, which
+#           also works while the window is covered by others.
+#
+#     capture_backend 'xwindow', capture_backend_options {'title': 'Firefox$', 'composite': true}
+#
+# Self check under Xvfb:
+#     Xvfb :99 -screen 0 1920x1080x24 &
+#     DISPLAY=:99 python x11_capture.py            # xshm vs mss
+#     DISPLAY=:99 python x11_capture.py --damage   # xdamage with a scripted window
+#     DISPLAY=:99 python x11_capture.py --window   # xwindow following a scripted window
+
+import re
+import ctypes
+import sys
+import time
+
+import mss
+import numpy as np
+
+import x11_lib
+from x11_lib import X11Error
+from capture_backends import CaptureBackend
+
+
+class XShmBackend(CaptureBackend):
+    """MIT-SHM capture of the root window. grab() returns a view of the shared
+    segment, valid until the next grab() or close()."""
+
+    name = 'xshm'
+
+    def __init__(self, display=None):
+        self.x11 = x11_lib.load()
+        self.display_name = display
+        self.display = x11_lib.open_display(display)
+        self.image = None
+        self.shminfo = None
+        self.buffer = None
+        self.image_size = None
+        self._monitors = None
+        try:
+            if not self.x11.XShmQueryExtension(self.display):
+                raise X11Error("MIT-SHM extension not available")
+            self.screen = self.x11.XDefaultScreen(self.display)
+            self.root = self.x11.XRootWindow(self.display, self.screen)
+            self.visual = self.x11.XDefaultVisual(self.display, self.screen)
+            self.depth = self.x11.XDefaultDepth(self.display, self.screen)
+        except Exception:
+            x11_lib.close_display(self.display)
+            self.display = None
+            raise
+
+    @property
+    def monitors(self):
+        # Monitor geometry rarely changes; read it once through mss (XRandR)
+        if self._monitors is None:
+            with mss.mss(display=self.display_name) as sct:
+                self._monitors = [dict(m) for m in sct.monitors]
+        return self._monitors
+
+    def _allocate(self, width, height):
+        """Create the XImage and shared segment for a region size"""
+        self._release_image()
+        x11 = self.x11
+        shminfo = x11_lib.XShmSegmentInfo()
+        image = x11.XShmCreateImage(self.display, self.visual, self.depth, x11_lib.ZPixmap,
+                                    None, ctypes.byref(shminfo), width, height)
+        if not image:
+            raise X11Error("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            x11.XDestroyImage(image)
+            raise X11Error(f"Unsupported pixel format: {image.contents.bits_per_pixel} bpp")
+
+        bytes_per_line = image.contents.bytes_per_line
+        size = bytes_per_line * height
+        shmid = x11.shmget(x11_lib.IPC_PRIVATE, size, x11_lib.IPC_CREAT | 0o600)
+        if shmid < 0:
+            x11.XDestroyImage(image)
+            raise X11Error(f"shmget failed for {size} bytes (errno {ctypes.get_errno()})")
+        addr = x11.shmat(shmid, None, 0)
+        if addr is None or addr == x11_lib.SHMAT_FAILED:
+            x11.shmctl(shmid, x11_lib.IPC_RMID, None)
+            x11.XDestroyImage(image)
+            raise X11Error("shmat failed")
+
+        shminfo.shmid = shmid
+        shminfo.shmaddr = addr
+        shminfo.readOnly = 0
+        image.contents.data = addr
+
+        with x11_lib.trap_errors(self.display) as trap:
+            attached = x11.XShmAttach(self.display, ctypes.byref(shminfo))
+            x11.XSync(self.display, 0)
+        # Mark for removal now: the kernel frees it after the last detach, even if we crash
+        x11.shmctl(shmid, x11_lib.IPC_RMID, None)
+        if not attached or trap.error_code:
+            image.contents.data = None
+            x11.XDestroyImage(image)
+            x11.shmdt(addr)
+            raise X11Error("XShmAttach failed (remote display?)")
+
+        self.image = image
+        self.shminfo = shminfo
+        self.image_size = (width, height)
+        raw = (ctypes.c_ubyte * size).from_address(addr)
+        self.buffer = np.frombuffer(raw, dtype=np.uint8).reshape(height, bytes_per_line // 4, 4)[:, :width]
+
+    def _release_image(self):
+        if self.image is None:
+            return
+        x11 = self.x11
+        self.buffer = None
+        x11.XShmDetach(self.display, ctypes.byref(self.shminfo))
+        x11.XSync(self.display, 0)
+        addr = self.shminfo.shmaddr
+        # Shared segment data is not owned by the image - detach it separately
+        self.image.contents.data = None
+        x11.XDestroyImage(self.image)
+        x11.shmdt(addr)
+        self.image = None
+        self.shminfo = None
+        self.image_size = None
+
+    def grab(self, region):
+        width, height = int(region['width']), int(region['height'])
+        if self.image_size != (width, height):
+            self._allocate(width, height)
+        with x11_lib.trap_errors(self.display) as trap:
+            ok = self.x11.XShmGetImage(self.display, self.root, self.image,
+                                       int(region['left']), int(region['top']), x11_lib.AllPlanes)
+        if not ok or trap.error_code:
+            raise X11Error(f"XShmGetImage failed for region {region}")
+        return self.buffer
+
+    def close(self):
+        if self.display is None:
+            return
+        try:
+            self._release_image()
+        finally:
+            x11_lib.close_display(self.display)
+            self.display = None
+
+
+class XDamageBackend(XShmBackend):
+    """Damage-tracked capture. grab() returns a persistent framebuffer that is
+    patched in place; last_grab_changed is False when nothing was redrawn."""
+
+    name = 'xdamage'
+
+    # Above this fraction of damaged pixels one shared-memory grab beats many small ones
+    FULL_GRAB_FRACTION = 0.5
+
+    def __init__(self, display=None):
+        super().__init__(display)
+        self.damage = None
+        self.parts = None
+        try:
+            self.x11.require('damage')
+            event_base, error_base = ctypes.c_int(), ctypes.c_int()
+            if not self.x11.XDamageQueryExtension(self.display, ctypes.byref(event_base),
+                                                  ctypes.byref(error_base)):
+                raise X11Error("DAMAGE extension not available")
+            self.damage_event = event_base.value + x11_lib.XDamageNotify
+            self.damage = self.x11.XDamageCreate(self.display, self.root, x11_lib.XDamageReportNonEmpty)
+            self.parts = self.x11.XFixesCreateRegion(self.display, None, 0)
+            self.x11.XFlush(self.display)
+        except Exception:
+            self.close()
+            raise
+        self.event = x11_lib.XEvent()
+        self.framebuffer = None
+        self.region = None
+        self.pending = True
+        self.stats = {'full_grabs': 0, 'partial_grabs': 0, 'skipped_grabs': 0, 'rects': 0}
+
+    def _drain_events(self):
+        """Read queued events without blocking; True if any damage was reported"""
+        x11 = self.x11
+        damaged = False
+        while x11.XEventsQueued(self.display, x11_lib.QueuedAfterReading) > 0:
+            x11.XNextEvent(self.display, ctypes.byref(self.event))
+            if self.event.type == self.damage_event:
+                damaged = True
+        return damaged
+
+    def _full_grab(self, region):
+        frame = super().grab(region)
+        if self.framebuffer is None or self.framebuffer.shape[:2] != frame.shape[:2]:
+            self.framebuffer = np.empty(frame.shape, dtype=np.uint8)
+        np.copyto(self.framebuffer, frame)
+        self.stats['full_grabs'] += 1
+
+    def _damaged_rects(self, region):
+        """Take the accumulated damage and return it clipped to region (region-relative)"""
+        x11 = self.x11
+        x11.XDamageSubtract(self.display, self.damage, 0, self.parts)
+        count = ctypes.c_int()
+        rects_ptr = x11.XFixesFetchRegion(self.display, self.parts, ctypes.byref(count))
+        rects = []
+        left, top = int(region['left']), int(region['top'])
+        right, bottom = left + int(region['width']), top + int(region['height'])
+        try:
+            for i in range(count.value):
+                r = rects_ptr[i]
+                x0, y0 = max(r.x, left), max(r.y, top)
+                x1, y1 = min(r.x + r.width, right), min(r.y + r.height, bottom)
+                if x1 > x0 and y1 > y0:
+                    rects.append((x0 - left, y0 - top, x1 - x0, y1 - y0))
+        finally:
+            if rects_ptr:
+                x11.XFree(rects_ptr)
+        return rects
+
+    def _grab_rect(self, region, x, y, width, height):
+        """Read one region-relative rectangle with XGetImage into the framebuffer"""
+        x11 = self.x11
+        with x11_lib.trap_errors(self.display) as trap:
+            image = x11.XGetImage(self.display, self.root, int(region['left']) + x, int(region['top']) + y,
+                                  width, height, x11_lib.AllPlanes, x11_lib.ZPixmap)
+        if not image or trap.error_code:
+            raise X11Error(f"XGetImage failed for damaged rectangle {(x, y, width, height)}")
+        try:
+            stride = image.contents.bytes_per_line
+            raw = (ctypes.c_ubyte * (stride * height)).from_address(image.contents.data)
+            pixels = np.frombuffer(raw, dtype=np.uint8).reshape(height, stride // 4, 4)[:, :width]
+            self.framebuffer[y:y + height, x:x + width] = pixels
+        finally:
+            x11.XDestroyImage(image)
+
+    def grab(self, region):
+        region_key = (int(region['left']), int(region['top']), int(region['width']), int(region['height']))
+        damaged = self._drain_events() or self.pending
+        self.pending = False
+
+        if region_key != self.region or self.framebuffer is None:
+            # New geometry: clear damage first so changes during the grab are seen next time
+            self.x11.XDamageSubtract(self.display, self.damage, 0, 0)
+            self._full_grab(region)
+            self.region = region_key
+            self.last_grab_changed = True
+            return self.framebuffer
+
+        if not damaged:
+            self.stats['skipped_grabs'] += 1
+            self.last_grab_changed = False
+            return self.framebuffer
+
+        rects = self._damaged_rects(region)
+        if not rects:
+            # Damage was entirely outside our region
+            self.stats['skipped_grabs'] += 1
+            self.last_grab_changed = False
+            return self.framebuffer
+
+        self.stats['rects'] += len(rects)
+        area = sum(w * h for _, _, w, h in rects)
+        if area >= self.FULL_GRAB_FRACTION * region_key[2] * region_key[3]:
+            self._full_grab(region)
+        else:
+            for x, y, width, height in rects:
+                self._grab_rect(region, x, y, width, height)
+            self.stats['partial_grabs'] += 1
+        self.last_grab_changed = True
+        return self.framebuffer
+
+    def close(self):
+        if self.display is not None:
+            if self.parts:
+                self.x11.XFixesDestroyRegion(self.display, self.parts)
+                self.parts = None
+            if self.damage:
+                self.x11.XDamageDestroy(self.display, self.damage)
+                self.damage = None
+        super().close()
+
+
+class WindowTracker:
+    """Finds a window by id, title regex or PID and keeps its root-relative geometry current
+    from StructureNotify events on the window and its ancestors (no per-frame queries)"""
+
+    # A window that is not there (yet) is searched for again at most this often
+    SEARCH_INTERVAL = 1.0
+    STRUCTURE_EVENTS = (x11_lib.ConfigureNotify, x11_lib.ReparentNotify, x11_lib.MapNotify,
+                        x11_lib.UnmapNotify, x11_lib.DestroyNotify)
+
+    def __init__(self, x11, display, root, window=None, title=None, pid=None):
+        if window in (None, '') and not title and not pid:
+            raise X11Error("xwindow needs a window id, title or pid option")
+        self.x11 = x11
+        self.display = display
+        self.root = root
+        self.window_id = int(window, 0) if isinstance(window, str) else window
+        self.title = re.compile(title) if title else None
+        self.pid = int(pid) if pid else None
+        self.window = None
+        self.watched = []
+        self.dirty = True
+        self.next_search = 0.0
+        self.cached = None
+        self.event = x11_lib.XEvent()
+        self.atoms = {}
+        self.stats = {'searches': 0, 'geometry_queries': 0, 'events': 0}
+
+    def _atom(self, name):
+        if name not in self.atoms:
+            self.atoms[name] = self.x11.XInternAtom(self.display, name.encode(), 0)
+        return self.atoms[name]
+
+    def _property(self, window, name, property_type=x11_lib.AnyPropertyType):
+        """Raw bytes of a window property, or None"""
+        x11 = self.x11
+        actual_type, actual_format = ctypes.c_ulong(), ctypes.c_int()
+        count, remaining, data = ctypes.c_ulong(), ctypes.c_ulong(), ctypes.c_void_p()
+        status = x11.XGetWindowProperty(self.display, window, self._atom(name), 0, 1024, 0, property_type,
+                                        ctypes.byref(actual_type), ctypes.byref(actual_format),
+                                        ctypes.byref(count), ctypes.byref(remaining), ctypes.byref(data))
+        if status != x11_lib.Success or not data.value:
+            return None
+        try:
+            # 32-bit format items are stored as C longs
+            item_size = ctypes.sizeof(ctypes.c_long) if actual_format.value == 32 else actual_format.value // 8
+            return ctypes.string_at(data.value, count.value * item_size)
+        finally:
+            x11.XFree(data)
+
+    def _title(self, window):
+        data = self._property(window, '_NET_WM_NAME')
+        if data is not None:
+            return data.decode('utf-8', 'replace')
+        name = ctypes.c_void_p()
+        if self.x11.XFetchName(self.display, window, ctypes.byref(name)) and name.value:
+            try:
+                return ctypes.string_at(name.value).decode('latin-1')
+            finally:
+                self.x11.XFree(name)
+        return None
+
+    def _pid(self, window):
+        data = self._property(window, '_NET_WM_PID', x11_lib.XA_CARDINAL)
+        return ctypes.c_long.from_buffer_copy(data[:ctypes.sizeof(ctypes.c_long)]).value if data else None
+
+    def _tree(self, window):
+        """(parent, children) of window"""
+        root, parent = ctypes.c_ulong(), ctypes.c_ulong()
+        children, count = ctypes.POINTER(ctypes.c_ulong)(), ctypes.c_uint()
+        if not self.x11.XQueryTree(self.display, window, ctypes.byref(root), ctypes.byref(parent),
+                                   ctypes.byref(children), ctypes.byref(count)):
+            return None, []
+        try:
+            return parent.value, [children[i] for i in range(count.value)]
+        finally:
+            if children:
+                self.x11.XFree(children)
+
+    def _viewable(self, window):
+        attrs = x11_lib.XWindowAttributes()
+        return bool(self.x11.XGetWindowAttributes(self.display, window, ctypes.byref(attrs))) \
+            and attrs.map_state == x11_lib.IsViewable
+
+    def _matches(self, window):
+        if self.pid is not None and self._pid(window) != self.pid:
+            return False
+        if self.title is not None:
+            title = self._title(window)
+            if title is None or not self.title.search(title):
+                return False
+        return True
+
+    def find(self):
+        """Window id for the configured id/title/pid (a viewable match first), or None"""
+        self.stats['searches'] += 1
+        with x11_lib.trap_errors(self.display):
+            if self.window_id is not None:
+                return self.window_id if self._viewable(self.window_id) or self._tree(self.window_id)[0] else None
+            # Walk the whole tree: without a window manager there is no _NET_CLIENT_LIST,
+            # and with one the client windows sit below the frame windows
+            fallback = None
+            pending = [self.root]
+            while pending:
+                _, children = self._tree(pending.pop())
+                for child in reversed(children):  # topmost first
+                    if self._matches(child):
+                        if self._viewable(child):
+                            return child
+                        fallback = fallback or child
+                    pending.append(child)
+            return fallback
+
+    def _watch(self):
+        """Listen for StructureNotify on the window and every ancestor (moving a WM frame
+        only notifies the frame)"""
+        x11 = self.x11
+        with x11_lib.trap_errors(self.display):
+            for window in self.watched:
+                if window != self.window:
+                    x11.XSelectInput(self.display, window, 0)
+            chain = []
+            window = self.window
+            while window and window != self.root:
+                chain.append(window)
+                x11.XSelectInput(self.display, window, x11_lib.StructureNotifyMask)
+                window = self._tree(window)[0]
+            x11.XSync(self.display, 0)  # collect BadWindow now, not in a later grab
+        self.watched = chain
+
+    def poll(self):
+        """Read queued events without blocking; marks the geometry stale on structure changes"""
+        x11 = self.x11
+        while x11.XEventsQueued(self.display, x11_lib.QueuedAfterReading) > 0:
+            x11.XNextEvent(self.display, ctypes.byref(self.event))
+            if self.event.type in self.STRUCTURE_EVENTS:
+                self.stats['events'] += 1
+                self.dirty = True
+
+    def _refresh(self):
+        x11 = self.x11
+        self.stats['geometry_queries'] += 1
+        attrs = x11_lib.XWindowAttributes()
+        x, y, child = ctypes.c_int(), ctypes.c_int(), ctypes.c_ulong()
+        with x11_lib.trap_errors(self.display) as trap:
+            ok = x11.XGetWindowAttributes(self.display, self.window, ctypes.byref(attrs)) and \
+                x11.XTranslateCoordinates(self.display, self.window, self.root, 0, 0,
+                                          ctypes.byref(x), ctypes.byref(y), ctypes.byref(child))
+        if not ok or trap.error_code:
+            # Destroyed: forget it and search again (the app may come back)
+            self.window = None
+            self.cached = None
+            return
+        self.cached = (x.value, y.value, attrs.width, attrs.height, attrs.map_state == x11_lib.IsViewable)
+        self._watch()  # a ReparentNotify changes the ancestor chain
+        self.dirty = False
+
+    def geometry(self):
+        """(left, top, width, height, viewable) in root coordinates, or None while there is no window"""
+        self.poll()
+        if self.window is None:
+            now = time.monotonic()
+            if now < self.next_search:
+                return None
+            self.next_search = now + self.SEARCH_INTERVAL
+            self.window = self.find()
+            if self.window is None:
+                return None
+            self.dirty = True
+        if self.dirty:
+            self._refresh()
+        return self.cached
+
+
+class XWindowBackend(XShmBackend):
+    """Capture of a single window that follows it as it moves or resizes. grab() ignores the
+    region; frames are the window's size rounded down to even numbers (for yuv420 encoders).
+    While the window is unmapped or gone the last frame is returned with last_grab_changed False"""
+
+    name = 'xwindow'
+
+    def __init__(self, display=None, window=None, title=None, pid=None, composite=False):
+        super().__init__(display)
+        self.pixmap = None
+        self.pixmap_key = None
+        self.redirected = None
+        self.last_frame = None
+        self.framebuffer = None
+        try:
+            self.tracker = WindowTracker(self.x11, self.display, self.root, window, title, pid)
+            self.composite = bool(composite)
+            if self.composite:
+                self.x11.require('composite')
+                event_base, error_base = ctypes.c_int(), ctypes.c_int()
+                if not self.x11.XCompositeQueryExtension(self.display, ctypes.byref(event_base),
+                                                         ctypes.byref(error_base)):
+                    raise X11Error("Composite extension not available")
+        except Exception:
+            self.close()
+            raise
+
+    def _release_pixmap(self):
+        if self.pixmap:
+            self.x11.XFreePixmap(self.display, self.pixmap)
+        self.pixmap = None
+        self.pixmap_key = None
+
+    def _grab_composite(self, window, width, height):
+        """Read the window's offscreen pixmap (contents are kept even when it is covered)"""
+        x11 = self.x11
+        if self.redirected != window:
+            self._unredirect()
+            with x11_lib.trap_errors(self.display) as trap:
+                x11.XCompositeRedirectWindow(self.display, window, x11_lib.CompositeRedirectAutomatic)
+                x11.XSync(self.display, 0)
+            if trap.error_code:
+                raise X11Error(f"Could not redirect window {window:#x} (error {trap.error_code})")
+            self.redirected = window
+        # The pixmap is replaced by the server on every resize
+        if self.pixmap_key != (window, width, height):
+            self._release_pixmap()
+            self.pixmap = x11.XCompositeNameWindowPixmap(self.display, window)
+            self.pixmap_key = (window, width, height)
+        width, height = max(2, width // 2 * 2), max(2, height // 2 * 2)
+        with x11_lib.trap_errors(self.display) as trap:
+            image = x11.XGetImage(self.display, self.pixmap, 0, 0, width, height,
+                                  x11_lib.AllPlanes, x11_lib.ZPixmap)
+        if not image or trap.error_code:
+            self._release_pixmap()
+            raise X11Error(f"Could not read the composite pixmap of window {window:#x}")
+        try:
+            if image.contents.bits_per_pixel != 32:
+                raise X11Error(f"Unsupported pixel format: {image.contents.bits_per_pixel} bpp")
+            stride = image.contents.bytes_per_line
+            raw = (ctypes.c_ubyte * (stride * height)).from_address(image.contents.data)
+            pixels = np.frombuffer(raw, dtype=np.uint8).reshape(height, stride // 4, 4)[:, :width]
+            if self.framebuffer is None or self.framebuffer.shape[:2] != (height, width):
+                self.framebuffer = np.empty((height, width, 4), dtype=np.uint8)
+            np.copyto(self.framebuffer, pixels)
+        finally:
+            x11.XDestroyImage(image)
+        return self.framebuffer
+
+    def grab(self, region=None):
+        geometry = self.tracker.geometry()
+        if geometry is None or not geometry[4]:
+            if self.last_frame is None:
+                raise X11Error("Window not found" if geometry is None else "Window is not mapped")
+            self.last_grab_changed = False
+            return self.last_frame
+        left, top, width, height, _ = geometry
+        if self.composite:
+            frame = self._grab_composite(self.tracker.window, width, height)
+            self.last_grab_origin = (left, top)
+        else:
+            # Root capture shows what is on screen, so clip to the screen (covered parts show the cover)
+            screen = self.monitors[0]
+            right = min(left + width, screen['left'] + screen['width'])
+            bottom = min(top + height, screen['top'] + screen['height'])
+            left, top = max(left, screen['left']), max(top, screen['top'])
+            width, height = (right - left) // 2 * 2, (bottom - top) // 2 * 2
+            if width < 2 or height < 2:
+                if self.last_frame is None:
+                    raise X11Error("Window is off screen")
+                self.last_grab_changed = False
+                return self.last_frame
+            frame = super().grab({'left': left, 'top': top, 'width': width, 'height': height})
+            self.last_grab_origin = (left, top)
+        self.last_frame = frame
+        self.last_grab_changed = True
+        return frame
+
+    def _unredirect(self):
+        if self.redirected:
+            with x11_lib.trap_errors(self.display):
+                self.x11.XCompositeUnredirectWindow(self.display, self.redirected, x11_lib.CompositeRedirectAutomatic)
+                self.x11.XSync(self.display, 0)
+            self.redirected = None
+
+    def close(self):
+        if self.display is not None:
+            self._release_pixmap()
+            self._unredirect()
+        super().close()
+
+
+def window_self_check(display=None, moves=5, rounds=100):
+    """Script a window from a second connection and verify xwindow follows it, including
+    while it is covered (composite)"""
+    x11 = x11_lib.load()
+    app = x11_lib.open_display(display)
+    root = x11.XRootWindow(app, x11.XDefaultScreen(app))
+    target = x11.XCreateSimpleWindow(app, root, 50, 50, 320, 240, 0, 0, 0x0000FF00)
+    cover = x11.XCreateSimpleWindow(app, root, 0, 0, 1, 1, 0, 0, 0x00FF0000)
+    x11.XStoreName(app, target, b'nsnap-window-check')
+    x11.XMapWindow(app, target)
+    x11.XSync(app, 0)
+    time.sleep(0.1)
+    ok = True
+    try:
+        for composite in (False, True):
+            with XWindowBackend(display, title='^nsnap-window-check$', composite=composite) as backend:
+                for step in range(moves):
+                    x, y, w, h = 50 + step * 60, 40 + step * 30, 320 + step * 20, 240 + step * 10
+                    x11.XMoveResizeWindow(app, target, x, y, w, h)
+                    x11.XClearWindow(app, target)
+                    x11.XSync(app, 0)
+                    time.sleep(0.05)
+                    frame = backend.grab()
+                    green = bool((frame[:, :, 1] > 200).all() and (frame[:, :, 2] < 50).all())
+                    print(f"composite={composite} move to {x},{y} {w}x{h}: frame {frame.shape[1]}x{frame.shape[0]} "
+                          f"green={green}")
+                    ok = ok and green and frame.shape[:2] == (h // 2 * 2, w // 2 * 2)
+
+                # Steady window: grabs should not query the geometry again
+                queries = backend.tracker.stats['geometry_queries']
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    backend.grab()
+                elapsed = (time.perf_counter() - start) / rounds
+                extra = backend.tracker.stats['geometry_queries'] - queries
+                print(f"  steady: {elapsed * 1000:.2f} ms/grab, {extra} geometry queries in {rounds} grabs")
+                ok = ok and extra == 0
+
+                if composite:
+                    # Cover the window completely - the pixmap still has its pixels
+                    x11.XMoveResizeWindow(app, cover, 0, 0, 1920, 1080)
+                    x11.XMapWindow(app, cover)
+                    x11.XRaiseWindow(app, cover)
+                    x11.XSync(app, 0)
+                    time.sleep(0.05)
+                    frame = backend.grab()
+                    green = bool((frame[:, :, 1] > 200).all())
+                    print(f"  covered: green={green}")
+                    ok = ok and green
+                print(f"  tracker: {backend.tracker.stats}")
+    finally:
+        x11.XDestroyWindow(app, cover)
+        x11.XDestroyWindow(app, target)
+        x11_lib.close_display(app)
+    return ok
+
+
+def damage_self_check(display=None, idle_rounds=200):
+    """Script a window on the live display and verify xdamage tracks it exactly"""
+    from capture_backends import MssBackend
+
+    with XDamageBackend(display) as backend, MssBackend() as reference:
+        x11 = backend.x11
+        screen = backend.monitors[0]
+        region = {k: screen[k] for k in ('left', 'top', 'width', 'height')}
+        backend.grab(region)
+
+        # Idle desktop: grabs should be skipped without any X round trip
+        x11.XSync(backend.display, 0)
+        backend.grab(region)
+        start = time.perf_counter()
+        for _ in range(idle_rounds):
+            backend.grab(region)
+        idle = (time.perf_counter() - start) / idle_rounds
+        print(f"Idle: changed={backend.last_grab_changed}  {idle * 1e6:.1f} us/grab")
+        ok = not backend.last_grab_changed
+
+        # Scripted update: map a small window and repaint it a few colours
+        window = x11.XCreateSimpleWindow(backend.display, backend.root, 100, 100, 200, 150, 0, 0, 0x00FF0000)
+        x11.XMapWindow(backend.display, window)
+        for colour in (0x0000FF00, 0x000000FF, 0x00FFFF00):
+            x11.XSetWindowBackground(backend.display, window, colour)
+            x11.XClearWindow(backend.display, window)
+            x11.XSync(backend.display, 0)
+            time.sleep(0.05)
+            frame = backend.grab(region)
+            same = np.array_equal(frame[:, :, :3], reference.grab(region)[:, :, :3])
+            print(f"Window colour {colour:06X}: changed={backend.last_grab_changed} matches mss={same}")
+            ok = ok and backend.last_grab_changed and same
+        x11.XDestroyWindow(backend.display, window)
+        x11.XSync(backend.display, 0)
+        print(f"Stats: {backend.stats}")
+    return ok
+
+
+def self_check(display=None, rounds=30):
+    """Compare xshm against mss on the live display and print grab timings"""
+    from capture_backends import MssBackend
+
+    with XShmBackend(display) as shm, MssBackend() as reference:
+        monitor = shm.monitors[1] if len(shm.monitors) > 1 else shm.monitors[0]
+        region = {k: monitor[k] for k in ('left', 'top', 'width', 'height')}
+        same = np.array_equal(shm.grab(region)[:, :, :3], reference.grab(region)[:, :, :3])
+        print(f"Region {region['width']}x{region['height']}: pixels match mss = {same}")
+        for backend in (reference, shm):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                backend.grab(region)
+            elapsed = (time.perf_counter() - start) / rounds
+            print(f"  {backend.name:5s} {elapsed * 1000:7.2f} ms/grab  ({1 / elapsed:6.1f} grabs/s)")
+    return same
+
+
+if __name__ == "__main__":
+    try:
+        if '--window' in sys.argv[1:]:
+            check = window_self_check
+        else:
+            check = damage_self_check if '--damage' in sys.argv[1:] else self_check
+        sys.exit(0 if check() else 1)
+    except X11Error as e:
+        print(f"X11 capture not available: {e}")
+        sys.exit(2)
@@ -0,0 +1,413 @@
+# x11_lib.py
+# Minimal ctypes bindings for the Xlib extension calls used by the X11 capture code
+# Dependencies: libX11, libXext; optional libXdamage + libXfixes, libXcomposite (Linux/X11 only - nothing to pip install)
+#
+# Only the handful of functions the capture backends need are declared. Libraries
+# are loaded on first use so importing this module is safe on any platform;
+# load() raises X11Error when X11 is not available, and require() does the same
+# for optional extension libraries.
+
+import ctypes
+import ctypes.util
+import threading
+from contextlib import contextmanager
+
+
+class X11Error(Exception):
+    """Raised when an X11 library, extension or request is not available"""
+
+
+# Xlib constants
+ZPixmap = 2
+AllPlanes = 0xFFFFFFFFFFFFFFFF if ctypes.sizeof(ctypes.c_ulong) == 8 else 0xFFFFFFFF
+QueuedAfterReading = 1
+Success = 0
+IsViewable = 2
+StructureNotifyMask = 1 << 17
+PropModeReplace = 0
+AnyPropertyType = 0
+XA_CARDINAL = 6
+
+# Event types delivered for StructureNotifyMask
+DestroyNotify = 17
+UnmapNotify = 18
+MapNotify = 19
+ReparentNotify = 21
+ConfigureNotify = 22
+
+# XComposite constants
+CompositeRedirectAutomatic = 0
+
+# XFixes cursor constants
+XFixesDisplayCursorNotify = 1  # event offset from the extension's event base
+XFixesDisplayCursorNotifyMask = 1
+
+# XDamage constants
+XDamageReportNonEmpty = 3
+XDamageNotify = 0  # event offset from the extension's event base
+
+# SysV shared memory constants
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+SHMAT_FAILED = ctypes.c_void_p(-1).value
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class XImage(ctypes.Structure):
+    # Leading fields only - the trailing obdata/funcs members are never touched from Python
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong),
+        ('green_mask', ctypes.c_ulong),
+        ('blue_mask', ctypes.c_ulong),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+class XRectangle(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_short),
+        ('y', ctypes.c_short),
+        ('width', ctypes.c_ushort),
+        ('height', ctypes.c_ushort),
+    ]
+
+
+class XWindowAttributes(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('border_width', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('visual', ctypes.c_void_p),
+        ('root', ctypes.c_ulong),
+        ('class_', ctypes.c_int),
+        ('bit_gravity', ctypes.c_int),
+        ('win_gravity', ctypes.c_int),
+        ('backing_store', ctypes.c_int),
+        ('backing_planes', ctypes.c_ulong),
+        ('backing_pixel', ctypes.c_ulong),
+        ('save_under', ctypes.c_int),
+        ('colormap', ctypes.c_ulong),
+        ('map_installed', ctypes.c_int),
+        ('map_state', ctypes.c_int),
+        ('all_event_masks', ctypes.c_long),
+        ('your_event_mask', ctypes.c_long),
+        ('do_not_propagate_mask', ctypes.c_long),
+        ('override_redirect', ctypes.c_int),
+        ('screen', ctypes.c_void_p),
+    ]
+
+
+class XEvent(ctypes.Structure):
+    # The XEvent union is 24 longs; only the leading type field is read here
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('pad', ctypes.c_long * 23),
+    ]
+
+
+class XFixesCursorImage(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_short),
+        ('y', ctypes.c_short),
+        ('width', ctypes.c_ushort),
+        ('height', ctypes.c_ushort),
+        ('xhot', ctypes.c_ushort),
+        ('yhot', ctypes.c_ushort),
+        ('cursor_serial', ctypes.c_ulong),
+        ('pixels', ctypes.POINTER(ctypes.c_ulong)),  # premultiplied ARGB, one unsigned long per pixel
+    ]
+
+
+XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent))
+
+
+def _declare(lib, name, restype, argtypes):
+    func = getattr(lib, name)
+    func.restype = restype
+    func.argtypes = argtypes
+    return func
+
+
+def _load_library(name):
+    path = ctypes.util.find_library(name)
+    if not path:
+        raise X11Error(f"lib{name} not found")
+    return ctypes.CDLL(path)
+
+
+class X11Library:
+    """Loaded libraries with typed function prototypes"""
+
+    def __init__(self):
+        c_void_p, c_int, c_uint, c_ulong = ctypes.c_void_p, ctypes.c_int, ctypes.c_uint, ctypes.c_ulong
+        xlib = _load_library('X11')
+        xext = _load_library('Xext')
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        self.XOpenDisplay = _declare(xlib, 'XOpenDisplay', c_void_p, [ctypes.c_char_p])
+        self.XCloseDisplay = _declare(xlib, 'XCloseDisplay', c_int, [c_void_p])
+        self.XDefaultScreen = _declare(xlib, 'XDefaultScreen', c_int, [c_void_p])
+        self.XRootWindow = _declare(xlib, 'XRootWindow', c_ulong, [c_void_p, c_int])
+        self.XDefaultVisual = _declare(xlib, 'XDefaultVisual', c_void_p, [c_void_p, c_int])
+        self.XDefaultDepth = _declare(xlib, 'XDefaultDepth', c_int, [c_void_p, c_int])
+        self.XDisplayWidth = _declare(xlib, 'XDisplayWidth', c_int, [c_void_p, c_int])
+        self.XDisplayHeight = _declare(xlib, 'XDisplayHeight', c_int, [c_void_p, c_int])
+        self.XSync = _declare(xlib, 'XSync', c_int, [c_void_p, c_int])
+        self.XFree = _declare(xlib, 'XFree', c_int, [c_void_p])
+        self.XDestroyImage = _declare(xlib, 'XDestroyImage', c_int, [ctypes.POINTER(XImage)])
+        # Takes and returns handler addresses so a saved previous handler can be put back
+        self.XSetErrorHandler = _declare(xlib, 'XSetErrorHandler', c_void_p, [c_void_p])
+        self.XFlush = _declare(xlib, 'XFlush', c_int, [c_void_p])
+        self.XEventsQueued = _declare(xlib, 'XEventsQueued', c_int, [c_void_p, c_int])
+        self.XNextEvent = _declare(xlib, 'XNextEvent', c_int, [c_void_p, ctypes.POINTER(XEvent)])
+        self.XGetImage = _declare(xlib, 'XGetImage', ctypes.POINTER(XImage), [
+            c_void_p, c_ulong, c_int, c_int, c_uint, c_uint, c_ulong, c_int])
+        self.XCreateSimpleWindow = _declare(xlib, 'XCreateSimpleWindow', c_ulong, [
+            c_void_p, c_ulong, c_int, c_int, c_uint, c_uint, c_uint, c_ulong, c_ulong])
+        self.XMapWindow = _declare(xlib, 'XMapWindow', c_int, [c_void_p, c_ulong])
+        self.XDestroyWindow = _declare(xlib, 'XDestroyWindow', c_int, [c_void_p, c_ulong])
+        self.XSetWindowBackground = _declare(xlib, 'XSetWindowBackground', c_int, [c_void_p, c_ulong, c_ulong])
+        self.XClearWindow = _declare(xlib, 'XClearWindow', c_int, [c_void_p, c_ulong])
+        self.XMoveResizeWindow = _declare(xlib, 'XMoveResizeWindow', c_int, [
+            c_void_p, c_ulong, c_int, c_int, c_uint, c_uint])
+        self.XRaiseWindow = _declare(xlib, 'XRaiseWindow', c_int, [c_void_p, c_ulong])
+        self.XStoreName = _declare(xlib, 'XStoreName', c_int, [c_void_p, c_ulong, ctypes.c_char_p])
+        self.XFetchName = _declare(xlib, 'XFetchName', c_int, [c_void_p, c_ulong, ctypes.POINTER(c_void_p)])
+        self.XSelectInput = _declare(xlib, 'XSelectInput', c_int, [c_void_p, c_ulong, ctypes.c_long])
+        self.XQueryTree = _declare(xlib, 'XQueryTree', c_int, [
+            c_void_p, c_ulong, ctypes.POINTER(c_ulong), ctypes.POINTER(c_ulong),
+            ctypes.POINTER(ctypes.POINTER(c_ulong)), ctypes.POINTER(c_uint)])
+        self.XGetWindowAttributes = _declare(xlib, 'XGetWindowAttributes', c_int, [
+            c_void_p, c_ulong, ctypes.POINTER(XWindowAttributes)])
+        self.XTranslateCoordinates = _declare(xlib, 'XTranslateCoordinates', c_int, [
+            c_void_p, c_ulong, c_ulong, c_int, c_int, ctypes.POINTER(c_int), ctypes.POINTER(c_int),
+            ctypes.POINTER(c_ulong)])
+        self.XInternAtom = _declare(xlib, 'XInternAtom', c_ulong, [c_void_p, ctypes.c_char_p, c_int])
+        self.XGetWindowProperty = _declare(xlib, 'XGetWindowProperty', c_int, [
+            c_void_p, c_ulong, c_ulong, ctypes.c_long, ctypes.c_long, c_int, c_ulong,
+            ctypes.POINTER(c_ulong), ctypes.POINTER(c_int), ctypes.POINTER(c_ulong), ctypes.POINTER(c_ulong),
+            ctypes.POINTER(c_void_p)])
+        self.XChangeProperty = _declare(xlib, 'XChangeProperty', c_int, [
+            c_void_p, c_ulong, c_ulong, c_ulong, c_int, c_int, c_void_p, c_int])
+        self.XFreePixmap = _declare(xlib, 'XFreePixmap', c_int, [c_void_p, c_ulong])
+        self.XQueryPointer = _declare(xlib, 'XQueryPointer', c_int, [
+            c_void_p, c_ulong, ctypes.POINTER(c_ulong), ctypes.POINTER(c_ulong), ctypes.POINTER(c_int),
+            ctypes.POINTER(c_int), ctypes.POINTER(c_int), ctypes.POINTER(c_int), ctypes.POINTER(c_uint)])
+
+        self.XShmQueryExtension = _declare(xext, 'XShmQueryExtension', c_int, [c_void_p])
+        self.XShmCreateImage = _declare(xext, 'XShmCreateImage', ctypes.POINTER(XImage), [
+            c_void_p, c_void_p, c_uint, c_int, c_void_p,
+            ctypes.POINTER(XShmSegmentInfo), c_uint, c_uint])
+        self.XShmAttach = _declare(xext, 'XShmAttach', c_int, [c_void_p, ctypes.POINTER(XShmSegmentInfo)])
+        self.XShmDetach = _declare(xext, 'XShmDetach', c_int, [c_void_p, ctypes.POINTER(XShmSegmentInfo)])
+        self.XShmGetImage = _declare(xext, 'XShmGetImage', c_int, [
+            c_void_p, c_ulong, ctypes.POINTER(XImage), c_int, c_int, c_ulong])
+
+        self.shmget = _declare(libc, 'shmget', c_int, [c_int, ctypes.c_size_t, c_int])
+        self.shmat = _declare(libc, 'shmat', c_void_p, [c_int, c_void_p, c_int])
+        self.shmdt = _declare(libc, 'shmdt', c_int, [c_void_p])
+        self.shmctl = _declare(libc, 'shmctl', c_int, [c_int, c_int, c_void_p])
+
+        self.libs = {'X11': xlib, 'Xext': xext, 'c': libc}
+        self.features = set()
+
+    def require(self, feature):
+        """Declare the functions of an optional extension library ('damage', 'composite', 'cursor')"""
+        if feature in self.features:
+            return
+        c_void_p, c_int, c_ulong = ctypes.c_void_p, ctypes.c_int, ctypes.c_ulong
+        int_p = ctypes.POINTER(c_int)
+        try:
+            if feature == 'damage':
+                damage = _load_library('Xdamage')
+                fixes = _load_library('Xfixes')
+                self.XDamageQueryExtension = _declare(damage, 'XDamageQueryExtension', c_int, [c_void_p, int_p, int_p])
+                self.XDamageCreate = _declare(damage, 'XDamageCreate', c_ulong, [c_void_p, c_ulong, c_int])
+                self.XDamageDestroy = _declare(damage, 'XDamageDestroy', None, [c_void_p, c_ulong])
+                self.XDamageSubtract = _declare(damage, 'XDamageSubtract', None, [c_void_p, c_ulong, c_ulong, c_ulong])
+                self.XFixesCreateRegion = _declare(fixes, 'XFixesCreateRegion', c_ulong, [
+                    c_void_p, ctypes.POINTER(XRectangle), c_int])
+                self.XFixesDestroyRegion = _declare(fixes, 'XFixesDestroyRegion', None, [c_void_p, c_ulong])
+                self.XFixesFetchRegion = _declare(fixes, 'XFixesFetchRegion', ctypes.POINTER(XRectangle), [
+                    c_void_p, c_ulong, int_p])
+                self.libs.update(Xdamage=damage, Xfixes=fixes)
+            elif feature == 'composite':
+                composite = _load_library('Xcomposite')
+                self.XCompositeQueryExtension = _declare(composite, 'XCompositeQueryExtension', c_int, [
+                    c_void_p, int_p, int_p])
+                self.XCompositeRedirectWindow = _declare(composite, 'XCompositeRedirectWindow', None, [
+                    c_void_p, c_ulong, c_int])
+                self.XCompositeUnredirectWindow = _declare(composite, 'XCompositeUnredirectWindow', None, [
+                    c_void_p, c_ulong, c_int])
+                self.XCompositeNameWindowPixmap = _declare(composite, 'XCompositeNameWindowPixmap', c_ulong, [
+                    c_void_p, c_ulong])
+                self.libs.update(Xcomposite=composite)
+            elif feature == 'cursor':
+                fixes = _load_library('Xfixes')
+                self.XFixesQueryExtension = _declare(fixes, 'XFixesQueryExtension', c_int, [c_void_p, int_p, int_p])
+                self.XFixesSelectCursorInput = _declare(fixes, 'XFixesSelectCursorInput', None, [
+                    c_void_p, c_ulong, c_ulong])
+                self.XFixesGetCursorImage = _declare(fixes, 'XFixesGetCursorImage',
+                                                     ctypes.POINTER(XFixesCursorImage), [c_void_p])
+                self.libs.update(Xfixes=fixes)
+            else:
+                raise X11Error(f"Unknown X11 feature: {feature}")
+        except (OSError, AttributeError) as e:
+            raise X11Error(f"X11 {feature} support not available: {e}")
+        self.features.add(feature)
+
+
+_library = None
+_library_lock = threading.Lock()
+
+# X error handling. Xlib has one process-wide error handler and the default one exits
+# the process. While any display opened with open_display() is open, _on_x_error is
+# installed: it records errors for those displays (read them with trap_errors) and
+# passes errors for every other connection (Tk, mss) to the handler it replaced,
+# which is put back when the last of our displays is closed.
+_handler_lock = threading.Lock()
+_displays = set()           # display pointers opened by open_display()
+_errors = {}                # display pointer -> last error code
+_previous_address = None    # handler replaced while our displays are open
+_previous_handler = None    # ... callable, for forwarding other displays' errors
+_trap_depth = 0
+_trap_previous = None       # handler replaced for the duration of trap_errors blocks
+
+
+def _on_x_error(display, event):
+    if display in _displays or _previous_handler is None:
+        _errors[display] = event.contents.error_code
+        return 0
+    return _previous_handler(display, event)
+
+
+# Keep a reference so the callback is not garbage collected while installed
+_error_handler = XErrorHandler(_on_x_error)
+_handler_address = ctypes.cast(_error_handler, ctypes.c_void_p).value
+
+
+def load():
+    """Load the X11 libraries once"""
+    global _library
+    with _library_lock:
+        if _library is None:
+            try:
+                _library = X11Library()
+            except (OSError, AttributeError, TypeError) as e:
+                raise X11Error(f"X11 libraries not available: {e}")
+        return _library
+
+
+def _install_handler(x11):
+    """Install _on_x_error, remembering the current handler (caller holds _handler_lock)"""
+    global _previous_address, _previous_handler
+    previous = x11.XSetErrorHandler(_handler_address)
+    if previous and previous != _handler_address:
+        _previous_address = previous
+        _previous_handler = XErrorHandler(previous)
+
+
+def _restore_handler(x11):
+    """Put back the handler replaced by _install_handler (caller holds _handler_lock)"""
+    global _previous_address, _previous_handler
+    if _previous_address:
+        current = x11.XSetErrorHandler(_previous_address)
+        if current != _handler_address:
+            # Someone installed their own handler after ours: leave theirs in place
+            x11.XSetErrorHandler(current)
+    _previous_address = None
+    _previous_handler = None
+
+
+def open_display(name=None):
+    """Open a display connection, raising X11Error if there is no X server.
+    Close it with close_display() so the previous error handler is restored"""
+    x11 = load()
+    display = x11.XOpenDisplay(name.encode() if name else None)
+    if not display:
+        raise X11Error(f"Cannot open X display {name or ''}".strip())
+    with _handler_lock:
+        if not _displays:
+            _install_handler(x11)
+        _displays.add(display)
+    return display
+
+
+def close_display(display):
+    """Close a display from open_display(); the last one restores the previous error handler"""
+    x11 = load()
+    try:
+        x11.XCloseDisplay(display)
+    finally:
+        with _handler_lock:
+            _displays.discard(display)
+            _errors.pop(display, None)
+            if not _displays and not _trap_depth:
+                _restore_handler(x11)
+
+
+class _ErrorTrap:
+    def __init__(self):
+        self.error_code = None
+
+
+@contextmanager
+def trap_errors(display):
+    """Collect X errors raised for display while the block runs (call XSync inside for async requests).
+    The handler is (re)installed for the block in case another library replaced it meanwhile"""
+    global _trap_depth, _trap_previous
+    x11 = load()
+    with _handler_lock:
+        if not _trap_depth:
+            current = x11.XSetErrorHandler(_handler_address)
+            _trap_previous = current if current != _handler_address else None
+        _trap_depth += 1
+    _errors.pop(display, None)
+    trap = _ErrorTrap()
+    try:
+        yield trap
+    finally:
+        trap.error_code = _errors.pop(display, None)
+        with _handler_lock:
+            _trap_depth -= 1
+            if not _trap_depth:
+                if _trap_previous is not None:
+                    x11.XSetErrorHandler(_trap_previous)
+                    _trap_previous = None
+                elif not _displays:
+                    _restore_handler(x11)